@@ -10,6 +10,8 @@ from pynput import keyboard, mouse
 from modules.ahp import AutoFlask
 from modules.base import Base
 from modules.keys import KeyActions
+from modules.proxy import ProxyManager
+from modules.trace import TradeTracer
 from modules.trade import ClientLog, Prices, TradeBot
 
 COMBOS = [
@@ -48,6 +50,7 @@ class KeyPresser(AutoFlask, TradeBot):
                     pass
                 elif key == keyboard.KeyCode(char="3"):
                     self.trader_switch = 0 if self.trader_switch else 1
+                    self.whisper_scheduler.wake()
                     msg = "Activated" if self.trader_switch else "Stopped"
                     print(f"- Trader {msg}")
                 elif key == keyboard.KeyCode(char="4"):
@@ -135,6 +138,11 @@ if __name__ == "__main__":
         "trade_items_1.json",
     ]
     key_presser = KeyPresser()
+    trader_target = key_presser.run_trader
+    if "async" in sys.argv:
+        trader_target = key_presser.run_trader_async
+    elif "live" in sys.argv:
+        trader_target = key_presser.run_trader_live
 
     if "config" in sys.argv:
         base = Base()
@@ -145,6 +153,14 @@ if __name__ == "__main__":
     elif "log" in sys.argv:
         client_log = ClientLog()
         client_log.run()
+    elif "trace" in sys.argv:
+        tracer = TradeTracer(
+            trace_path=key_presser.trader_config.get('trace_path', 'temp/trade_trace.jsonl'))
+        tracer.print_summary()
+    elif "proxies" in sys.argv:
+        proxy_manager = ProxyManager(
+            [], stats_path=key_presser.trader_config.get('proxy_stats_path', 'temp/proxy_stats.json'))
+        proxy_manager.print_stats()
     elif "afk" in sys.argv:
         afk_thread = Thread(target=key_presser.run_afk)
         afk_thread.daemon = True
@@ -153,7 +169,7 @@ if __name__ == "__main__":
     elif "trader" in sys.argv:
         for trade_file in trade_item_files:
             print(f"- Trader thread starting : {trade_file}")
-            trader_thread = Thread(target=key_presser.run_trader, args=(trade_file,))
+            trader_thread = Thread(target=trader_target, args=(trade_file,))
             trader_thread.daemon = True
             trader_thread.start()
         whisper_queue_thread = Thread(
@@ -163,18 +179,20 @@ if __name__ == "__main__":
     elif "bot" in sys.argv:
         for trade_file in trade_item_files:
             print(f"- Trader thread starting : {trade_file}")
-            trader_thread = Thread(target=key_presser.run_trader, args=(trade_file,))
+            trader_thread = Thread(target=trader_target, args=(trade_file,))
             trader_thread.daemon = True
             trader_thread.start()
         trade_buyer_thread = Thread(target=key_presser.run_buyer, daemon=True).start()
         whisper_queue_thread = Thread(
             target=key_presser.manage_trade_whisper_queue, daemon=True
         ).start()
+        Thread(target=key_presser.manage_trade_summary_export, daemon=True).start()
         key_presser.run()
     elif "seller" in sys.argv:
         trade_seller_thread = Thread(target=key_presser.run_seller)
         trade_seller_thread.daemon = True
         trade_seller_thread.start()
+        Thread(target=key_presser.manage_trade_summary_export, daemon=True).start()
         key_presser.run()
     elif "ahp" in sys.argv:
         auto_flask = AutoFlask()
@@ -183,5 +201,7 @@ if __name__ == "__main__":
         auto_flask.start()
         key_presser.run()
 
+    key_presser.db_writer.stop()  # commit pending write-behind mutations
+    key_presser.trade_ledger.export_changed_json()
     finish = datetime.now() - start
     logging.info(f"Done in: {finish}")
@@ -14,7 +14,6 @@ import win32api
 import win32gui
 import win32con
 
-from datetime import datetime
 from difflib import SequenceMatcher
 from PIL import ImageGrab
 from colorthief import ColorThief
@@ -89,16 +88,6 @@ class Base:
         with open(f'{filepath}', 'w', encoding='utf-8') as json_file:
             json.dump(data, json_file, indent=4)
 
-    def get_datetime_passed_seconds(self, time_stamp, time_now=None, reverse=False):
-        time_now = time_now if time_now else datetime.now()
-        time_now = datetime.strptime(str(time_now).split('.')[0], self.date_fmt)
-        time_stamp = datetime.strptime(str(time_stamp).split('.')[0], self.date_fmt)
-        if reverse:
-            time_passed = time_stamp - time_now
-        else:
-            time_passed = time_now - time_stamp
-        return int(time_passed.total_seconds())
-
     def check_no_window(self):
         if not gw.getActiveWindow():
             return True
@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+
+
+class SearchCache:
+    """Short lived trade API search results keyed by normalized query;
+       concurrent identical requests wait for one upstream call (single-flight)
+    """
+    def __init__(self, ttl=5, cacheable=None):
+        self.ttl = ttl
+        self.cacheable = cacheable if cacheable else (lambda value: True)
+        self.results = {}  # key -> (value, expires_at)
+        self.inflight = {}  # key -> {'event', 'value', 'error'}
+        self.counters = {'hits': 0, 'misses': 0, 'shared': 0, 'errors': 0}
+        self.lock = threading.Lock()
+
+    def query_key(self, url: str, query: bytes) -> tuple:
+        """Same query with other key order/whitespace gives same key"""
+        return (url, json.dumps(json.loads(query), sort_keys=True, separators=(',', ':')))
+
+    def prune(self, now: float) -> None:
+        """Drop expired results - lock must be held"""
+        expired = [key for key, (value, expires_at) in self.results.items() if expires_at <= now]
+        for key in expired:
+            del self.results[key]
+
+    def get_or_fetch(self, key, fetch, *args):
+        """Return fresh cached value, wait for same in-flight fetch or call fetch(*args)"""
+        with self.lock:
+            now = time.monotonic()
+            cached = self.results.get(key)
+            if cached and cached[1] > now:
+                self.counters['hits'] += 1
+                return cached[0]
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'event': threading.Event(), 'value': None, 'error': None}
+                self.inflight[key] = flight
+                self.counters['misses'] += 1
+            else:
+                self.counters['shared'] += 1
+        if leader:
+            return self.fetch_leader(key, flight, fetch, args)
+        flight['event'].wait()
+        if flight['error']:
+            raise flight['error']
+        return flight['value']
+
+    def fetch_leader(self, key, flight: dict, fetch, args: tuple):
+        try:
+            value = fetch(*args)
+        except Exception as e:
+            flight['error'] = e
+            with self.lock:
+                self.counters['errors'] += 1
+                del self.inflight[key]
+            flight['event'].set()
+            raise
+        flight['value'] = value
+        with self.lock:
+            now = time.monotonic()
+            self.prune(now)
+            if self.ttl > 0 and self.cacheable(value):
+                self.results[key] = (value, now + self.ttl)
+            del self.inflight[key]
+        flight['event'].set()
+        return value
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, saved=self.counters['hits'] + self.counters['shared'])
@@ -0,0 +1,48 @@
+import time
+
+from datetime import datetime
+
+
+def epoch_now() -> int:
+    """Persisted timestamp - integer epoch seconds"""
+    return int(time.time())
+
+
+def epoch_age(epoch: int) -> int:
+    """Seconds passed since persisted epoch timestamp"""
+    return int(time.time()) - epoch
+
+
+def elapsed(since: float) -> float:
+    """Seconds passed since time.monotonic() mark - not affected by clock changes"""
+    return time.monotonic() - since
+
+
+def parse_iso_epoch(value: str) -> float:
+    """Epoch of trade API timestamp: 2022-06-04T11:12:18Z - None if invalid"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class ExpiringNames:
+    """Names remembered for ttl seconds of monotonic time"""
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.names = {}  # name -> monotonic time added
+
+    def add(self, name: str) -> None:
+        self.names[name] = time.monotonic()
+
+    def __contains__(self, name: str) -> bool:
+        added = self.names.get(name)
+        return added is not None and time.monotonic() - added < self.ttl
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def prune(self) -> None:
+        """Forget expired names"""
+        now = time.monotonic()
+        self.names = {name: added for name, added in self.names.items() if now - added < self.ttl}
@@ -1,18 +1,97 @@
 import sqlite3
-import random
-import time
+import threading
 
-from datetime import datetime
+from modules.clock import epoch_now
+
+
+class SerializedConnection(sqlite3.Connection):
+    """Connection whose 'with conn:' blocks are write transactions serialized by shared write_lock;
+       nested blocks join the outer transaction
+    """
+    write_lock = None
+    depth = 0
+
+    def __enter__(self):
+        self.write_lock.acquire()
+        self.depth += 1
+        try:
+            if self.depth == 1 and not self.in_transaction:
+                self.execute('BEGIN IMMEDIATE')
+        except BaseException:
+            """__exit__ not called - e.g. database is locked after busy_timeout"""
+            self.depth -= 1
+            self.write_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.depth -= 1
+            if not self.depth:
+                return super().__exit__(exc_type, exc_value, traceback)
+            return False
+        finally:
+            self.write_lock.release()
+
+
+class ConnectionManager:
+    """One WAL connection per thread for db_file, writes serialized through one lock;
+       statement cache sized for static TradeDB SQL
+    """
+    def __init__(self, db_file='db.sqlite3', busy_timeout=5, cached_statements=256):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.write_lock = threading.RLock()
+        self.local = threading.local()
+
+    def connect(self) -> SerializedConnection:
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout,
+            factory=SerializedConnection,
+            cached_statements=self.cached_statements,
+        )
+        conn.write_lock = self.write_lock
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        return conn
+
+    def get(self) -> SerializedConnection:
+        """Connection of current thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        return conn
+
+    def close(self) -> None:
+        """Close connection of current thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            self.local.conn = None
+            conn.close()
 
 
 class BaseDB:
+    connection_managers = {}  # db_file -> ConnectionManager, shared by all threads
+    connection_managers_lock = threading.Lock()
+
     def __init__(self):
         pass
 
+    def db_get_connection_manager(self, db_file='db.sqlite3') -> ConnectionManager:
+        with self.connection_managers_lock:
+            manager = self.connection_managers.get(db_file)
+            if not manager:
+                manager = self.connection_managers[db_file] = ConnectionManager(db_file)
+            return manager
+
     def db_create_connection(self, db_file='db.sqlite3'):
+        """WAL connection bound to calling thread"""
         conn = None
         try:
-            conn = sqlite3.connect(db_file)
+            conn = self.db_get_connection_manager(db_file).get()
             print(f'- Connected to db')
         except Exception as e:
             print(e)
@@ -27,35 +106,58 @@ class BaseDB:
 
     def db_create_tables(self, db_conn):
         if db_conn:
-            self.db_create_table(
-                db_conn, self.sql_create_trade_users_table)
-            self.db_create_table(
-                db_conn, self.sql_create_ignored_users_table)
+            self.db_migrate(db_conn, self.migrations)
         else:
             print(f"- Error! Cannot connect to db. {db_conn}")
             return False
 
+    def db_migrate(self, conn, migrations: list) -> int:
+        """Apply (version, migration(conn)) steps newer than PRAGMA user_version in one transaction"""
+        with conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for migration_version, migration in migrations:
+                if migration_version <= version:
+                    continue
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {int(migration_version)}')
+                version = migration_version
+                print(f'- Migrated db to version {version}')
+        return version
+
+    def db_migrate_epoch_column(self, conn, table, column, sql_create_table) -> bool:
+        """Rebuild table whose column holds str(datetime.now()) text as integer epoch seconds"""
+        columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+        if not any(row[1] == column and row[2].lower() == 'text' for row in columns):
+            return False
+        names = [row[1] for row in columns]
+        select = [
+            f"COALESCE(CAST(strftime('%s', substr({name}, 1, 19), 'utc') AS INTEGER), 0)"
+            if name == column else name for name in names]
+        conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+        conn.execute(sql_create_table)
+        conn.execute(
+            f'INSERT INTO {table}({", ".join(names)}) SELECT {", ".join(select)} FROM {table}_old')
+        conn.execute(f'DROP TABLE {table}_old')
+        print(f'- Migrated {table}.{column} to epoch seconds')
+        return True
+
     def db_create_object(self, conn, sql, data):
-        cur = conn.cursor()
-        cur.execute(sql, data)
-        conn.commit()
+        with conn:
+            conn.execute(sql, data)
 
     def db_update_object(self, conn, sql, data):
-        cur = conn.cursor()
-        cur.execute(sql, data)
-        conn.commit()
+        with conn:
+            conn.execute(sql, data)
 
     def db_delete_object(self, conn, table, column, value):
         sql = f'DELETE FROM {table} WHERE {column}=?'
-        cur = conn.cursor()
-        cur.execute(sql, (value,))
-        conn.commit()
+        with conn:
+            conn.execute(sql, (value,))
 
     def db_flush_objects(self, conn, table):
         sql = f'DELETE FROM {table}'
-        cur = conn.cursor()
-        cur.execute(sql)
-        conn.commit()
+        with conn:
+            conn.execute(sql)
 
     def db_get_all(self, conn, table):
         cur = conn.cursor()
@@ -67,24 +169,28 @@ class BaseDB:
         cur.execute(f'SELECT * FROM {table} WHERE {column}=?', (value,))
         return cur.fetchone()
 
+    def db_get_objects_in(self, conn, table, column, values, chunk_size=500):
+        """Select rows where column IN values - one query per chunk_size values"""
+        values = list(values)
+        cur = conn.cursor()
+        rows = []
+        for i in range(0, len(values), chunk_size):
+            chunk = values[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cur.execute(f'SELECT * FROM {table} WHERE {column} IN ({placeholders})', chunk)
+            rows.extend(cur.fetchall())
+        return rows
+
     def db_get_latest_objects(self, db_conn, table, column, amount=10, latest=0):
+        """Newest amount rows by epoch column - latest: only rows of last n seconds"""
         cur = db_conn.cursor()
-        cur.execute(f'SELECT * FROM {table} ORDER BY {column} DESC')
         if latest:
-            fmt = '%Y-%m-%d %H:%M:%S'
-            rows = set()
-            for row in cur:
-                time_now = str(datetime.now())
-                time_now_strp = datetime.strptime(time_now.split('.')[0], fmt)
-                last_whisper_strp = datetime.strptime(
-                    row[7].split('.')[0], fmt)
-                last_whisper_raw = time_now_strp - last_whisper_strp
-                last_whisper_sec = int(last_whisper_raw.total_seconds())
-                if last_whisper_sec <= latest:
-                    rows.add(row)
-            return sorted(rows)
+            cur.execute(
+                f'SELECT * FROM {table} WHERE {column} >= ? ORDER BY {column} DESC LIMIT ?',
+                (epoch_now() - latest, amount))
         else:
-            return cur.fetchall()[:amount]
+            cur.execute(f'SELECT * FROM {table} ORDER BY {column} DESC LIMIT ?', (amount,))
+        return cur.fetchall()
 
 
 class TradeDB(BaseDB):
@@ -100,7 +206,7 @@ class TradeDB(BaseDB):
                 item_price integer NOT NULL,
                 item_amount integer NOT NULL,
                 item_currency text NOT NULL,
-                last_trade text NOT NULL,
+                last_trade integer NOT NULL,
                 priority integer DEFAULT 10,
                 trade_attempts integer DEFAULT 3
             );"""
@@ -108,8 +214,10 @@ class TradeDB(BaseDB):
             CREATE TABLE IF NOT EXISTS ignored_users (
                 id integer PRIMARY KEY,
                 acc_name text NOT NULL UNIQUE,
-                created text NOT NULL
+                created integer NOT NULL
             );"""
+        self.sql_create_trade_users_last_trade_index = """
+            CREATE INDEX IF NOT EXISTS trade_users_last_trade ON trade_users(last_trade);"""
         self.sql_create_trade_items_table = """
             CREATE TABLE IF NOT EXISTS trade_items (
                 id integer PRIMARY KEY,
@@ -120,7 +228,7 @@ class TradeDB(BaseDB):
                 max_price integer NOT NULL,
                 min_stock_amount integer NOT NULL,
                 max_stock_price integer NOT NULL,
-                disabled boolean NOT NULL,
+                disabled boolean NOT NULL
             );"""
         self.sql_create_prices_table = """
             CREATE TABLE IF NOT EXISTS prices (
@@ -132,7 +240,39 @@ class TradeDB(BaseDB):
                 item_avg_price integer NOT NULL,
                 last_avg_price integer DEFAULT 0,
                 poeninja_price integer DEFAULT 0,
-                last_update text NOT NULL,
+                last_update integer NOT NULL
+            );"""
+        self.sql_create_price_history_table = """
+            CREATE TABLE IF NOT EXISTS price_history (
+                id integer PRIMARY KEY,
+                item_id text NOT NULL,
+                price real NOT NULL,
+                listing_count integer DEFAULT 0,
+                resolution integer DEFAULT 0,
+                recorded integer NOT NULL
+            );"""
+        self.sql_create_price_history_index = """
+            CREATE INDEX IF NOT EXISTS price_history_item_recorded
+                ON price_history(item_id, resolution, recorded);"""
+        self.sql_create_trade_ledger_table = """
+            CREATE TABLE IF NOT EXISTS trade_ledger (
+                id integer PRIMARY KEY,
+                item_id text NOT NULL,
+                amount integer NOT NULL,
+                price real DEFAULT 0,
+                side text NOT NULL,
+                recorded integer NOT NULL
+            );"""
+        self.sql_create_trade_ledger_index = """
+            CREATE INDEX IF NOT EXISTS trade_ledger_item_recorded
+                ON trade_ledger(item_id, recorded);"""
+        self.sql_create_trade_summary_table = """
+            CREATE TABLE IF NOT EXISTS trade_summary (
+                item_id text PRIMARY KEY,
+                item_amount integer DEFAULT 0,
+                item_buy_price real DEFAULT 0,
+                item_sell_price real DEFAULT 0,
+                updated integer NOT NULL
             );"""
         self.sql_insert_trade_user = """
             INSERT INTO trade_users(
@@ -192,6 +332,28 @@ class TradeDB(BaseDB):
                     item_currency = ?
                 WHERE acc_name = ?
             """
+        self.sql_upsert_trade_user = """
+            INSERT INTO trade_users(
+                    acc_name,
+                    char_name,
+                    item_type,
+                    item_id,
+                    item_name,
+                    item_price,
+                    item_amount,
+                    item_currency,
+                    last_trade
+                )
+                VALUES(?,?,?,?,?,?,?,?,?)
+                ON CONFLICT(acc_name) DO UPDATE
+                SET char_name = excluded.char_name,
+                    item_type = excluded.item_type,
+                    item_id = excluded.item_id,
+                    item_name = excluded.item_name,
+                    item_price = excluded.item_price,
+                    item_amount = excluded.item_amount,
+                    item_currency = excluded.item_currency
+            """
         self.sql_update_trade_user_priority = """
             UPDATE trade_users
                 SET last_trade = ?,
@@ -200,70 +362,140 @@ class TradeDB(BaseDB):
                 WHERE acc_name = ?
             """
         self.sql_upsert_prices = """
-            INSERT INTO prices (item_id,)
-            VALUES (item_id,), (item_id,)
-            ON CONFLICT (item_id) DO UPDATE
-            SET column_1 = excluded.column_1,
-                column_2 = excluded.column_2;
-        """
+            INSERT INTO prices(
+                    item_id,
+                    item_quantity,
+                    item_avg_price,
+                    poeninja_price,
+                    last_update
+                )
+                VALUES(?,?,?,?,?)
+                ON CONFLICT(item_id) DO UPDATE
+                SET item_quantity = excluded.item_quantity,
+                    item_tendency = CASE
+                        WHEN excluded.item_avg_price > prices.item_avg_price THEN 'up'
+                        WHEN excluded.item_avg_price < prices.item_avg_price THEN 'down'
+                        ELSE 'flat' END,
+                    item_tendency_pc = CASE
+                        WHEN prices.item_avg_price THEN CAST(ROUND(
+                            (excluded.item_avg_price - prices.item_avg_price) * 100.0
+                            / prices.item_avg_price) AS INTEGER)
+                        ELSE 0 END,
+                    last_avg_price = prices.item_avg_price,
+                    item_avg_price = excluded.item_avg_price,
+                    poeninja_price = excluded.poeninja_price,
+                    last_update = excluded.last_update
+            """
+        self.sql_insert_price_history = """
+            INSERT INTO price_history(
+                    item_id,
+                    price,
+                    listing_count,
+                    recorded
+                )
+                VALUES(?,?,?,?)
+            """
+        self.sql_downsample_price_history = """
+            INSERT INTO price_history(item_id, price, listing_count, resolution, recorded)
+                SELECT item_id, AVG(price), CAST(AVG(listing_count) AS INTEGER), :bucket,
+                       recorded / :bucket * :bucket
+                FROM price_history
+                WHERE resolution = 0 AND recorded < :cutoff
+                GROUP BY item_id, recorded / :bucket
+            """
+        self.migrations = [
+            (1, self.db_migration_create_users),
+            (2, self.db_migration_epoch_timestamps),
+            (3, self.db_migration_create_prices),
+            (4, self.db_migration_create_trade_ledger),
+            (5, self.db_migration_trade_summary_types),
+        ]
+
+    def db_migration_create_users(self, conn):
+        conn.execute(self.sql_create_trade_users_table)
+        conn.execute(self.sql_create_ignored_users_table)
+
+    def db_migration_epoch_timestamps(self, conn):
+        self.db_migrate_epoch_column(
+            conn, 'trade_users', 'last_trade', self.sql_create_trade_users_table)
+        self.db_migrate_epoch_column(
+            conn, 'ignored_users', 'created', self.sql_create_ignored_users_table)
+        conn.execute(self.sql_create_trade_users_last_trade_index)
+
+    def db_migration_create_prices(self, conn):
+        conn.execute(self.sql_create_trade_items_table)
+        conn.execute(self.sql_create_prices_table)
+        conn.execute(self.sql_create_price_history_table)
+        conn.execute(self.sql_create_price_history_index)
+
+    def db_migration_create_trade_ledger(self, conn):
+        conn.execute(self.sql_create_trade_ledger_table)
+        conn.execute(self.sql_create_trade_ledger_index)
+        conn.execute(self.sql_create_trade_summary_table)
 
-    def db_update_trade_user_priority(self, db_conn, trade_user, updated_at):
-        """Update DB user last_trade/priority/attempts"""
+    def db_migration_trade_summary_types(self, conn):
+        """Rebuild trade_summary created with untyped item_sell_price"""
+        conn.execute('ALTER TABLE trade_summary RENAME TO trade_summary_old')
+        conn.execute(self.sql_create_trade_summary_table)
+        conn.execute('INSERT INTO trade_summary SELECT * FROM trade_summary_old')
+        conn.execute('DROP TABLE trade_summary_old')
+
+    def db_record_prices(self, db_conn, prices: list, recorded=None) -> None:
+        """Bulk insert (item_id, price, listing_count) into price_history and update prices"""
+        recorded = recorded if recorded is not None else epoch_now()
+        with db_conn:
+            db_conn.executemany(self.sql_insert_price_history, [
+                (item_id, price, listing_count, recorded) for item_id, price, listing_count in prices])
+            db_conn.executemany(self.sql_upsert_prices, [
+                (item_id, listing_count, price, price, recorded) for item_id, price, listing_count in prices])
+
+    def db_downsample_price_history(self, db_conn, now=None, raw_ttl=86400, bucket=3600, bucket_ttl=2592000):
+        """Average raw rows older than raw_ttl into bucket rows, drop bucket rows older than bucket_ttl"""
+        now = now if now is not None else epoch_now()
+        cutoff = (now - raw_ttl) // bucket * bucket  # whole buckets only
+        with db_conn:
+            db_conn.execute(self.sql_downsample_price_history, {'bucket': bucket, 'cutoff': cutoff})
+            db_conn.execute(
+                'DELETE FROM price_history WHERE resolution = 0 AND recorded < ?', (cutoff,))
+            db_conn.execute(
+                'DELETE FROM price_history WHERE resolution > 0 AND recorded < ?', (now - bucket_ttl,))
+
+    def db_get_price_history(self, db_conn, item_id, since=0) -> list:
+        """Return (price, listing_count, recorded) rows of item since epoch, oldest first"""
+        cur = db_conn.execute(
+            """SELECT price, listing_count, recorded FROM price_history
+                WHERE item_id = ? AND resolution > 0 AND recorded >= ?
+                UNION ALL
+                SELECT price, listing_count, recorded FROM price_history
+                WHERE item_id = ? AND resolution = 0 AND recorded >= ?
+                ORDER BY recorded""",
+            (item_id, since, item_id, since))
+        return cur.fetchall()
+
+    def calc_trade_user_priority(self, trade_user: tuple, updated_at: int) -> tuple:
+        """Trade user row after whisper - attempts decreased, priority decreased once attempts run out"""
         attempts = trade_user[-1] - 1 if trade_user[-1] else 3
         priority = trade_user[-2] - 1 if not trade_user[-1] else trade_user[-2]
-        filepath = 'temp/ignored_accounts.txt'
-        if not priority:
-            with open(filepath, 'a', encoding='utf-8') as ignored_users:
-                ignored_users.write(trade_user[1] + '\n')
-            self.db_insert_new_ignored_users(db_conn)
+        return trade_user[:-3] + (updated_at, priority, attempts)
+
+    def db_update_trade_user_priority(self, db_conn, trade_user):
+        """Update DB user last_trade/priority/attempts - user out of priority added to ignored_users,
+           ignore file/set updated by caller after commit
+        """
+        if not trade_user[-2]:
+            db_conn.execute(self.ignore_list.sql_insert, (trade_user[1].strip().lower(), epoch_now()))
         self.db_update_object(
             db_conn,
             self.sql_update_trade_user_priority,
-            (updated_at, priority, attempts, trade_user[1])
+            (trade_user[-3], trade_user[-2], trade_user[-1], trade_user[1])
         )
 
-    def db_insert_default_ignored_users(self, db_conn):
-        ignored_users = self.db_get_all(db_conn, 'ignored_users')
-        filepath = 'temp/ignored_accounts.txt'
-        if not ignored_users:
-            try:
-                with open(filepath, "r", encoding="utf8") as ignored_users:
-                    for user in ignored_users:
-                        user = str(user).strip().lower()
-                        user_data = (
-                            user,
-                            str(datetime.now()),
-                        )
-                        with db_conn:
-                            self.db_create_object(
-                                db_conn,
-                                self.sql_insert_ignored_user,
-                                user_data)
-                        print(f'- Added default_ignored_user: {user}')
-            except FileNotFoundError:
-                with open(filepath, 'w+') as file:
-                    file.write('')
-        return ignored_users
-
-    def db_insert_new_ignored_users(self, db_conn):
-        """
-        TODO: Fix init db
-              ValueError: I/O operation on closed file.
-        """
-        time.sleep(random.uniform(0.1, 0.3))  # prevent concurrent unique
-        with open("temp/ignored_accounts.txt", "r", encoding="utf8") as ignored_users:
-            for user in ignored_users:
-                user = user.strip().lower()
-                account_ignored = [i for i in self.trade_ignored_users if user in i]
-                if not account_ignored:
-                    user_data = (
-                        user,
-                        str(datetime.now()),
-                    )
-                    with db_conn:
-                        self.db_create_object(
-                            db_conn,
-                            self.sql_insert_ignored_user,
-                            user_data)
-                    self.trade_ignored_users = self.db_get_all(db_conn, 'ignored_users')
-                    print(f'- New ignored_user added: {user}')
+    def db_upsert_trade_users(self, db_conn, trade_users: list) -> dict:
+        """Insert/update trade users in one transaction - return refreshed {acc_name: row}"""
+        if not trade_users:
+            return {}
+        with db_conn:
+            db_conn.executemany(self.sql_upsert_trade_user, trade_users)
+            rows = self.db_get_objects_in(
+                db_conn, 'trade_users', 'acc_name', [trade_user[0] for trade_user in trade_users])
+        return {row[1]: row for row in rows}
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from modules.clock import epoch_now
+
+
+class IgnoreList:
+    """Ignored accounts hash set kept in sync with ignored_users table and ignored_accounts.txt;
+       file is followed by offset - only appended lines are read;
+       prefix_matching - 'name*' lines ignore every account starting with name
+    """
+    sql_select = 'SELECT acc_name FROM ignored_users'
+    sql_insert = 'INSERT OR IGNORE INTO ignored_users(acc_name, created) VALUES(?,?)'
+
+    def __init__(self, file_path='temp/ignored_accounts.txt', prefix_matching=False, check_interval=2):
+        self.file_path = file_path
+        self.prefix_matching = prefix_matching
+        self.check_interval = check_interval
+        self.checked_at = 0
+        self.file_offset = 0
+        self.accounts = set()
+        self.prefixes = set()
+        self.prefix_lengths = ()  # replaced, never mutated - read without lock
+        self.lock = threading.Lock()
+
+    def __contains__(self, account_name: str) -> bool:
+        account_name = account_name.lower()
+        if account_name in self.accounts:
+            return True
+        for length in self.prefix_lengths:
+            if account_name[:length] in self.prefixes:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.accounts) + len(self.prefixes)
+
+    def add_local(self, name: str) -> bool:
+        """Add to in-memory set - lock must be held; False if already ignored"""
+        if self.prefix_matching and name.endswith('*'):
+            prefix = name[:-1]
+            if prefix in self.prefixes:
+                return False
+            self.prefixes.add(prefix)
+            if len(prefix) not in self.prefix_lengths:
+                self.prefix_lengths = tuple(sorted(self.prefix_lengths + (len(prefix),)))
+            return True
+        if name in self.accounts:
+            return False
+        self.accounts.add(name)
+        return True
+
+    def load_db(self, db_conn) -> None:
+        rows = db_conn.execute(self.sql_select).fetchall()
+        with self.lock:
+            for row in rows:
+                self.add_local(row[0])
+
+    def add(self, db_conn, names: list) -> list:
+        """Insert new names in one transaction, return added names"""
+        added = []
+        with self.lock:
+            for name in names:
+                name = name.strip().lower()
+                if name and self.add_local(name):
+                    added.append(name)
+        if added:
+            created = epoch_now()
+            with db_conn:
+                db_conn.executemany(self.sql_insert, [(name, created) for name in added])
+            for name in added:
+                print(f'- New ignored_user added: {name}')
+        return added
+
+    def read_appended_lines(self) -> list:
+        """Complete lines appended since last read - reread file if truncated"""
+        try:
+            size = os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            with open(self.file_path, 'w+') as file:
+                file.write('')
+            return []
+        with self.lock:
+            if size < self.file_offset:
+                self.file_offset = 0
+            if size == self.file_offset:
+                return []
+            with open(self.file_path, 'rb') as file:
+                file.seek(self.file_offset)
+                chunk = file.read(size - self.file_offset)
+            complete = chunk.rfind(b'\n') + 1  # keep partly written line for next read
+            self.file_offset += complete
+        return chunk[:complete].decode('utf-8').splitlines()
+
+    def sync_file(self, db_conn) -> list:
+        self.checked_at = time.monotonic()
+        return self.add(db_conn, self.read_appended_lines())
+
+    def maybe_sync_file(self, db_conn) -> list:
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return []
+        return self.sync_file(db_conn)
+
+    def load(self, db_conn) -> None:
+        """Load ignored_users table then import new lines of ignored accounts file"""
+        self.load_db(db_conn)
+        self.sync_file(db_conn)
+
+    def append_local(self, name: str) -> None:
+        """Ignore account already inserted into ignored_users - file and in-memory set only"""
+        with self.lock:
+            if not self.add_local(name.strip().lower()):
+                return
+        with open(self.file_path, 'a', encoding='utf-8') as file:
+            file.write(name + '\n')
+        print(f'- New ignored_user added: {name}')
+
+    def append(self, db_conn, name: str) -> None:
+        """Ignore account - keep file and table in sync"""
+        with open(self.file_path, 'a', encoding='utf-8') as file:
+            file.write(name + '\n')
+        self.add(db_conn, [name])
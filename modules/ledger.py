@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+import threading
+
+from types import MappingProxyType
+
+from modules.clock import epoch_now
+
+
+class TradeLedger:
+    """Per-trade rows in trade_ledger with trade_summary table kept in same transaction;
+       summary mirrored in memory as read only snapshot - reads need no db or file I/O;
+       trade_summary.json written only as export for external tools - on interval or shutdown,
+       never in per-trade path
+    """
+    sql_insert_trade = """
+        INSERT INTO trade_ledger(item_id, amount, price, side, recorded)
+            VALUES(?,?,?,?,?)
+        """
+    sql_upsert_summary_amount = """
+        INSERT INTO trade_summary(item_id, item_amount, item_buy_price, updated)
+            VALUES(?,?,?,?)
+            ON CONFLICT(item_id) DO UPDATE
+            SET item_amount = item_amount + excluded.item_amount,
+                updated = excluded.updated
+        """
+    sql_upsert_summary_price = """
+        INSERT INTO trade_summary(item_id, item_buy_price, item_sell_price, updated)
+            VALUES(:item_id, COALESCE(:buy_price, 0), COALESCE(:sell_price, 0), :updated)
+            ON CONFLICT(item_id) DO UPDATE
+            SET item_buy_price = COALESCE(:buy_price, item_buy_price),
+                item_sell_price = COALESCE(:sell_price, item_sell_price),
+                updated = excluded.updated
+        """
+    sql_select_summary = """
+        SELECT item_id, item_amount, item_buy_price, item_sell_price
+            FROM trade_summary
+        """
+
+    def __init__(self, export_path='temp/trade_summary.json'):
+        self.export_path = export_path
+        self.summaries = {}  # item_id -> read only summary
+        self.snapshot_cache = None
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.exported_snapshot = None
+
+    def build_summary(self, row: tuple) -> MappingProxyType:
+        return MappingProxyType({
+            'item_id': row[0],
+            'item_amount': row[1],
+            'item_buy_price': row[2],
+            'item_sell_price': row[3],
+        })
+
+    def refresh(self, db_conn, item_id: str) -> None:
+        """Mirror summary row after write - lock must be held"""
+        row = db_conn.execute(self.sql_select_summary + ' WHERE item_id = ?', (item_id,)).fetchone()
+        self.summaries[item_id] = self.build_summary(row)
+        self.snapshot_cache = None
+
+    def load(self, db_conn) -> None:
+        """Mirror trade_summary table - legacy trade_summary.json imported into empty table"""
+        with self.lock:
+            if self.loaded:
+                return
+            with db_conn:
+                rows = db_conn.execute(self.sql_select_summary).fetchall()
+                if not rows and os.path.exists(self.export_path):
+                    rows = self.import_json(db_conn)
+            self.summaries = {row[0]: self.build_summary(row) for row in rows}
+            self.snapshot_cache = None
+            self.loaded = True
+
+    def import_json(self, db_conn) -> list:
+        try:
+            with open(self.export_path, 'r', encoding='utf-8') as file:
+                data = json.load(file) or []
+        except (OSError, ValueError) as e:
+            print(f'- Invalid {self.export_path}:', repr(e))
+            return []
+        rows = [
+            (summary['item_id'], summary.get('item_amount', 0),
+             summary.get('item_buy_price', 0), summary.get('item_sell_price', 0))
+            for summary in data if summary.get('item_id')]
+        db_conn.executemany(
+            'INSERT OR REPLACE INTO trade_summary VALUES(?,?,?,?,?)',
+            [row + (epoch_now(),) for row in rows])
+        print(f'- Imported {len(rows)} summaries from {self.export_path}')
+        return rows
+
+    def record(self, db_conn, item_id: str, amount: int, price=0, side='buy') -> MappingProxyType:
+        """Add trade row and change summary amount atomically - sell decreases amount"""
+        recorded = epoch_now()
+        delta = -int(amount) if side == 'sell' else int(amount)
+        with self.lock:
+            with db_conn:
+                db_conn.execute(self.sql_insert_trade, (item_id, int(amount), price, side, recorded))
+                db_conn.execute(self.sql_upsert_summary_amount, (item_id, delta, 0, recorded))
+                self.refresh(db_conn, item_id)
+            return self.summaries[item_id]
+
+    def set_price(self, db_conn, item_id: str, buy_price=None, sell_price=None) -> MappingProxyType:
+        """Set summary buy/sell price - None keeps current value"""
+        with self.lock:
+            with db_conn:
+                db_conn.execute(self.sql_upsert_summary_price, {
+                    'item_id': item_id,
+                    'buy_price': buy_price,
+                    'sell_price': sell_price,
+                    'updated': epoch_now(),
+                })
+                self.refresh(db_conn, item_id)
+            return self.summaries[item_id]
+
+    def get(self, item_id: str):
+        return self.summaries.get(item_id)
+
+    def snapshot(self) -> tuple:
+        """Read only summaries - same object until next write"""
+        snapshot = self.snapshot_cache
+        if snapshot is None:
+            with self.lock:
+                snapshot = self.snapshot_cache = tuple(self.summaries.values())
+        return snapshot
+
+    def export_json(self) -> None:
+        """Write trade_summary.json in legacy format - atomic replace, one writer at a time"""
+        with self.export_lock:
+            snapshot = self.snapshot()
+            data = [dict(summary) for summary in snapshot]
+            with tempfile.NamedTemporaryFile(
+                    'w', encoding='utf-8', dir=os.path.dirname(self.export_path) or '.',
+                    suffix='.tmp', delete=False) as file:
+                json.dump(data, file, indent=4)
+            try:
+                os.replace(file.name, self.export_path)
+            except OSError:
+                os.remove(file.name)
+                raise
+            self.exported_snapshot = snapshot
+
+    def export_changed_json(self) -> bool:
+        """Export only if summaries changed since last export"""
+        if not self.loaded or self.snapshot() is self.exported_snapshot:
+            return False
+        self.export_json()
+        return True
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class ListingFilter:
+    """Columnar exchange listings filter - listings parsed once into structured array,
+       price/stock rules and filters vectorized, dicts and whispers built for survivors only
+    """
+    dtype = np.dtype([
+        ('price', 'f8'),
+        ('amount', 'f8'),
+        ('stock', 'f8'),
+        ('fossil', '?'),
+        ('ignored', '?'),
+    ])
+
+    def __init__(self, max_bulk_price: int, fossil_stock=20):
+        self.max_bulk_price = max_bulk_price
+        self.fossil_stock = fossil_stock
+
+    def load_batch(self, listings: list, ignored=frozenset()) -> np.ndarray:
+        """Parse exchange listings into columns"""
+        rows = []
+        for obj in listings:
+            offer = obj['offers'][0]
+            rows.append((
+                offer['exchange']['amount'],
+                offer['item']['amount'],
+                offer['item']['stock'],
+                'fossil' in offer['item']['currency'],
+                obj['account']['name'].lower() in ignored,
+            ))
+        return np.array(rows, dtype=self.dtype)
+
+    def calc_bulk_price(self, price: np.ndarray, stock: np.ndarray) -> tuple:
+        """Vectorized Trader.calc_bulk_price - cap stock to max_bulk_price, round stock >= 20 to 5"""
+        bulk_price = price * stock
+        over = bulk_price > self.max_bulk_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capped_stock = np.floor(self.max_bulk_price / price)
+        capped_stock = np.where(capped_stock / 5 >= 4, np.floor(capped_stock / 5) * 5, capped_stock)
+        stock = np.where(over, capped_stock, stock)
+        bulk_price = np.where(over, price * stock, bulk_price)
+        return (np.round(bulk_price), stock)
+
+    def filter(self, listings: list, trade_item: dict, ignored=frozenset()) -> list:
+        """Clean/filter exchange listings - same result as Trader.build_cleaned_listing per row"""
+        if not listings:
+            return []
+        batch = self.load_batch(listings, ignored)
+        proportional = batch['amount'] > 1
+        price = np.where(proportional, batch['price'] / batch['amount'], batch['price'])
+        stock = np.where(batch['fossil'] & (batch['stock'] > self.fossil_stock), self.fossil_stock, batch['stock'])
+        survivors = ~batch['ignored'] & (price <= trade_item['max_stock_price'])
+        bulk_price, stock = self.calc_bulk_price(price, stock)
+
+        """Columns back to python lists once - numpy scalar indexing per row is slow"""
+        price = price.tolist()
+        proportional = proportional.tolist()
+        stock = stock.astype(int).tolist()
+        bulk_price = bulk_price.astype(int).tolist()
+        item_names = {}
+        cleaned_data = []
+        for i in np.flatnonzero(survivors).tolist():
+            obj = listings[i]
+            account = obj['account']
+            offer = obj['offers'][0]
+            item = offer['item']
+            exchange = offer['exchange']
+            item_sell_id = item['currency']
+            if item_sell_id not in item_names:
+                item_names[item_sell_id] = ' '.join([word.capitalize() for word in item_sell_id.split('-')])
+            whisper = obj['whisper'].format(item['whisper'], exchange['whisper'].replace('{0}', '{1}'))
+            cleaned_data.append({
+                'account_name': account['name'],
+                'account_last_char_name': account['lastCharacterName'],
+                'account_online': account['online'],
+                'item_buy_price': price[i] if proportional[i] else exchange['amount'],
+                'item_buy_currency': exchange['currency'],
+                'item_sell_id': item_sell_id,
+                'item_sell_name': item_names[item_sell_id],
+                'item_sell_amount': item['amount'],
+                'item_sell_stock': stock[i],
+                'item_indexed': obj['indexed'],
+                'whisper': whisper.format(stock[i], bulk_price[i]),
+            })
+        return cleaned_data
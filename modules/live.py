@@ -0,0 +1,111 @@
+import json
+import threading
+
+import websocket
+
+
+class LiveSearch:
+    """Persistent websocket subscriptions for saved trade searches;
+       on_listings(search_id, context, listing_ids) is called for every pushed batch
+    """
+    def __init__(self, live_url: str, on_listings, headers=None,
+                 max_subscriptions=20, reconnect_delay=1, reconnect_max=60, timeout=30):
+        self.live_url = live_url  # wss://www.pathofexile.com/api/trade/live/{league}
+        self.on_listings = on_listings
+        self.headers = headers if headers else []
+        self.max_subscriptions = max_subscriptions
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max = reconnect_max
+        self.timeout = timeout
+        self.subscriptions = {}  # search_id -> {context, thread, ws, stop, connects, received}
+        self.lock = threading.Lock()
+
+    def subscribe(self, search_id: str, context=None) -> bool:
+        """Start subscription thread; False if subscription cap reached"""
+        with self.lock:
+            if search_id in self.subscriptions:
+                self.subscriptions[search_id]['context'] = context
+                return True
+            if len(self.subscriptions) >= self.max_subscriptions:
+                print(f'- Live search limit reached: {self.max_subscriptions}')
+                return False
+            subscription = {
+                'context': context,
+                'ws': None,
+                'stop': threading.Event(),
+                'connects': 0,
+                'received': 0,
+            }
+            subscription['thread'] = threading.Thread(
+                target=self.run_subscription, args=(search_id, subscription), daemon=True)
+            self.subscriptions[search_id] = subscription
+        subscription['thread'].start()
+        return True
+
+    def unsubscribe(self, search_id: str) -> None:
+        with self.lock:
+            subscription = self.subscriptions.pop(search_id, None)
+        if subscription:
+            subscription['stop'].set()
+            ws = subscription['ws']
+            if ws:
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+
+    def stop(self) -> None:
+        for search_id in list(self.subscriptions):
+            self.unsubscribe(search_id)
+
+    def parse_message(self, message: str) -> list:
+        """Return pushed listing ids: {"new": ["id", ...]}; {"auth": true} - ignored"""
+        try:
+            data = json.loads(message)
+        except (TypeError, ValueError):
+            return []
+        return data.get('new', []) if isinstance(data, dict) else []
+
+    def run_subscription(self, search_id: str, subscription: dict) -> None:
+        """Connect/receive loop - reconnect with exponential backoff"""
+        url = f'{self.live_url}/{search_id}'
+        delay = self.reconnect_delay
+        while not subscription['stop'].is_set():
+            try:
+                ws = websocket.create_connection(url, header=self.headers, timeout=self.timeout)
+                subscription['ws'] = ws
+                subscription['connects'] += 1
+                delay = self.reconnect_delay
+                while not subscription['stop'].is_set():
+                    try:
+                        message = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        ws.ping()
+                        continue
+                    if not message:
+                        break  # closed by server
+                    listing_ids = self.parse_message(message)
+                    if listing_ids:
+                        subscription['received'] += len(listing_ids)
+                        self.on_listings(search_id, subscription['context'], listing_ids)
+            except Exception as e:
+                if subscription['stop'].is_set():
+                    break
+                print(f'- Live search {search_id} error:', repr(e))
+            finally:
+                if subscription['ws']:
+                    try:
+                        subscription['ws'].close()
+                    except Exception:
+                        pass
+                    subscription['ws'] = None
+            if subscription['stop'].wait(delay):
+                break
+            print(f'- Live search {search_id} reconnect')
+            delay = min(delay * 2, self.reconnect_max)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                search_id: {'connects': s['connects'], 'received': s['received']}
+                for search_id, s in self.subscriptions.items()}
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.clock import epoch_now
+
+
+class NinjaPriceService:
+    """poe.ninja overviews fetched concurrently into one index keyed by detailsId/currencyTypeName;
+       overviews refreshed after ttl with conditional requests (ETag/Last-Modified) -
+       unchanged overview (304) never downloaded again; disk snapshot for warm restarts
+    """
+    def __init__(self, get, build_url, overviews, ttl=300, snapshot_path='temp/ninja_prices.json', max_workers=4):
+        self.get = get  # get(url, headers=...) -> response
+        self.build_url = build_url  # build_url(overview, item_type) -> url
+        self.overviews = list(overviews)  # [(overview, item_type)]
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.max_workers = max_workers
+        self.entries = {}  # (overview, item_type) -> {etag, last_modified, fetched, checked_at, lines}
+        self.index = {}  # detailsId/currencyTypeName -> line
+        self.counters = {'fetched': 0, 'not_modified': 0, 'errors': 0}
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def build_index(self) -> None:
+        """Merge overview lines - first configured overview wins on same key; lock must be held"""
+        index = {}
+        for key in reversed(self.overviews):
+            for line in (self.entries.get(key) or {}).get('lines', ()):
+                for name in (line.get('detailsId'), line.get('currencyTypeName')):
+                    if name:
+                        index[name] = line
+        self.index = index
+
+    def check_due(self, key: tuple, now: float) -> bool:
+        entry = self.entries.get(key)
+        return not entry or now - entry['checked_at'] >= self.ttl
+
+    def fetch(self, key: tuple) -> bool:
+        """Conditional GET of overview - return True if lines changed"""
+        entry = self.entries.get(key) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        url = self.build_url(*key)
+        try:
+            resp = self.get(url, headers=headers, timeout=15)
+            if resp.status_code == 304 and entry:
+                with self.lock:
+                    entry['checked_at'] = time.monotonic()
+                    self.counters['not_modified'] += 1
+                return False
+            if resp.status_code != 200:
+                raise ValueError(f'status {resp.status_code}')
+            lines = json.loads(resp.content).get('lines') or []
+        except Exception as e:
+            print(f'- Can\'t access poe.ninja API: {url}', repr(e))
+            with self.lock:
+                # retry after ttl - cached lines kept
+                self.entries.setdefault(key, {'lines': []})['checked_at'] = time.monotonic()
+                self.counters['errors'] += 1
+            return False
+        with self.lock:
+            self.entries[key] = {
+                'etag': resp.headers.get('ETag'),
+                'last_modified': resp.headers.get('Last-Modified'),
+                'fetched': epoch_now(),
+                'checked_at': time.monotonic(),
+                'lines': lines,
+            }
+            self.counters['fetched'] += 1
+        return True
+
+    def refresh(self, force=False) -> list:
+        """Fetch overviews older than ttl concurrently - return [(overview, item_type)] changed"""
+        with self.refresh_lock:
+            now = time.monotonic()
+            keys = [key for key in self.overviews if force or self.check_due(key, now)]
+            if not keys:
+                return []
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys))) as executor:
+                changed = [key for key, result in zip(keys, executor.map(self.fetch, keys)) if result]
+            if changed:
+                with self.lock:
+                    self.build_index()
+                self.save_snapshot()
+            return changed
+
+    def get_price(self, name: str):
+        """Overview line by detailsId or currencyTypeName - never fetches, see refresh"""
+        return self.index.get(name)
+
+    def get_lines(self, overview: str, item_type: str) -> list:
+        return (self.entries.get((overview, item_type)) or {}).get('lines', [])
+
+    def save_snapshot(self) -> None:
+        """Write overviews with validators - atomic replace"""
+        with self.lock:
+            data = [
+                dict(overview=key[0], item_type=key[1], **{
+                    name: value for name, value in entry.items() if name != 'checked_at'})
+                for key, entry in self.entries.items()]
+        temp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.snapshot_path)
+        except OSError as e:
+            print(f'- Can\'t save {self.snapshot_path}:', repr(e))
+
+    def load_snapshot(self) -> None:
+        """Warm start - snapshot age counts towards ttl, validators reused for next refresh"""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                data = json.load(file) or []
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f'- Invalid {self.snapshot_path}:', repr(e))
+            return
+        now = time.monotonic()
+        with self.lock:
+            for entry in data:
+                key = (entry.pop('overview', None), entry.pop('item_type', None))
+                if key not in self.overviews:
+                    continue
+                entry['checked_at'] = now - max(0, epoch_now() - entry.get('fetched', 0))
+                self.entries[key] = entry
+            self.build_index()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, overviews=len(self.entries), size=len(self.index))
@@ -0,0 +1,150 @@
+import collections
+import json
+import random
+import threading
+import time
+
+
+class ProxyManager:
+    """Track proxy health - success rate, latency, rate limits;
+       select proxies weighted by health, quarantine failing ones with exponential backoff
+    """
+    def __init__(self, keys: list, stats_path='temp/proxy_stats.json',
+                 max_failures=3, backoff_base=30, backoff_max=3600, save_interval=60):
+        self.keys = list(keys)
+        self.stats_path = stats_path
+        self.max_failures = max_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.save_interval = save_interval
+        self.saved_at = time.monotonic()
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.load_stats()
+
+    def get_stats(self, key: str) -> dict:
+        return self.stats.setdefault(key, {
+            'successes': 0,
+            'failures': 0,
+            'rate_limited': 0,
+            'consecutive_failures': 0,
+            'backoff_level': 0,
+            'quarantined_until': 0,  # epoch - survives restarts
+            'last_error': '',
+            'latency': collections.deque(maxlen=50),
+        })
+
+    def load_stats(self) -> None:
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for key, stats in data.items():
+            proxy_stats = self.get_stats(key)
+            proxy_stats.update({k: v for k, v in stats.items() if k != 'latency'})
+            proxy_stats['latency'].extend(stats.get('latency', []))
+
+    def save_stats(self) -> None:
+        with self.lock:
+            data = {
+                key: dict(stats, latency=list(stats['latency']))
+                for key, stats in self.stats.items()}
+            self.saved_at = time.monotonic()
+        with open(self.stats_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+
+    def maybe_save_stats(self) -> None:
+        if time.monotonic() - self.saved_at >= self.save_interval:
+            self.save_stats()
+
+    def record_success(self, key: str, latency: float) -> None:
+        with self.lock:
+            stats = self.get_stats(key)
+            stats['successes'] += 1
+            stats['consecutive_failures'] = 0
+            stats['backoff_level'] = max(stats['backoff_level'] - 1, 0)
+            stats['latency'].append(round(latency, 3))
+        self.maybe_save_stats()
+
+    def record_rate_limited(self, key: str) -> None:
+        with self.lock:
+            self.get_stats(key)['rate_limited'] += 1
+        self.maybe_save_stats()
+
+    def record_failure(self, key: str, error='') -> None:
+        """Quarantine proxy after max_failures in a row - backoff doubles each time"""
+        with self.lock:
+            stats = self.get_stats(key)
+            stats['failures'] += 1
+            stats['consecutive_failures'] += 1
+            stats['last_error'] = str(error)[:200]
+            if stats['consecutive_failures'] >= self.max_failures:
+                backoff = min(self.backoff_base * 2 ** stats['backoff_level'], self.backoff_max)
+                stats['quarantined_until'] = time.time() + backoff
+                stats['backoff_level'] += 1
+                stats['consecutive_failures'] = 0
+                print(f'- Proxy quarantined {backoff}s: {key}')
+        self.maybe_save_stats()
+
+    def check_quarantined(self, key: str, now=None) -> bool:
+        now = now if now else time.time()
+        return self.get_stats(key)['quarantined_until'] > now
+
+    def calc_latency_percentile(self, stats: dict, pc: int) -> float:
+        latency = sorted(stats['latency'])
+        if not latency:
+            return 0
+        return latency[min(int(len(latency) * pc / 100), len(latency) - 1)]
+
+    def calc_score(self, key: str) -> float:
+        """Smoothed success rate divided by median latency; unknown proxies score as healthy"""
+        stats = self.get_stats(key)
+        success_rate = (stats['successes'] + 1) / (stats['successes'] + stats['failures'] + 1)
+        latency = self.calc_latency_percentile(stats, 50) or 1
+        return success_rate / (1 + latency)
+
+    def ranked_keys(self, keys=None) -> list:
+        """Healthy keys in health weighted random order;
+           all quarantined - key with earliest quarantine end"""
+        keys = keys if keys is not None else self.keys
+        now = time.time()
+        with self.lock:
+            healthy = [key for key in keys if not self.check_quarantined(key, now)]
+            if not healthy:
+                return [min(keys, key=lambda k: self.get_stats(k)['quarantined_until'])] if keys else []
+            weights = {key: self.calc_score(key) for key in healthy}
+        """Weighted shuffle - key order by random() ** (1 / weight)"""
+        return sorted(healthy, key=lambda k: random.random() ** (1 / weights[k]), reverse=True)
+
+    def select(self, keys=None) -> str:
+        ranked = self.ranked_keys(keys)
+        return ranked[0] if ranked else None
+
+    def get_summary(self) -> list:
+        """Return proxies stats sorted by share of successful requests"""
+        with self.lock:
+            total = sum(stats['successes'] for stats in self.stats.values()) or 1
+            summary = []
+            for key, stats in self.stats.items():
+                summary.append({
+                    'proxy': key,
+                    'share': round(stats['successes'] / total * 100, 1),
+                    'successes': stats['successes'],
+                    'failures': stats['failures'],
+                    'rate_limited': stats['rate_limited'],
+                    'p50': self.calc_latency_percentile(stats, 50),
+                    'p95': self.calc_latency_percentile(stats, 95),
+                    'quarantined': self.check_quarantined(key),
+                    'score': round(self.calc_score(key), 3),
+                })
+        return sorted(summary, key=lambda x: x['share'], reverse=True)
+
+    def print_stats(self) -> None:
+        print('- Proxy stats:', self.stats_path)
+        print('  {:<24}{:>7}{:>7}{:>7}{:>7}{:>8}{:>8}{:>7}'.format(
+            'proxy', 'share', 'ok', 'fail', '429', 'p50', 'p95', 'quar'))
+        for s in self.get_summary():
+            print('  {:<24}{:>6}%{:>7}{:>7}{:>7}{:>8}{:>8}{:>7}'.format(
+                s['proxy'], s['share'], s['successes'], s['failures'], s['rate_limited'],
+                s['p50'], s['p95'], 'yes' if s['quarantined'] else ''))
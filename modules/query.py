@@ -0,0 +1,80 @@
+import json
+import threading
+
+from jinja2 import Environment, PackageLoader, select_autoescape
+
+
+class TradeQueryBuilder:
+    """Build trade API query bodies once per trade item;
+       body is kept as ready to send bytes and rebuilt only when trade item fields change
+    """
+    bulk_fields = ('buyout_currency', 'item_id', 'min_stock_amount')
+    single_fields = ('item_id', 'type', 'min_price', 'max_price')
+
+    def __init__(self, bulk_template='exchange_bulk.json', single_template='exchange_nobulk.json'):
+        self.bulk_template = bulk_template
+        self.single_template = single_template
+        self.env = Environment(
+            loader=PackageLoader('templates', 'trader'),
+            autoescape=select_autoescape())
+        self.queries = {}  # (item_id, bulk) -> (fingerprint, body)
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def render_query(self, trade_item: dict, bulk=False) -> dict:
+        trade_template = self.bulk_template if bulk else self.single_template
+        template = self.env.get_template(trade_template)
+        if bulk:
+            template_rendered = template.render(
+                have_item=[trade_item['buyout_currency']],
+                want_item=[trade_item['item_id']],
+                min_stock_amount=trade_item['min_stock_amount']
+            ).replace("'", '"')
+        else:
+            template_rendered = template.render(
+                item_name=trade_item['item_id'],
+                item_name_type=trade_item['type'],
+                price_min=trade_item['min_price'],
+                price_max=trade_item['max_price']
+            )
+        return json.loads(template_rendered)
+
+    def query_fingerprint(self, trade_item: dict, bulk=False) -> tuple:
+        fields = self.bulk_fields if bulk else self.single_fields
+        return tuple(trade_item.get(field) for field in fields)
+
+    def get_query(self, trade_item: dict, bulk=False) -> bytes:
+        """Return cached query body; build on first use or trade item change"""
+        key = (trade_item['item_id'], bulk)
+        fingerprint = self.query_fingerprint(trade_item, bulk)
+        cached = self.queries.get(key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        body = json.dumps(self.render_query(trade_item, bulk), separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            self.queries[key] = (fingerprint, body)
+            self.builds += 1
+        return body
+
+    def render_batch_query(self, trade_items: list) -> dict:
+        """Exchange query with several `want` items - same buyout_currency required"""
+        template = self.env.get_template(self.bulk_template)
+        template_rendered = template.render(
+            have_item=[trade_items[0]['buyout_currency']],
+            want_item=[trade_item['item_id'] for trade_item in trade_items],
+            min_stock_amount=min(trade_item['min_stock_amount'] for trade_item in trade_items)
+        ).replace("'", '"')
+        return json.loads(template_rendered)
+
+    def get_batch_query(self, trade_items: list) -> bytes:
+        """Return cached batch query body; build on first use or any trade item change"""
+        key = tuple(trade_item['item_id'] for trade_item in trade_items)
+        fingerprint = tuple(self.query_fingerprint(trade_item, bulk=True) for trade_item in trade_items)
+        cached = self.queries.get(key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        body = json.dumps(self.render_batch_query(trade_items), separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            self.queries[key] = (fingerprint, body)
+            self.builds += 1
+        return body
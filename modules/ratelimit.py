@@ -0,0 +1,137 @@
+import threading
+import time
+
+
+class RateLimitGovernor:
+    """Schedule trade API requests from X-Rate-Limit-* response headers
+
+       X-Rate-Limit-Rules: Ip,Account
+       X-Rate-Limit-Ip: 7:15:60,15:90:120       - max_hits:period:restriction
+       X-Rate-Limit-Ip-State: 1:15:0,1:90:0     - hits:period:active_restriction
+       Retry-After: 60
+
+       Ip rules are kept per key (proxy), Account rules are shared by all keys.
+       Every rule is a sliding window: at most max_hits - safety_margin hits per period.
+    """
+    shared_rules = ('account',)
+
+    def __init__(self, default_rules='5:15:60', safety_margin=1):
+        self.default_rules = self.parse_rules(default_rules)
+        self.safety_margin = safety_margin
+        self.rules = {}  # (key, endpoint) -> {rule_name: [(max_hits, period, restriction), ...]}
+        self.hits = {}  # (key, endpoint, rule_name) -> sorted monotonic hit timestamps
+        self.blocked_until = {}  # key -> monotonic
+        self.lock = threading.Lock()
+
+    def parse_rules(self, value: str) -> list:
+        """'7:15:60,15:90:120' -> [(7, 15.0, 60.0), (15, 90.0, 120.0)]"""
+        rules = []
+        for rule in value.split(','):
+            try:
+                hits, period, restriction = rule.strip().split(':')
+                rules.append((int(hits), float(period), float(restriction)))
+            except ValueError:
+                continue
+        return rules
+
+    def get_rules(self, key: str, endpoint: str) -> dict:
+        return self.rules.get((key, endpoint), {'ip': self.default_rules})
+
+    def get_hits(self, key: str, endpoint: str, rule_name: str) -> list:
+        hits_key = ('*' if rule_name in self.shared_rules else key, endpoint, rule_name)
+        return self.hits.setdefault(hits_key, [])
+
+    def calc_wait(self, key: str, endpoint: str, now: float) -> float:
+        """Return earliest safe instant for next hit - lock must be held"""
+        ready_at = max(now, self.blocked_until.get(key, 0), self.blocked_until.get('*', 0))
+        for rule_name, rules in self.get_rules(key, endpoint).items():
+            hits = self.get_hits(key, endpoint, rule_name)
+            if hits:
+                ready_at = max(ready_at, hits[-1])  # keep hits FIFO ordered
+            for max_hits, period, restriction in rules:
+                capacity = max(max_hits - self.safety_margin, 1)
+                if len(hits) >= capacity:
+                    ready_at = max(ready_at, hits[-capacity] + period)
+        return ready_at
+
+    def prune_hits(self, now: float) -> None:
+        """Drop hits older than longest known period"""
+        longest = max(
+            [rule[1] for rules in self.rules.values() for rule_list in rules.values() for rule in rule_list]
+            + [rule[1] for rule in self.default_rules] + [0])
+        for hits in self.hits.values():
+            while hits and hits[0] < now - longest:
+                hits.pop(0)
+
+    def reserve(self, key: str, endpoint='exchange') -> float:
+        """Reserve next safe slot for key; return seconds to wait before request"""
+        with self.lock:
+            now = time.monotonic()
+            self.prune_hits(now)
+            ready_at = self.calc_wait(key, endpoint, now)
+            for rule_name in self.get_rules(key, endpoint):
+                self.get_hits(key, endpoint, rule_name).append(ready_at)
+            return ready_at - now
+
+    def reserve_any(self, keys: list, endpoint='exchange') -> tuple:
+        """Reserve slot on key with earliest safe instant; return (key, wait)"""
+        with self.lock:
+            now = time.monotonic()
+            self.prune_hits(now)
+            key = min(keys, key=lambda k: self.calc_wait(k, endpoint, now))
+            ready_at = self.calc_wait(key, endpoint, now)
+            for rule_name in self.get_rules(key, endpoint):
+                self.get_hits(key, endpoint, rule_name).append(ready_at)
+            return (key, ready_at - now)
+
+    def wait(self, key: str, endpoint='exchange') -> None:
+        delay = self.reserve(key, endpoint)
+        if delay > 0:
+            time.sleep(delay)
+
+    def block(self, key: str, seconds: float) -> None:
+        with self.lock:
+            until = time.monotonic() + seconds
+            self.blocked_until[key] = max(self.blocked_until.get(key, 0), until)
+
+    def update(self, key: str, headers, status_code=200, endpoint='exchange') -> None:
+        """Sync rules/state with response headers"""
+        now = time.monotonic()
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            self.block(key, float(retry_after))
+        elif status_code == 429:
+            rules = self.get_rules(key, endpoint)
+            self.block(key, max([rule[2] for rule_list in rules.values() for rule in rule_list] + [60]))
+        rule_names = headers.get('X-Rate-Limit-Rules')
+        if not rule_names:
+            return
+        with self.lock:
+            rules = {}
+            for header_name in rule_names.split(','):
+                header_name = header_name.strip()
+                rule_header = headers.get(f'X-Rate-Limit-{header_name}')
+                if not rule_header:
+                    continue
+                rule_name = header_name.lower()
+                rules[rule_name] = self.parse_rules(rule_header)
+                state = self.parse_rules(headers.get(f'X-Rate-Limit-{header_name}-State', ''))
+                hits = self.get_hits(key, endpoint, rule_name)
+                block_key = '*' if rule_name in self.shared_rules else key
+                for state_hits, period, restriction in state:
+                    if restriction > 0:
+                        until = now + restriction
+                        self.blocked_until[block_key] = max(self.blocked_until.get(block_key, 0), until)
+                    """Server saw more hits (other bots on same ip) - pad local window"""
+                    local_hits = len([hit for hit in hits if hit > now - period])
+                    for i in range(state_hits - local_hits):
+                        hits.append(max(now, hits[-1]) if hits else now)
+            if rules:
+                self.rules[(key, endpoint)] = rules
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            return {
+                key: round(until - now, 1)
+                for key, until in self.blocked_until.items() if until > now}
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import time
+
+
+class TradeItemScheduler:
+    """Priority heap of trade items ordered by next poll time;
+       poll interval shrinks with listing churn, margin below max price and buy_limit left,
+       overdue items are polled oldest first
+    """
+    def __init__(self, base_interval=10, min_interval=2, max_interval=120, smoothing=0.3):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.heap = []  # (next_poll_at, seq, item_id)
+        self.states = {}  # item_id -> {trade_item, seq, churn, margin, remaining, polled_at, next_poll_at}
+        self.counter = itertools.count()
+        self.polls = 0
+
+    def schedule(self, item_id: str, next_poll_at: float) -> None:
+        """Push new heap entry - older entries of item become stale"""
+        state = self.states[item_id]
+        state['seq'] = next(self.counter)
+        state['next_poll_at'] = next_poll_at
+        heapq.heappush(self.heap, (next_poll_at, state['seq'], item_id))
+
+    def update_items(self, trade_items: list, now=None) -> None:
+        """Sync enabled trade_items - new items are due now, disabled/removed ones dropped"""
+        now = now if now is not None else time.monotonic()
+        enabled = {
+            trade_item['item_id']: trade_item
+            for trade_item in trade_items or [] if not trade_item['disabled']}
+        for item_id in list(self.states):
+            if item_id not in enabled:
+                del self.states[item_id]
+        for item_id, trade_item in enabled.items():
+            if item_id in self.states:
+                self.states[item_id]['trade_item'] = trade_item
+                continue
+            self.states[item_id] = {
+                'trade_item': trade_item,
+                'churn': 0,
+                'margin': 0,
+                'remaining': 1,
+                'polled_at': None,
+            }
+            self.schedule(item_id, now)
+
+    def calc_margin(self, trade_item: dict, listings: list) -> float:
+        """Best listing price below max price - 0 (at max price/no listings) .. 1 (free)"""
+        max_price = trade_item.get('max_stock_price') or trade_item.get('max_price')
+        if not listings or not max_price:
+            return 0
+        best_price = min(listing['item_buy_price'] for listing in listings)
+        return min(max((max_price - best_price) / max_price, 0), 1)
+
+    def calc_remaining(self, trade_item: dict, bought: int) -> float:
+        buy_limit = trade_item.get('buy_limit')
+        if not buy_limit:
+            return 1
+        return min(max(1 - bought / buy_limit, 0), 1)
+
+    def calc_interval(self, state: dict) -> float:
+        churn_factor = 1 + min(state['churn'], 10) / 2  # 1 .. 6
+        margin_factor = 0.5 + state['margin'] * 1.5  # 0.5 .. 2
+        remaining_factor = max(state['remaining'], 0.1)  # 0.1 .. 1
+        interval = self.base_interval / (churn_factor * margin_factor * remaining_factor)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def record_poll(self, item_id: str, listings: list, churn=0, bought=0, now=None) -> float:
+        """Update item stats after search - churn: new/changed listings; return next interval"""
+        state = self.states.get(item_id)
+        if not state:
+            return 0
+        now = now if now is not None else time.monotonic()
+        state['churn'] += self.smoothing * (churn - state['churn'])
+        state['margin'] += self.smoothing * (self.calc_margin(state['trade_item'], listings) - state['margin'])
+        state['remaining'] = self.calc_remaining(state['trade_item'], bought)
+        state['polled_at'] = now
+        self.polls += 1
+        interval = self.calc_interval(state)
+        self.schedule(item_id, now + interval)
+        return interval
+
+    def record_error(self, item_id: str, now=None) -> None:
+        """Failed search - retry item after base_interval, let other items go first"""
+        if item_id in self.states:
+            now = now if now is not None else time.monotonic()
+            self.schedule(item_id, now + self.base_interval)
+
+    def next_item(self, now=None) -> tuple:
+        """Return (trade_item, delay) of item with earliest next poll - delay 0 if due"""
+        now = now if now is not None else time.monotonic()
+        while self.heap:
+            next_poll_at, seq, item_id = self.heap[0]
+            state = self.states.get(item_id)
+            if not state or state['seq'] != seq:
+                heapq.heappop(self.heap)  # stale entry
+                continue
+            return (state['trade_item'], max(next_poll_at - now, 0))
+        return (None, self.base_interval)
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TradeApiError(RuntimeError):
+    """Trade API error answer - code 3 or HTTP 429 is rate limit overuse;
+       proxy_key - proxy of the request that failed
+    """
+    def __init__(self, message: str, code=None, status=None, proxy_key=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.proxy_key = proxy_key
+
+    @property
+    def overuse(self) -> bool:
+        return self.code == 3 or self.status == 429
+
+
+class AsyncTradeSearch:
+    """Keep several trade API queries in flight across proxy pool;
+       trader - object with api_request(trade_item, bulk, proxy), proxy_key(proxy),
+       clean_search_response(trade_item, response) and
+       process_search_response(trade_item, cleaned, response_ts);
+       proxy passed as acquire(endpoint) -> proxy, called only when search is not cached
+       governor - RateLimitGovernor that paces requests per proxy
+       proxy_manager - optional ProxyManager that filters/orders proxies by health
+       search_cache - optional SearchCache whose stats are printed after each cycle
+    """
+    def __init__(self, trader, proxies: list, governor, proxy_manager=None, search_cache=None,
+                 max_inflight=4, overuse_delay=30):
+        self.trader = trader
+        self.proxies = proxies if proxies else [{}]  # {} - direct connection
+        self.proxy_keys = [self.trader.proxy_key(proxy) for proxy in self.proxies]
+        self.governor = governor
+        self.proxy_manager = proxy_manager
+        self.search_cache = search_cache
+        self.max_inflight = max(1, max_inflight)
+        self.overuse_delay = overuse_delay
+        self.cycle_time = 0
+
+    def check_api_overuse(self, e: Exception) -> bool:
+        """Rate limit error code 3 or HTTP 429 - Retry-After already applied by governor"""
+        if isinstance(e, TradeApiError):
+            return e.overuse
+        return getattr(getattr(e, 'response', None), 'status_code', None) == 429
+
+    def search_label(self, trade_item) -> str:
+        if isinstance(trade_item, list):  # batched trade_items
+            return ','.join(item['item_id'] for item in trade_item)
+        return trade_item['item_id']
+
+    def check_api_response(self, response: dict) -> None:
+        """Trade API answers errors with 200/4xx json: {'error': {'code': 3, 'message': 'Rate limit exceeded'}}"""
+        if not isinstance(response, dict) or 'result' not in response:
+            error = response.get('error', {}) if isinstance(response, dict) else {}
+            raise TradeApiError(f'Trade API error: {error.get("message", response)}', error.get('code'))
+
+    def proxy_acquire(self, endpoint: str) -> str:
+        """Reserve proxy with earliest rate limit safe instant and wait for it - runs in request_pool"""
+        keys = self.proxy_manager.ranked_keys(self.proxy_keys) if self.proxy_manager else self.proxy_keys
+        key, delay = self.governor.reserve_any(keys, endpoint)
+        if delay > 0:
+            time.sleep(delay)
+        return key
+
+    async def search_item(self, trade_item: dict, bulk: bool, inflight, request_pool, process_pool):
+        loop = asyncio.get_running_loop()
+        reserved = {}  # proxy key of upstream request - empty for cache hits/shared results
+
+        def acquire(endpoint: str) -> dict:
+            reserved['key'] = self.proxy_acquire(endpoint)
+            return self.proxies[self.proxy_keys.index(reserved['key'])]
+
+        async with inflight:
+            try:
+                response = await loop.run_in_executor(
+                    request_pool, self.trader.api_request, trade_item, bulk, acquire)
+                self.check_api_response(response)
+            except Exception as e:
+                response = None
+                if self.check_api_overuse(e) and 'key' in reserved:
+                    print(f'- API overuse - proxy sleep {self.overuse_delay}s')
+                    self.governor.block(reserved['key'], self.overuse_delay)
+                else:
+                    print(f'- {repr(e)}', f'\n  PROXY: {reserved.get("key")}')
+        if response is None:
+            return 0
+        response_ts = time.time()
+        """Page fetches off process_pool - single worker keeps db_conn thread-bound"""
+        try:
+            cleaned = await loop.run_in_executor(
+                request_pool, self.trader.clean_search_response, trade_item, response)
+            await loop.run_in_executor(
+                process_pool, self.trader.process_search_response, trade_item, cleaned, response_ts)
+        except Exception as e:
+            print(f'- Error processing {self.search_label(trade_item)}:', repr(e))
+            return 0
+        return 1
+
+    async def run_cycle(self, trade_items: list, request_pool, process_pool) -> int:
+        """Search all trade_items concurrently, return amount of processed responses"""
+        inflight = asyncio.Semaphore(self.max_inflight)
+        tasks = [
+            self.search_item(trade_item, bulk, inflight, request_pool, process_pool)
+            for trade_item, bulk in trade_items]
+        started = time.monotonic()
+        results = await asyncio.gather(*tasks)
+        self.cycle_time = time.monotonic() - started
+        return sum(results)
+
+    async def run(self, load_trade_items, is_running=lambda: True, process_initializer=None, cycles=0):
+        """load_trade_items() -> [(trade_item, bulk), ...] for next cycle; cycles=0 - run forever;
+           load_trade_items and response processing (db/ledger io) run in process_pool, off the event loop
+        """
+        loop = asyncio.get_running_loop()
+        request_pool = ThreadPoolExecutor(max_workers=self.max_inflight)
+        process_pool = ThreadPoolExecutor(max_workers=1, initializer=process_initializer)
+        cycle = 0
+        try:
+            while not cycles or cycle < cycles:
+                if not is_running():
+                    await asyncio.sleep(0.2)
+                    continue
+                trade_items = await loop.run_in_executor(process_pool, load_trade_items)
+                if not trade_items:
+                    await asyncio.sleep(1)
+                    continue
+                processed = await self.run_cycle(trade_items, request_pool, process_pool)
+                print(f'- Search cycle: {processed}/{len(trade_items)} items in {self.cycle_time:.1f}s')
+                if self.search_cache:
+                    print('- Search cache:', self.search_cache.stats())
+                cycle += 1
+        finally:
+            request_pool.shutdown(wait=False)
+            process_pool.shutdown(wait=True)
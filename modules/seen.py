@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class SeenListings:
+    """Index of processed listings - (account, item) -> (price, stock, indexed);
+       unchanged listings are skipped until ttl passes, counts kept per cycle
+    """
+    def __init__(self, ttl=180, evict_interval=60):
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self.evicted_at = time.monotonic()
+        self.listings = {}  # (account_name, item_sell_id) -> (fingerprint, seen_at)
+        self.cycle = {'new': 0, 'changed': 0, 'skipped': 0}
+        self.totals = {'new': 0, 'changed': 0, 'skipped': 0, 'evicted': 0}
+        self.lock = threading.Lock()
+
+    def listing_key(self, listing: dict) -> tuple:
+        return (listing['account_name'], listing['item_sell_id'])
+
+    def listing_fingerprint(self, listing: dict) -> tuple:
+        return (listing['item_buy_price'], listing['item_sell_stock'], listing['item_indexed'])
+
+    def check(self, listing: dict, now: float) -> str:
+        """Return new/changed/skipped and remember listing - lock must be held"""
+        key = self.listing_key(listing)
+        fingerprint = self.listing_fingerprint(listing)
+        seen = self.listings.get(key)
+        if seen and now - seen[1] < self.ttl:
+            if seen[0] == fingerprint:
+                return 'skipped'  # keep first seen_at - reprocess after ttl
+            state = 'changed'
+        else:
+            state = 'new'
+        self.listings[key] = (fingerprint, now)
+        return state
+
+    def evict(self, now: float) -> int:
+        """Drop expired listings - lock must be held"""
+        expired = [key for key, seen in self.listings.items() if now - seen[1] >= self.ttl]
+        for key in expired:
+            del self.listings[key]
+        self.evicted_at = now
+        self.totals['evicted'] += len(expired)
+        return len(expired)
+
+    def filter(self, listings: list) -> tuple:
+        """Return (new or changed listings, {new, changed, skipped} counts) of one search cycle;
+           counts belong to this call - cycle only keeps the latest for stats
+        """
+        now = time.monotonic()
+        result = []
+        counts = {'new': 0, 'changed': 0, 'skipped': 0}
+        with self.lock:
+            if now - self.evicted_at >= self.evict_interval:
+                self.evict(now)
+            for listing in listings:
+                state = self.check(listing, now)
+                counts[state] += 1
+                self.totals[state] += 1
+                if state != 'skipped':
+                    result.append(listing)
+            self.cycle = counts
+        return result, counts
+
+    def forget(self, keys) -> None:
+        """Drop listings never whispered - processed again on next search"""
+        with self.lock:
+            for key in keys:
+                self.listings.pop(key, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.totals, cycle=dict(self.cycle), size=len(self.listings))
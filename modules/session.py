@@ -0,0 +1,107 @@
+import collections
+import threading
+import time
+
+import requests
+
+
+class SessionPool:
+    """Reuse keep-alive HTTP sessions (and solved challenge cookies) per proxy key;
+       factory - session constructor: requests.Session, cloudscraper.create_scraper
+    """
+    expire_status_codes = (403,)  # cloudflare challenge failed - start new session
+
+    def __init__(self, factory=requests.Session, max_age=600, max_idle=4):
+        self.factory = factory
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.sessions = {}  # key -> [(session, created), ...] idle sessions
+        self.stats = {}  # key -> {requests, errors, expired, created, latency}
+        self.lock = threading.Lock()
+
+    def get_stats(self, key: str) -> dict:
+        return self.stats.setdefault(key, {
+            'requests': 0,
+            'errors': 0,
+            'expired': 0,
+            'created': 0,
+            'latency': collections.deque(maxlen=100),
+        })
+
+    def checkout(self, key: str) -> tuple:
+        """Take idle session for key or create new one"""
+        with self.lock:
+            idle = self.sessions.get(key, [])
+            while idle:
+                session, created = idle.pop()
+                if time.monotonic() - created < self.max_age:
+                    return (session, created)
+                session.close()
+                self.get_stats(key)['expired'] += 1
+            self.get_stats(key)['created'] += 1
+        return (self.factory(), time.monotonic())
+
+    def checkin(self, key: str, session, created: float) -> None:
+        with self.lock:
+            idle = self.sessions.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((session, created))
+                return
+        session.close()
+
+    def expire(self, key: str, session) -> None:
+        session.close()
+        with self.lock:
+            self.get_stats(key)['expired'] += 1
+
+    def request(self, key: str, method: str, url: str, **kwargs):
+        """Send request with pooled session; session expires on errors"""
+        session, created = self.checkout(key)
+        started = time.monotonic()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except Exception:
+            with self.lock:
+                self.get_stats(key)['errors'] += 1
+            self.expire(key, session)
+            raise
+        latency = time.monotonic() - started
+        with self.lock:
+            stats = self.get_stats(key)
+            stats['requests'] += 1
+            stats['latency'].append(latency)
+        if resp.status_code in self.expire_status_codes:
+            self.expire(key, session)
+        else:
+            self.checkin(key, session, created)
+        return resp
+
+    def get(self, key: str, url: str, **kwargs):
+        return self.request(key, 'GET', url, **kwargs)
+
+    def post(self, key: str, url: str, **kwargs):
+        return self.request(key, 'POST', url, **kwargs)
+
+    def latency_stats(self) -> dict:
+        """Return {key: {requests, errors, expired, created, avg, p50, p95}} latency in ms"""
+        result = {}
+        with self.lock:
+            for key, stats in self.stats.items():
+                latency = sorted(stats['latency'])
+                result[key] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'expired': stats['expired'],
+                    'created': stats['created'],
+                    'avg': round(sum(latency) / len(latency) * 1000, 1) if latency else 0,
+                    'p50': round(latency[int(len(latency) * 0.5)] * 1000, 1) if latency else 0,
+                    'p95': round(latency[int(len(latency) * 0.95)] * 1000, 1) if latency else 0,
+                }
+        return result
+
+    def close(self) -> None:
+        with self.lock:
+            for idle in self.sessions.values():
+                for session, created in idle:
+                    session.close()
+            self.sessions.clear()
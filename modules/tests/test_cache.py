@@ -0,0 +1,74 @@
+import threading
+import time
+
+from unittest import TestCase
+
+from ..cache import SearchCache
+
+
+class TestSearchCache(TestCase, SearchCache):
+    def setUp(self):
+        SearchCache.__init__(self, ttl=60, cacheable=lambda response: 'result' in response)
+        self.fetches = 0
+        self.fetch_lock = threading.Lock()
+
+    def fetch(self, response, delay=0):
+        with self.fetch_lock:
+            self.fetches += 1
+        time.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def test_query_key(self):
+        self.assertEqual(
+            self.query_key('url', b'{"a": 1, "b": {"c": 2}}'),
+            self.query_key('url', b'{"b":{"c":2},"a":1}'))
+        self.assertNotEqual(self.query_key('url', b'{"a":1}'), self.query_key('url', b'{"a":2}'))
+
+    def test_ttl(self):
+        self.assertEqual(self.get_or_fetch('key', self.fetch, {'result': 1}), {'result': 1})
+        self.assertEqual(self.get_or_fetch('key', self.fetch, {'result': 2}), {'result': 1})
+        self.results['key'] = (self.results['key'][0], time.monotonic() - 1)  # expired
+        self.assertEqual(self.get_or_fetch('key', self.fetch, {'result': 3}), {'result': 3})
+        self.assertEqual(self.fetches, 2)
+        """Error responses are not cached"""
+        self.get_or_fetch('error', self.fetch, {'error': 1})
+        self.get_or_fetch('error', self.fetch, {'error': 1})
+        self.assertEqual(self.fetches, 4)
+        self.assertEqual(self.stats(), {'hits': 1, 'misses': 4, 'shared': 0, 'errors': 0, 'saved': 1})
+
+    def test_single_flight(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.get_or_fetch('key', self.fetch, {'result': 1}, 0.2)))
+            for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'result': 1}] * 5)
+        self.assertEqual(self.fetches, 1)
+        stats = self.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['saved'], 4)
+
+    def test_single_flight_error(self):
+        errors = []
+
+        def request():
+            try:
+                self.get_or_fetch('key', self.fetch, RuntimeError('429'), 0.2)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=request) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.inflight, {})
+        self.assertEqual(self.get_or_fetch('key', self.fetch, {'result': 1}), {'result': 1})
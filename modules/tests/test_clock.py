@@ -0,0 +1,78 @@
+import time
+import pytest
+
+from datetime import datetime
+from unittest import TestCase
+
+from ..clock import ExpiringNames, elapsed, epoch_age, epoch_now, parse_iso_epoch
+
+
+def get_datetime_passed_seconds(time_stamp, time_now=None, date_fmt='%Y-%m-%d %H:%M:%S'):
+    """Previous Base.get_datetime_passed_seconds - benchmark reference"""
+    time_now = time_now if time_now else datetime.now()
+    time_now = datetime.strptime(str(time_now).split('.')[0], date_fmt)
+    time_stamp = datetime.strptime(str(time_stamp).split('.')[0], date_fmt)
+    return int((time_now - time_stamp).total_seconds())
+
+
+def filter_trade_users_done(user_done: str, time_limit=60) -> str:
+    """Previous TradeBot.filter_trade_users_done - benchmark reference"""
+    user_done_passed = datetime.now() - datetime.fromisoformat(user_done.split('%')[1])
+    if user_done_passed.seconds >= time_limit:
+        return None
+    return user_done
+
+
+class TestClock(TestCase):
+    def test_epoch(self):
+        self.assertIsInstance(epoch_now(), int)
+        self.assertEqual(epoch_age(epoch_now() - 5), 5)
+        self.assertGreaterEqual(elapsed(time.monotonic() - 1), 1)
+        self.assertEqual(parse_iso_epoch('2022-06-04T11:12:18Z'), 1654341138)
+        self.assertIsNone(parse_iso_epoch('invalid'))
+        self.assertIsNone(parse_iso_epoch(None))
+
+    def test_expiring_names(self):
+        names = ExpiringNames(ttl=60)
+        names.add('char_1')
+        names.add('char_2')
+        names.names['char_2'] -= 61  # added 61s ago
+        self.assertIn('char_1', names)
+        self.assertNotIn('char_2', names)
+        self.assertNotIn('char_3', names)
+        names.prune()
+        self.assertEqual(len(names), 1)
+
+    @pytest.mark.slow
+    def test_benchmark(self):
+        rounds = 20000
+        last_trade = str(datetime.now())
+        started = time.perf_counter()
+        for i in range(rounds):
+            get_datetime_passed_seconds(last_trade)
+        legacy_time = time.perf_counter() - started
+        last_trade = epoch_now()
+        started = time.perf_counter()
+        for i in range(rounds):
+            epoch_age(last_trade)
+        epoch_time = time.perf_counter() - started
+
+        users_done = [f'char_{i}%{datetime.now()}' for i in range(50)]
+        started = time.perf_counter()
+        for i in range(rounds // 50):
+            [user for user in users_done if filter_trade_users_done(user)]
+            [user for user in users_done if 'char_25' in user]
+        legacy_done_time = time.perf_counter() - started
+        names = ExpiringNames(ttl=60)
+        for i in range(50):
+            names.add(f'char_{i}')
+        started = time.perf_counter()
+        for i in range(rounds // 50):
+            names.prune()
+            'char_25' in names
+        done_time = time.perf_counter() - started
+
+        print(f'\n- passed seconds: strptime {legacy_time / rounds * 1e6:.2f}us, '
+              f'epoch {epoch_time / rounds * 1e6:.2f}us per call')
+        print(f'- users done (50): string parse {legacy_done_time / (rounds // 50) * 1e6:.1f}us, '
+              f'monotonic {done_time / (rounds // 50) * 1e6:.1f}us per pass')
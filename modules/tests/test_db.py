@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+import pytest
+
+from unittest import TestCase
+
+from ..db import ConnectionManager, TradeDB
+
+
+class TestConnectionManager(TestCase, TradeDB):
+    def setUp(self):
+        TradeDB.__init__(self)
+        self.db_file = 'temp/test_db.sqlite3'
+        self.manager = ConnectionManager(self.db_file, busy_timeout=10)
+        self.db_create_tables(self.manager.get())
+
+    def tearDown(self):
+        self.manager.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_file + suffix):
+                os.remove(self.db_file + suffix)
+
+    def build_trade_user(self, acc_name: str, price=1, last_trade=None) -> tuple:
+        last_trade = last_trade if last_trade is not None else int(time.time())
+        return (acc_name, 'char', 'scarab', 'x', 'x', price, 1, 'chaos', last_trade)
+
+    def run_threads(self, targets: list) -> list:
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.manager.close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_connection(self):
+        conn = self.manager.get()
+        self.assertIs(self.manager.get(), conn)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        thread_conns = []
+        self.run_threads([lambda: thread_conns.append(self.manager.get())])
+        self.assertIsNot(thread_conns[0], conn)
+
+    def test_write_transaction(self):
+        conn = self.manager.get()
+        with conn:
+            conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_1'))
+            with conn:  # joins outer transaction
+                conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_2'))
+            self.assertTrue(conn.in_transaction)
+        self.assertFalse(conn.in_transaction)
+        with self.assertRaises(sqlite3.IntegrityError):
+            with conn:
+                conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_3'))
+                conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_1'))
+        self.assertEqual(len(self.db_get_all(conn, 'trade_users')), 2)  # acc_3 rolled back
+        self.assertFalse(self.manager.write_lock._is_owned())
+
+    def test_write_transaction_locked(self):
+        """Failed BEGIN releases write_lock - later writes still commit"""
+        other_conn = sqlite3.connect(self.db_file, isolation_level=None)
+        other_conn.execute('BEGIN IMMEDIATE')
+        manager = ConnectionManager(self.db_file, busy_timeout=0.1)
+        manager.write_lock = self.manager.write_lock
+        conn = manager.get()
+        with self.assertRaises(sqlite3.OperationalError):
+            with conn:
+                pass
+        self.assertEqual(conn.depth, 0)
+        self.assertFalse(self.manager.write_lock._is_owned())
+        other_conn.execute('ROLLBACK')
+        other_conn.close()
+        with conn:
+            conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_1'))
+        self.assertFalse(conn.in_transaction)
+        manager.close()
+
+    def test_get_latest_objects(self):
+        conn = self.manager.get()
+        now = int(time.time())
+        for i in range(5):
+            self.db_create_object(
+                conn, self.sql_insert_trade_user, self.build_trade_user(f'acc_{i}', last_trade=now - i * 100))
+        latest = self.db_get_latest_objects(conn, 'trade_users', 'last_trade', amount=3)
+        self.assertEqual([row[1] for row in latest], ['acc_0', 'acc_1', 'acc_2'])
+        latest = self.db_get_latest_objects(conn, 'trade_users', 'last_trade', amount=10, latest=150)
+        self.assertEqual([row[1] for row in latest], ['acc_0', 'acc_1'])
+        plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM trade_users WHERE last_trade >= ? ORDER BY last_trade DESC',
+            (now,)).fetchall()
+        self.assertIn('trade_users_last_trade', str(plan))
+
+    def test_migrate_epoch_column(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute(self.sql_create_trade_users_table.replace('last_trade integer', 'last_trade text'))
+        conn.execute(
+            self.sql_insert_trade_user,
+            self.build_trade_user('acc_1', last_trade='2024-01-02 03:04:05.123456'))
+        conn.execute(self.sql_insert_trade_user, self.build_trade_user('acc_2', last_trade='invalid'))
+        conn.commit()
+        self.db_create_tables(conn)
+        rows = self.db_get_all(conn, 'trade_users')
+        expected = int(time.mktime(time.strptime('2024-01-02 03:04:05', '%Y-%m-%d %H:%M:%S')))
+        self.assertEqual([(row[1], row[-3]) for row in rows], [('acc_1', expected), ('acc_2', 0)])
+        self.assertFalse(self.db_migrate_epoch_column(
+            conn, 'trade_users', 'last_trade', self.sql_create_trade_users_table))
+        conn.close()
+
+    def test_migrate(self):
+        conn = self.manager.get()
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], 5)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({
+            'trade_users', 'ignored_users', 'trade_items', 'prices', 'price_history',
+            'trade_ledger', 'trade_summary'} <= tables)
+        self.assertEqual(self.db_migrate(conn, self.migrations), 5)
+        columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(trade_summary)')}
+        self.assertEqual(columns['item_sell_price'], 'REAL')
+
+        def failing_migration(conn):
+            conn.execute('CREATE TABLE test (id integer)')
+            raise sqlite3.OperationalError('failed')
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db_migrate(conn, self.migrations + [(6, failing_migration)])
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], 5)  # rolled back
+        self.assertIsNone(self.db_get_object(conn, 'sqlite_master', 'name', 'test'))
+
+    def test_record_prices(self):
+        conn = self.manager.get()
+        self.db_record_prices(conn, [('exalted-orb', 100, 50), ('divine-orb', 200, 10)], recorded=1000)
+        self.db_record_prices(conn, [('exalted-orb', 110, 40)], recorded=2000)
+        price = self.db_get_object(conn, 'prices', 'item_id', 'exalted-orb')
+        self.assertEqual(price[2:], (40, 'up', 10, 110, 100, 110, 2000))
+        self.assertEqual(
+            self.db_get_price_history(conn, 'exalted-orb'), [(100, 50, 1000), (110, 40, 2000)])
+        self.assertEqual(self.db_get_price_history(conn, 'exalted-orb', since=1500), [(110, 40, 2000)])
+
+    def test_downsample_price_history(self):
+        conn = self.manager.get()
+        day = 86400
+        now = 100 * day
+        for recorded in (now - 2 * day, now - 2 * day + 600, now - 2 * day + 3600, now - 60):
+            self.db_record_prices(conn, [('exalted-orb', recorded % 1000, 10)], recorded=recorded)
+        self.db_record_prices(conn, [('exalted-orb', 1, 1)], recorded=now - 40 * day)
+        self.db_downsample_price_history(conn, now=now)
+        self.assertEqual(self.db_get_price_history(conn, 'exalted-orb'), [
+            (((now - 2 * day) % 1000 + (now - 2 * day + 600) % 1000) / 2, 10, now - 2 * day),
+            ((now - 2 * day + 3600) % 1000, 10, now - 2 * day + 3600),
+            ((now - 60) % 1000, 10, now - 60),
+        ])
+        self.db_downsample_price_history(conn, now=now)  # nothing left to downsample
+        self.assertEqual(len(self.db_get_price_history(conn, 'exalted-orb')), 3)
+
+    def simulate_threads(self, get_conn, rounds: int) -> list:
+        """Trader upserts batches, whisper thread updates priority, buyer reads latest users"""
+        def trader():
+            conn = get_conn()
+            for i in range(rounds):
+                self.db_upsert_trade_users(conn, [
+                    self.build_trade_user(f'acc_{j}', price=i) for j in range(i % 20, i % 20 + 20)])
+
+        def whisper():
+            conn = get_conn()
+            for i in range(rounds):
+                self.db_update_object(
+                    conn, self.sql_update_trade_user_priority,
+                    (int(time.time()), 9, 2, f'acc_{i % 40}'))
+
+        def buyer():
+            conn = get_conn()
+            for i in range(rounds):
+                self.db_get_latest_objects(conn, 'trade_users', 'last_trade', amount=10)
+
+        return self.run_threads([trader, whisper, buyer])
+
+    def test_concurrent_threads(self):
+        errors = self.simulate_threads(self.manager.get, 20)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.db_get_all(self.manager.get(), 'trade_users')), 39)
+
+    @pytest.mark.slow
+    def test_benchmark_concurrent_threads(self):
+        rounds = 300
+        started = time.perf_counter()
+        errors = self.simulate_threads(self.manager.get, rounds)
+        managed_time = time.perf_counter() - started
+        self.assertEqual(errors, [])
+
+        legacy_file = 'temp/test_db_legacy.sqlite3'
+        legacy_conn = sqlite3.connect(legacy_file)
+        self.db_create_tables(legacy_conn)
+        legacy_conn.close()
+        started = time.perf_counter()
+        legacy_errors = self.simulate_threads(lambda: sqlite3.connect(legacy_file, timeout=0.1), rounds)
+        legacy_time = time.perf_counter() - started
+        os.remove(legacy_file)
+        print(f'- WAL serialized writer: {managed_time:.2f}s, '
+              f'default journal: {legacy_time:.2f}s, {len(legacy_errors)} thread errors')
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+
+from unittest import TestCase
+
+from ..ignore import IgnoreList
+
+
+class TestIgnoreList(TestCase, IgnoreList):
+    def setUp(self):
+        IgnoreList.__init__(self, file_path='temp/test_ignored_accounts.txt', prefix_matching=True)
+        self.db_conn = sqlite3.connect(':memory:')
+        self.db_conn.execute("""
+            CREATE TABLE ignored_users (
+                id integer PRIMARY KEY,
+                acc_name text NOT NULL UNIQUE,
+                created text NOT NULL
+            );""")
+        with open(self.file_path, 'w', encoding='utf-8') as file:
+            file.write('Acc_1\nacc_2\n')
+
+    def tearDown(self):
+        self.db_conn.close()
+        os.remove(self.file_path)
+
+    def get_db_names(self):
+        return {row[0] for row in self.db_conn.execute('SELECT acc_name FROM ignored_users')}
+
+    def test_load(self):
+        self.db_conn.execute("INSERT INTO ignored_users(acc_name, created) VALUES('acc_0', '')")
+        self.load(self.db_conn)
+        self.assertEqual(self.get_db_names(), {'acc_0', 'acc_1', 'acc_2'})
+        self.assertIn('ACC_1', self)
+        self.assertIn('acc_0', self)
+        self.assertNotIn('acc_3', self)
+
+    def test_sync_appended_lines(self):
+        self.sync_file(self.db_conn)
+        self.assertEqual(self.sync_file(self.db_conn), [])  # nothing appended
+        with open(self.file_path, 'a', encoding='utf-8') as file:
+            file.write('acc_3\nacc_1\nacc_')  # duplicate, partly written line
+        self.assertEqual(self.sync_file(self.db_conn), ['acc_3'])
+        with open(self.file_path, 'a', encoding='utf-8') as file:
+            file.write('4\n')
+        self.assertEqual(self.sync_file(self.db_conn), ['acc_4'])
+        self.assertEqual(self.get_db_names(), {'acc_1', 'acc_2', 'acc_3', 'acc_4'})
+        """Rewritten file is read again"""
+        with open(self.file_path, 'w', encoding='utf-8') as file:
+            file.write('acc_5\n')
+        self.assertEqual(self.sync_file(self.db_conn), ['acc_5'])
+
+    def test_prefix_matching(self):
+        self.add(self.db_conn, ['trade_bot*'])
+        self.assertIn('Trade_Bot_123', self)
+        self.assertNotIn('trade_bo', self)
+        self.assertEqual(self.get_db_names(), {'trade_bot*'})
+
+    def test_prefix_matching_concurrent_add(self):
+        """Lookups never see prefix lengths change during iteration"""
+        def add_prefixes():
+            with self.lock:
+                for i in range(1, 2000):
+                    self.add_local('p' * i + '*')
+
+        thread = threading.Thread(target=add_prefixes)
+        thread.start()
+        while thread.is_alive():
+            self.assertNotIn('acc_x', self)
+        thread.join()
+        self.assertIn('ppp', self)
+        self.assertEqual(len(self.prefix_lengths), 1999)
+
+    def test_append(self):
+        self.sync_file(self.db_conn)
+        self.append(self.db_conn, 'acc_3')
+        self.assertIn('acc_3', self)
+        self.assertEqual(self.sync_file(self.db_conn), [])
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read().splitlines()[-1], 'acc_3')
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+
+from unittest import TestCase
+
+from ..db import ConnectionManager, TradeDB
+from ..ledger import TradeLedger
+
+
+class TestTradeLedger(TestCase, TradeLedger):
+    def setUp(self):
+        TradeLedger.__init__(self, export_path='temp/test_ledger_summary.json')
+        self.db_file = 'temp/test_ledger.sqlite3'
+        self.manager = ConnectionManager(self.db_file)
+        self.db_conn = self.manager.get()
+        TradeDB().db_create_tables(self.db_conn)
+
+    def tearDown(self):
+        self.manager.close()
+        for path in (self.export_path, self.db_file, self.db_file + '-wal', self.db_file + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_import_json(self):
+        with open(self.export_path, 'w', encoding='utf-8') as file:
+            json.dump([
+                {'item_id': 'test', 'item_amount': 5, 'item_buy_price': 3, 'item_sell_price': '40/10'}], file)
+        self.load(self.db_conn)
+        self.assertEqual(dict(self.get('test')), {
+            'item_id': 'test', 'item_amount': 5, 'item_buy_price': 3, 'item_sell_price': '40/10'})
+        self.record(self.db_conn, 'test', 2, price=3)
+        self.export_json()
+        with open(self.export_path, 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file)[0]['item_amount'], 7)
+
+    def test_record(self):
+        self.load(self.db_conn)
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot, ())
+        self.assertIs(self.snapshot(), snapshot)
+        self.record(self.db_conn, 'test', 10, price=4)
+        self.record(self.db_conn, 'test', 3, price=9, side='sell')
+        self.set_price(self.db_conn, 'test', buy_price=4)
+        self.set_price(self.db_conn, 'test', sell_price='45/10')
+        self.assertEqual(dict(self.get('test')), {
+            'item_id': 'test', 'item_amount': 7, 'item_buy_price': 4, 'item_sell_price': '45/10'})
+        self.assertIsNot(self.snapshot(), snapshot)
+        with self.assertRaises(TypeError):
+            self.get('test')['item_amount'] = 0  # read only
+        rows = self.db_conn.execute('SELECT item_id, amount, price, side FROM trade_ledger').fetchall()
+        self.assertEqual(rows, [('test', 10, 4, 'buy'), ('test', 3, 9, 'sell')])
+
+    def test_concurrent_record(self):
+        """Increments from several threads are not lost"""
+        self.load(self.db_conn)
+
+        def buy():
+            for i in range(20):
+                self.record(self.manager.get(), 'test', 1)
+            self.manager.close()
+
+        threads = [threading.Thread(target=buy) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.get('test')['item_amount'], 80)
+        other_conn = sqlite3.connect(self.db_file)
+        self.assertEqual(other_conn.execute('SELECT item_amount FROM trade_summary').fetchone()[0], 80)
+        other_conn.close()
+
+    def test_concurrent_export(self):
+        """Exports from several threads never race on temp file"""
+        self.load(self.db_conn)
+        errors = []
+
+        def export():
+            for i in range(50):
+                try:
+                    self.record(self.manager.get(), 'test', 1)
+                    self.export_json()
+                except Exception as e:
+                    errors.append(e)
+            self.manager.close()
+
+        threads = [threading.Thread(target=export) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with open(self.export_path, 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file)[0]['item_amount'], 150)
+        self.assertEqual([name for name in os.listdir('temp') if name.endswith('.tmp')], [])
+
+    def test_export_changed_json(self):
+        self.assertFalse(self.export_changed_json())  # not loaded
+        self.load(self.db_conn)
+        self.record(self.db_conn, 'test', 2)
+        self.assertTrue(self.export_changed_json())
+        self.assertFalse(self.export_changed_json())  # unchanged since export
+        self.set_price(self.db_conn, 'test', sell_price='45/10')
+        self.assertTrue(self.export_changed_json())
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from ..listings import ListingFilter
+
+
+class TestListingFilter(TestCase, ListingFilter):
+    def setUp(self):
+        ListingFilter.__init__(self, max_bulk_price=85)
+        self.trade_item = {'item_id': 'rusted-bestiary-scarab', 'max_stock_price': 3}
+
+    def build_listing(self, acc_name, price, stock, amount=1, item_id='rusted-bestiary-scarab'):
+        return {
+            'account': {'name': acc_name, 'lastCharacterName': acc_name + '_char', 'online': {}},
+            'indexed': '2022-06-04T11:12:18Z',
+            'whisper': '@' + acc_name + '_char Hi, WTB {0} for {1}',
+            'offers': [{
+                'exchange': {'currency': 'chaos', 'amount': price, 'whisper': '{0} Chaos Orb'},
+                'item': {'currency': item_id, 'amount': amount, 'stock': stock, 'whisper': '{0} Scarab'},
+            }],
+        }
+
+    def test_filter(self):
+        listings = [
+            self.build_listing('acc_1', 1, 10),
+            self.build_listing('Acc_2', 1, 10),  # ignored
+            self.build_listing('acc_3', 4, 10),  # > max_stock_price
+            self.build_listing('acc_4', 5, 10, amount=2),  # 2.5 per item
+            self.build_listing('acc_5', 2, 100),  # capped by max_bulk_price
+            self.build_listing('acc_6', 1, 30, item_id='dense-fossil'),  # fossil stock cap
+        ]
+        cleaned_data = self.filter(listings, self.trade_item, ignored=frozenset(['acc_2']))
+        self.assertEqual([i['account_name'] for i in cleaned_data], ['acc_1', 'acc_4', 'acc_5', 'acc_6'])
+        self.assertEqual(cleaned_data[0]['item_buy_price'], 1)
+        self.assertEqual(cleaned_data[0]['whisper'], '@acc_1_char Hi, WTB 10 Scarab for 10 Chaos Orb')
+        self.assertEqual(cleaned_data[0]['item_sell_name'], 'Rusted Bestiary Scarab')
+        self.assertEqual(cleaned_data[1]['item_buy_price'], 2.5)
+        self.assertEqual(cleaned_data[1]['whisper'], '@acc_4_char Hi, WTB 10 Scarab for 25 Chaos Orb')
+        self.assertEqual(cleaned_data[2]['item_sell_stock'], 40)  # floor(85 / 2) = 42 -> rounded to 5
+        self.assertEqual(cleaned_data[2]['whisper'], '@acc_5_char Hi, WTB 40 Scarab for 80 Chaos Orb')
+        self.assertEqual(cleaned_data[3]['item_sell_stock'], 20)
+
+    def test_filter_empty(self):
+        self.assertEqual(self.filter([], self.trade_item), [])
@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import json
+import socketserver
+import threading
+import time
+
+from unittest import TestCase
+
+from ..live import LiveSearch
+
+
+class StubWebsocketHandler(socketserver.BaseRequestHandler):
+    """Minimal websocket server - handshake, send scripted text frames, close or hold"""
+    guid = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    def handle(self):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = self.request.recv(1024)
+            if not chunk:
+                return
+            request += chunk
+        lines = request.decode().split('\r\n')
+        headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+        accept = base64.b64encode(
+            hashlib.sha1((headers['Sec-WebSocket-Key'] + self.guid).encode()).digest()).decode()
+        self.request.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode())
+
+        server = self.server
+        with server.lock:
+            connection = len(server.connections)
+            server.connections.append((lines[0], headers))
+        script = server.scripts[min(connection, len(server.scripts) - 1)]
+        for message in script['messages']:
+            self.send_frame(json.dumps(message).encode())
+        if script.get('close'):
+            self.request.sendall(b'\x88\x00')
+            return
+        server.stop.wait(5)
+
+    def send_frame(self, payload: bytes, opcode=0x81):
+        if len(payload) < 126:
+            header = bytes([opcode, len(payload)])
+        else:
+            header = bytes([opcode, 126]) + len(payload).to_bytes(2, 'big')
+        self.request.sendall(header + payload)
+
+
+class TestLiveSearch(TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StubWebsocketHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = []
+        self.server.stop = threading.Event()
+        self.server.scripts = [{'messages': []}]
+        self.url = 'ws://127.0.0.1:%s/api/trade/live/Standard' % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pushed = []
+
+    def tearDown(self):
+        self.server.stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def on_listings(self, search_id, context, listing_ids):
+        self.pushed.append((search_id, context, listing_ids))
+
+    def wait_pushed(self, amount, timeout=5):
+        started = time.monotonic()
+        while len(self.pushed) < amount and time.monotonic() - started < timeout:
+            time.sleep(0.01)
+
+    def test_push_listings(self):
+        self.server.scripts = [{'messages': [{'auth': True}, {'new': ['id_1', 'id_2']}]}]
+        live_search = LiveSearch(
+            self.url, self.on_listings, headers=['Cookie: POESESSID=test'])
+        self.assertTrue(live_search.subscribe('search_1', {'item_id': 'chaos'}))
+        self.wait_pushed(1)
+        live_search.stop()
+        self.assertEqual(self.pushed, [('search_1', {'item_id': 'chaos'}, ['id_1', 'id_2'])])
+        request_line, headers = self.server.connections[0]
+        self.assertIn('/api/trade/live/Standard/search_1', request_line)
+        self.assertEqual(headers['Cookie'], 'POESESSID=test')
+
+    def test_reconnect(self):
+        self.server.scripts = [
+            {'messages': [{'new': ['id_1']}], 'close': True},
+            {'messages': [{'new': ['id_2']}]},
+        ]
+        live_search = LiveSearch(self.url, self.on_listings, reconnect_delay=0.05)
+        live_search.subscribe('search_1')
+        self.wait_pushed(2)
+        stats = live_search.stats()
+        live_search.stop()
+        self.assertEqual([ids for _, _, ids in self.pushed], [['id_1'], ['id_2']])
+        self.assertEqual(stats['search_1'], {'connects': 2, 'received': 2})
+
+    def test_subscription_cap(self):
+        live_search = LiveSearch(self.url, self.on_listings, max_subscriptions=2)
+        self.assertTrue(live_search.subscribe('search_1'))
+        self.assertTrue(live_search.subscribe('search_2'))
+        self.assertTrue(live_search.subscribe('search_1'))  # already subscribed
+        self.assertFalse(live_search.subscribe('search_3'))
+        live_search.unsubscribe('search_1')
+        self.assertTrue(live_search.subscribe('search_3'))
+        self.assertEqual(set(live_search.subscriptions), {'search_2', 'search_3'})
+        live_search.stop()
+        self.assertEqual(live_search.subscriptions, {})
+
+    def test_parse_message(self):
+        live_search = LiveSearch(self.url, self.on_listings)
+        self.assertEqual(live_search.parse_message('{"new": ["id_1"]}'), ['id_1'])
+        self.assertEqual(live_search.parse_message('{"auth": true}'), [])
+        self.assertEqual(live_search.parse_message('not json'), [])
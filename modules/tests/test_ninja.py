@@ -0,0 +1,78 @@
+import json
+import os
+
+from unittest import TestCase
+
+from ..ninja import NinjaPriceService
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(body or {}).encode()
+        self.headers = headers or {}
+
+
+class TestNinjaPriceService(TestCase, NinjaPriceService):
+    def setUp(self):
+        self.snapshot_file = 'temp/test_ninja_prices.json'
+        self.requests = []
+        self.lines = {
+            'Currency': [{'currencyTypeName': 'Exalted Orb', 'detailsId': 'exalted-orb', 'chaosEquivalent': 120}],
+            'Scarab': [{'detailsId': 'rusted-expedition-scarab', 'chaosValue': 2, 'listingCount': 50}],
+        }
+        NinjaPriceService.__init__(
+            self, self.fake_get, lambda overview, item_type: f'{overview}?type={item_type}',
+            [('currencyoverview', 'Currency'), ('itemoverview', 'Scarab')], snapshot_path=self.snapshot_file)
+
+    def tearDown(self):
+        if os.path.exists(self.snapshot_file):
+            os.remove(self.snapshot_file)
+
+    def fake_get(self, url, headers=None, timeout=None):
+        self.requests.append((url, headers))
+        item_type = url.split('=')[1]
+        etag = f'"{item_type}-1"'
+        if headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, {'lines': self.lines[item_type]}, {'ETag': etag})
+
+    def test_refresh_index(self):
+        self.assertEqual(len(self.refresh()), 2)
+        self.assertEqual(self.get_price('Exalted Orb')['chaosEquivalent'], 120)
+        self.assertEqual(self.get_price('exalted-orb')['chaosEquivalent'], 120)
+        self.assertEqual(self.get_price('rusted-expedition-scarab')['chaosValue'], 2)
+        self.assertIsNone(self.get_price('missing'))
+        self.assertEqual(len(self.requests), 2)  # lookups within ttl don't fetch
+
+    def test_refresh_not_modified(self):
+        self.refresh()
+        self.assertEqual(self.refresh(force=True), [])
+        self.assertEqual(self.requests[-1][1], {'If-None-Match': '"Scarab-1"'})
+        self.assertEqual(self.stats()['not_modified'], 2)
+        self.assertEqual(self.get_price('exalted-orb')['chaosEquivalent'], 120)
+
+    def test_refresh_ttl(self):
+        self.refresh()
+        self.entries[('itemoverview', 'Scarab')]['checked_at'] -= self.ttl
+        self.refresh()
+        self.assertEqual([url for url, headers in self.requests[2:]], ['itemoverview?type=Scarab'])
+
+    def test_refresh_error(self):
+        self.get = lambda url, **kwargs: self.requests.append(url) or FakeResponse(500)
+        self.assertEqual(self.refresh(), [])
+        self.assertEqual(self.stats()['errors'], 2)
+        for i in range(5):
+            self.assertIsNone(self.get_price('exalted-orb'))
+        self.assertEqual(self.refresh(), [])
+        self.assertEqual(len(self.requests), 2)  # failed overviews retried after ttl
+
+    def test_snapshot_warm_start(self):
+        self.refresh()
+        self.entries.clear()
+        self.index.clear()
+        self.load_snapshot()
+        self.assertEqual(self.get_price('rusted-expedition-scarab')['chaosValue'], 2)
+        self.assertEqual(len(self.requests), 2)  # snapshot within ttl
+        self.refresh(force=True)
+        self.assertEqual(self.stats()['not_modified'], 2)  # validators restored
@@ -0,0 +1,56 @@
+import collections
+import os
+import time
+
+from unittest import TestCase
+
+from ..proxy import ProxyManager
+
+
+class TestProxyManager(TestCase, ProxyManager):
+    def setUp(self):
+        self.keys = ['127.0.0.1:8001', '127.0.0.1:8002', '127.0.0.1:8003']
+        ProxyManager.__init__(
+            self, self.keys, stats_path='temp/test_proxy_stats.json', max_failures=2, backoff_base=10)
+
+    def tearDown(self):
+        if os.path.exists(self.stats_path):
+            os.remove(self.stats_path)
+
+    def test_quarantine_backoff(self):
+        key = self.keys[0]
+        self.record_failure(key, 'ProxyError')
+        self.assertFalse(self.check_quarantined(key))
+        self.record_failure(key, 'ProxyError')
+        self.assertTrue(self.check_quarantined(key))
+        self.assertAlmostEqual(self.get_stats(key)['quarantined_until'], time.time() + 10, delta=1)
+        self.record_failure(key)
+        self.record_failure(key)
+        self.assertAlmostEqual(self.get_stats(key)['quarantined_until'], time.time() + 20, delta=1)
+        self.assertNotIn(key, self.ranked_keys())
+
+    def test_all_quarantined(self):
+        for i, key in enumerate(self.keys):
+            self.get_stats(key)['quarantined_until'] = time.time() + 100 - i
+        self.assertEqual(self.ranked_keys(), [self.keys[-1]])
+
+    def test_weighted_selection(self):
+        for i in range(20):
+            self.record_success(self.keys[0], 0.1)
+            self.record_success(self.keys[1], 0.1)
+            self.record_failure(self.keys[1])
+            self.get_stats(self.keys[1])['consecutive_failures'] = 0
+        selected = collections.Counter(self.select() for i in range(2000))
+        self.assertTrue(selected[self.keys[0]] > selected[self.keys[1]])
+        summary = self.get_summary()
+        self.assertEqual(summary[0]['share'], 50)
+
+    def test_persist_stats(self):
+        self.record_success(self.keys[0], 0.25)
+        self.record_failure(self.keys[1], 'timeout')
+        self.record_failure(self.keys[1], 'timeout')
+        self.save_stats()
+        proxy_manager = ProxyManager(self.keys, stats_path=self.stats_path)
+        self.assertEqual(proxy_manager.get_stats(self.keys[0])['successes'], 1)
+        self.assertEqual(list(proxy_manager.get_stats(self.keys[0])['latency']), [0.25])
+        self.assertTrue(proxy_manager.check_quarantined(self.keys[1]))
@@ -0,0 +1,84 @@
+import json
+import time
+import pytest
+
+from jinja2 import Environment, PackageLoader, select_autoescape
+from unittest import TestCase
+
+from ..query import TradeQueryBuilder
+
+
+class TestTradeQueryBuilder(TestCase, TradeQueryBuilder):
+    def setUp(self):
+        TradeQueryBuilder.__init__(self)
+        with open('temp/example_trade_items.json', 'r', encoding='utf-8') as f:
+            self.trade_items = json.load(f)
+        self.trade_item = {
+            'item_id': 'rusted-bestiary-scarab',
+            'buyout_currency': 'chaos',
+            'type': 'scarab',
+            'min_stock_amount': 2,
+            'min_price': 1,
+            'max_price': 5,
+        }
+
+    def test_get_query(self):
+        body = self.get_query(self.trade_item, bulk=True)
+        query = json.loads(body)
+        self.assertEqual(query['exchange']['have'], ['chaos'])
+        self.assertEqual(query['exchange']['want'], ['rusted-bestiary-scarab'])
+        self.assertEqual(query, self.render_query(self.trade_item, bulk=True))
+        body = self.get_query(self.trade_item, bulk=False)
+        self.assertEqual(json.loads(body)['query']['filters']['trade_filters']['filters']['price']['max'], 5)
+
+    def test_get_query_cached(self):
+        body = self.get_query(self.trade_item, bulk=True)
+        self.assertIs(self.get_query(dict(self.trade_item, disabled=True), bulk=True), body)
+        self.assertEqual(self.builds, 1)
+        """Query fields changed - rebuild"""
+        body = self.get_query(dict(self.trade_item, buyout_currency='divine'), bulk=True)
+        self.assertEqual(json.loads(body)['exchange']['have'], ['divine'])
+        self.assertEqual(self.builds, 2)
+
+    def test_get_batch_query(self):
+        trade_items = [
+            self.trade_item,
+            dict(self.trade_item, item_id='gilded-bestiary-scarab', min_stock_amount=1),
+        ]
+        body = self.get_batch_query(trade_items)
+        query = json.loads(body)
+        self.assertEqual(query['exchange']['have'], ['chaos'])
+        self.assertEqual(query['exchange']['want'], ['rusted-bestiary-scarab', 'gilded-bestiary-scarab'])
+        self.assertIs(self.get_batch_query(trade_items), body)
+        trade_items[1] = dict(trade_items[1], min_stock_amount=5)
+        self.assertIsNot(self.get_batch_query(trade_items), body)
+        self.assertEqual(self.builds, 2)
+
+    @pytest.mark.slow
+    def test_benchmark(self):
+        """Per request CPU over trade_items cycle: jinja render per request vs cached body"""
+        cycles = 50
+        started = time.process_time()
+        for i in range(cycles):
+            for trade_item in self.trade_items:
+                env = Environment(
+                    loader=PackageLoader('templates', 'trader'),
+                    autoescape=select_autoescape())
+                template = env.get_template(self.bulk_template)
+                rendered = template.render(
+                    have_item=[trade_item['buyout_currency']],
+                    want_item=[trade_item['item_id']],
+                    min_stock_amount=trade_item['min_stock_amount']
+                ).replace("'", '"')
+                json.dumps(json.loads(rendered)).encode('utf-8')  # requests json= encoding
+        render_us = (time.process_time() - started) / (cycles * len(self.trade_items)) * 1e6
+
+        started = time.process_time()
+        for i in range(cycles):
+            for trade_item in self.trade_items:
+                self.get_query(trade_item, bulk=True)
+        cached_us = (time.process_time() - started) / (cycles * len(self.trade_items)) * 1e6
+
+        print(f'\n- Render per request: {render_us:.1f}us, cached body: {cached_us:.1f}us')
+        self.assertEqual(self.builds, len({i['item_id'] for i in self.trade_items}))
+        self.assertTrue(cached_us < render_us)
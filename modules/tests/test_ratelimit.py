@@ -0,0 +1,95 @@
+import threading
+import time
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from ..ratelimit import RateLimitGovernor
+
+
+class RateLimitStubHandler(BaseHTTPRequestHandler):
+    """Trade API stub - sliding window ip limit with restriction penalty"""
+    max_hits = 4
+    period = 0.5
+    restriction = 2
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        now = time.monotonic()
+        with server.lock:
+            server.hits = [hit for hit in server.hits if hit > now - self.period] + [now]
+            if len(server.hits) > self.max_hits and server.restricted_until < now:
+                server.restricted_until = now + self.restriction
+                server.violations += 1
+            restricted = max(server.restricted_until - now, 0)
+            state = f'{len(server.hits)}:{self.period}:{int(restricted)}'
+        status = 429 if restricted else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Rate-Limit-Policy', 'trade-exchange-request-limit')
+        self.send_header('X-Rate-Limit-Rules', 'Ip')
+        self.send_header('X-Rate-Limit-Ip', f'{self.max_hits}:{self.period}:{self.restriction}')
+        self.send_header('X-Rate-Limit-Ip-State', state)
+        if restricted:
+            self.send_header('Retry-After', str(self.restriction))
+        self.end_headers()
+        self.wfile.write(b'{"result": {}}' if status == 200 else b'{"error": {"code": 3}}')
+
+
+class TestRateLimitGovernor(TestCase, RateLimitGovernor):
+    def setUp(self):
+        RateLimitGovernor.__init__(self, default_rules='2:10:60')
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RateLimitStubHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = []
+        self.server.restricted_until = 0
+        self.server.violations = 0
+        self.url = 'http://127.0.0.1:%s/api/trade/exchange/Standard' % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_parse_rules(self):
+        self.assertEqual(self.parse_rules('7:15:60,15:90:120'), [(7, 15, 60), (15, 90, 120)])
+        self.assertEqual(self.parse_rules(''), [])
+
+    def test_update_state(self):
+        headers = {
+            'X-Rate-Limit-Rules': 'Ip,Account',
+            'X-Rate-Limit-Ip': '6:10:60',
+            'X-Rate-Limit-Ip-State': '5:10:0',
+            'X-Rate-Limit-Account': '3:5:60',
+            'X-Rate-Limit-Account-State': '0:5:0',
+        }
+        self.update('proxy_1', headers)
+        self.assertEqual(set(self.get_rules('proxy_1', 'exchange')), {'ip', 'account'})
+        self.assertTrue(self.reserve('proxy_1') > 9)  # 5 of 5 safe hits used by other client
+        self.assertTrue(self.reserve('proxy_2') < 0.1)  # unknown proxy - default rules
+
+    def test_restriction(self):
+        self.update('proxy_1', {'Retry-After': '30'}, status_code=429)
+        self.assertTrue(self.reserve('proxy_1') > 29)
+        key, delay = self.reserve_any(['proxy_1', 'proxy_2'])
+        self.assertEqual(key, 'proxy_2')
+        self.assertTrue(delay < 0.1)
+
+    def test_stub_unpaced(self):
+        status_codes = [requests.post(self.url).status_code for i in range(6)]
+        self.assertIn(429, status_codes)
+        self.assertEqual(self.server.violations, 1)
+
+    def test_stub_paced(self):
+        started = time.monotonic()
+        for i in range(10):
+            self.wait('local')
+            resp = requests.post(self.url)
+            self.update('local', resp.headers, resp.status_code)
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.server.violations, 0)
+        self.assertTrue(time.monotonic() - started < 5)
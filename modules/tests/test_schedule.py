@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from ..schedule import TradeItemScheduler
+
+
+class TestTradeItemScheduler(TestCase, TradeItemScheduler):
+    def setUp(self):
+        TradeItemScheduler.__init__(self, base_interval=10, min_interval=2, max_interval=120, smoothing=1)
+        self.trade_items = [
+            {'item_id': 'hot', 'max_stock_price': 10, 'buy_limit': 100, 'disabled': False},
+            {'item_id': 'cold', 'max_stock_price': 10, 'buy_limit': 100, 'disabled': False},
+            {'item_id': 'done', 'max_stock_price': 10, 'buy_limit': 100, 'disabled': False},
+            {'item_id': 'off', 'max_stock_price': 10, 'disabled': True},
+        ]
+        self.update_items(self.trade_items, now=0)
+
+    def build_listings(self, *prices):
+        return [{'item_buy_price': price} for price in prices]
+
+    def test_update_items(self):
+        self.assertEqual(set(self.states), {'hot', 'cold', 'done'})
+        trade_item, delay = self.next_item(now=0)
+        self.assertEqual((trade_item['item_id'], delay), ('hot', 0))  # new items due in order
+        self.trade_items[0]['disabled'] = True
+        self.trade_items[3]['disabled'] = False
+        self.update_items(self.trade_items, now=1)
+        self.assertEqual(set(self.states), {'cold', 'done', 'off'})
+        self.assertEqual(self.next_item(now=1)[0]['item_id'], 'cold')
+
+    def test_intervals(self):
+        hot = self.record_poll('hot', self.build_listings(5, 6), churn=10, bought=0, now=0)
+        cold = self.record_poll('cold', self.build_listings(10), churn=0, bought=0, now=0)
+        done = self.record_poll('done', self.build_listings(5), churn=10, bought=100, now=0)
+        self.assertEqual(hot, 2)  # 10 / (6 * 1.25) clamped to min_interval
+        self.assertEqual(cold, 20)  # 10 / (1 * 0.5)
+        self.assertTrue(done > hot)
+        self.assertEqual(self.record_poll('missing', []), 0)
+
+        """Hot item polled more often than cold and buy_limit reached items"""
+        polls = {'hot': 0, 'cold': 0, 'done': 0}
+        now = 0
+        while now < 120:
+            trade_item, delay = self.next_item(now)
+            if delay:
+                now += delay
+                continue
+            item_id = trade_item['item_id']
+            polls[item_id] += 1
+            churn, bought = {'hot': (10, 0), 'cold': (0, 0), 'done': (10, 100)}[item_id]
+            self.record_poll(item_id, self.build_listings(5 if item_id != 'cold' else 10), churn, bought, now)
+        self.assertTrue(polls['hot'] > polls['done'] > 0)
+        self.assertTrue(polls['hot'] > polls['cold'] > 0)
+
+    def test_record_error(self):
+        self.record_error('hot', now=0)
+        trade_item, delay = self.next_item(now=0)
+        self.assertEqual((trade_item['item_id'], delay), ('cold', 0))
+        self.record_poll('cold', [], now=0)
+        self.record_poll('done', [], now=0)
+        trade_item, delay = self.next_item(now=0)
+        self.assertEqual((trade_item['item_id'], delay), ('hot', 10))
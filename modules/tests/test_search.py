@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+from unittest import TestCase
+
+from ..cache import SearchCache
+from ..ratelimit import RateLimitGovernor
+from ..search import AsyncTradeSearch, TradeApiError
+
+
+class FakeTrader:
+    def __init__(self, request_delay=0.1, errors=()):
+        self.request_delay = request_delay
+        self.errors = errors
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+        self.requests = []
+        self.processed = []
+        self.process_threads = set()
+        self.load_threads = set()
+        self.search_cache = SearchCache()
+
+    def proxy_key(self, proxy):
+        return proxy.get('http', 'direct') if proxy else 'direct'
+
+    def api_request(self, trade_item, bulk=False, proxy=None):
+        return self.search_cache.get_or_fetch(trade_item['item_id'], self.api_search, trade_item, bulk, proxy)
+
+    def api_search(self, trade_item, bulk, proxy):
+        proxy = proxy('exchange' if bulk else 'search')
+        with self.lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            self.requests.append((time.monotonic(), proxy['http']))
+        time.sleep(self.request_delay)
+        with self.lock:
+            self.inflight -= 1
+        if trade_item['item_id'] in self.errors:
+            return {'error': {'code': 3, 'message': 'Rate limit exceeded'}}
+        return {'result': {}}
+
+    def clean_search_response(self, trade_item, response):
+        return response
+
+    def process_search_response(self, trade_item, response, response_ts):
+        self.process_threads.add(threading.get_ident())
+        self.processed.append(trade_item['item_id'])
+
+
+class TestAsyncTradeSearch(TestCase):
+    def setUp(self):
+        self.proxies = [{'http': f'http://127.0.0.{i}:8080'} for i in range(4)]
+        self.trade_items = [({'item_id': f'item-{i}'}, True) for i in range(8)]
+
+    def test_run_cycle_concurrent(self):
+        trader = FakeTrader(request_delay=0.1)
+        governor = RateLimitGovernor(default_rules='3:1:0')  # 2 hits per proxy
+        search = AsyncTradeSearch(trader, self.proxies, governor, search_cache=trader.search_cache, max_inflight=4)
+        asyncio.run(search.run(lambda: trader.load_threads.add(threading.get_ident()) or self.trade_items, cycles=1))
+        self.assertEqual(sorted(trader.processed), sorted(i[0]['item_id'] for i in self.trade_items))
+        self.assertEqual(trader.max_inflight, 4)
+        self.assertEqual(len(trader.process_threads), 1)
+        self.assertEqual(trader.load_threads, trader.process_threads)  # blocking io off the event loop
+        self.assertTrue(search.cycle_time < 0.6)  # sequential - 0.8s
+
+    def test_proxy_delay(self):
+        trader = FakeTrader(request_delay=0)
+        governor = RateLimitGovernor(default_rules='2:0.2:0')
+        search = AsyncTradeSearch(trader, self.proxies[:2], governor, max_inflight=4)
+        asyncio.run(search.run(lambda: self.trade_items[:4], cycles=1))
+        for proxy in ('http://127.0.0.0:8080', 'http://127.0.0.1:8080'):
+            timestamps = [ts for ts, p in trader.requests if p == proxy]
+            self.assertEqual(len(timestamps), 2)
+            self.assertTrue(timestamps[1] - timestamps[0] >= 0.19)
+
+    def test_api_overuse(self):
+        trader = FakeTrader(request_delay=0, errors=('item-0',))
+        governor = RateLimitGovernor(default_rules='100:1:0')
+        search = AsyncTradeSearch(trader, self.proxies[:1], governor, max_inflight=1, overuse_delay=0.3)
+        asyncio.run(search.run(lambda: self.trade_items[:2], cycles=1))
+        self.assertEqual(trader.processed, ['item-1'])
+        self.assertTrue(trader.requests[1][0] - trader.requests[0][0] >= 0.29)
+
+    def test_cache_hit_no_reservation(self):
+        trader = FakeTrader(request_delay=0)
+        governor = RateLimitGovernor(default_rules='1:10:0')  # second reservation would wait 10s
+        search = AsyncTradeSearch(trader, self.proxies[:1], governor, max_inflight=1)
+        started = time.monotonic()
+        asyncio.run(search.run(lambda: self.trade_items[:1], cycles=2))
+        self.assertTrue(time.monotonic() - started < 1)
+        self.assertEqual(len(trader.requests), 1)
+        self.assertEqual(trader.processed, ['item-0', 'item-0'])
+
+    def test_check_api_overuse(self):
+        search = AsyncTradeSearch(FakeTrader(), self.proxies[:1], RateLimitGovernor())
+        with self.assertRaises(TradeApiError) as context:
+            search.check_api_response({'error': {'code': 2, 'message': 'Invalid query'}})
+        self.assertFalse(search.check_api_overuse(context.exception))
+        with self.assertRaises(TradeApiError) as context:
+            search.check_api_response({'error': {'code': 3, 'message': 'Rate limit exceeded'}})
+        self.assertTrue(search.check_api_overuse(context.exception))
+        self.assertFalse(search.check_api_overuse(KeyError('id')))
@@ -0,0 +1,51 @@
+import time
+
+from unittest import TestCase
+
+from ..seen import SeenListings
+
+
+class TestSeenListings(TestCase, SeenListings):
+    def setUp(self):
+        SeenListings.__init__(self, ttl=60)
+
+    def build_listing(self, acc_name, price=1, stock=10, indexed='2022-06-04T11:12:18Z'):
+        return {
+            'account_name': acc_name,
+            'item_sell_id': 'rusted-bestiary-scarab',
+            'item_buy_price': price,
+            'item_sell_stock': stock,
+            'item_indexed': indexed,
+        }
+
+    def test_filter(self):
+        listings = [self.build_listing('acc_1'), self.build_listing('acc_2')]
+        self.assertEqual(self.filter(listings), (listings, {'new': 2, 'changed': 0, 'skipped': 0}))
+
+        listings = [
+            self.build_listing('acc_1'),  # unchanged
+            self.build_listing('acc_2', price=2),
+            self.build_listing('acc_3'),
+        ]
+        self.assertEqual(self.filter(listings), (listings[1:], {'new': 1, 'changed': 1, 'skipped': 1}))
+        self.assertEqual(self.stats()['cycle'], {'new': 1, 'changed': 1, 'skipped': 1})
+        stats = self.stats()
+        self.assertEqual((stats['new'], stats['changed'], stats['skipped']), (3, 1, 1))
+        self.assertEqual(stats['size'], 3)
+
+    def test_ttl(self):
+        listing = self.build_listing('acc_1')
+        self.filter([listing])
+        self.assertEqual(self.filter([listing])[0], [])
+        """Expired listing processed as new, then evicted"""
+        self.listings[self.listing_key(listing)] = (self.listing_fingerprint(listing), time.monotonic() - 61)
+        self.assertEqual(self.filter([listing]), ([listing], {'new': 1, 'changed': 0, 'skipped': 0}))
+        self.listings[self.listing_key(listing)] = (self.listing_fingerprint(listing), time.monotonic() - 61)
+        self.assertEqual(self.evict(time.monotonic()), 1)
+        self.assertEqual(self.listings, {})
+
+    def test_forget(self):
+        listing = self.build_listing('acc_1')
+        self.filter([listing])
+        self.forget([self.listing_key(listing)])
+        self.assertEqual(self.filter([listing])[0], [listing])
@@ -0,0 +1,119 @@
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import pytest
+import requests
+import urllib3
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from ..session import SessionPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        status = 403 if self.path == '/challenge' else 200
+        body = b'{"result": {}}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestSessionPool(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.url = 'http://127.0.0.1:%s' % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuse_session(self):
+        pool = SessionPool()
+        for i in range(5):
+            resp = pool.get('proxy_1', self.url + '/fetch')
+            self.assertEqual(resp.status_code, 200)
+        pool.get('proxy_2', self.url + '/fetch')
+        stats = pool.latency_stats()
+        self.assertEqual(stats['proxy_1']['requests'], 5)
+        self.assertEqual(stats['proxy_1']['created'], 1)
+        self.assertEqual(stats['proxy_2']['created'], 1)
+
+    def test_expire_session(self):
+        pool = SessionPool()
+        pool.get('proxy_1', self.url + '/challenge')
+        pool.get('proxy_1', self.url + '/fetch')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            pool.get('proxy_1', 'http://127.0.0.1:1/fetch')
+        pool.get('proxy_1', self.url + '/fetch')
+        stats = pool.latency_stats()['proxy_1']
+        self.assertEqual(stats['expired'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['created'], 3)
+
+    def test_max_age(self):
+        pool = SessionPool(max_age=0)
+        pool.get('proxy_1', self.url + '/fetch')
+        pool.get('proxy_1', self.url + '/fetch')
+        self.assertEqual(pool.latency_stats()['proxy_1']['created'], 2)
+
+
+@pytest.mark.slow
+class TestSessionPoolBenchmark(TestCase):
+    """Per request latency: new session per request vs pooled keep-alive session over HTTPS"""
+    def setUp(self):
+        if not shutil.which('openssl'):
+            self.skipTest('openssl not found')
+        self.cert_dir = tempfile.mkdtemp()
+        cert = os.path.join(self.cert_dir, 'cert.pem')
+        key = os.path.join(self.cert_dir, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=127.0.0.1', '-keyout', key, '-out', cert],
+            check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self.url = 'https://127.0.0.1:%s/fetch' % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        urllib3.disable_warnings()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cert_dir)
+
+    def test_benchmark(self):
+        requests_amount = 50
+        started = time.monotonic()
+        for i in range(requests_amount):
+            session = requests.Session()
+            session.get(self.url, verify=False)
+            session.close()
+        new_session_ms = (time.monotonic() - started) / requests_amount * 1000
+
+        pool = SessionPool()
+        started = time.monotonic()
+        for i in range(requests_amount):
+            pool.get('proxy_1', self.url, verify=False)
+        pooled_ms = (time.monotonic() - started) / requests_amount * 1000
+        pool.close()
+
+        print(f'\n- New session: {new_session_ms:.2f}ms/request, pooled: {pooled_ms:.2f}ms/request')
+        print('- Pool stats:', pool.latency_stats())
+        self.assertTrue(pooled_ms < new_session_ms)
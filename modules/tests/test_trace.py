@@ -0,0 +1,59 @@
+import os
+
+from unittest import TestCase
+
+from ..trace import TradeTracer
+
+
+class TestTradeTracer(TestCase, TradeTracer):
+    def setUp(self):
+        TradeTracer.__init__(self, trace_path='temp/test_trade_trace.jsonl')
+
+    def tearDown(self):
+        self.close()
+        for path in (self.trace_path, self.trace_path + '.1'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_parse_indexed(self):
+        self.assertEqual(self.parse_indexed('1970-01-01T00:01:40Z'), 100)
+        self.assertIsNone(self.parse_indexed(None))
+        self.assertIsNone(self.parse_indexed('2022/06/04'))
+
+    def test_span(self):
+        self.span('whisper_send', 'TestAcc', ts=100.1234)
+        self.span('whisper_send', '', ts=101)  # skipped - no account
+        self.close()
+        traces = self.load_traces()
+        self.assertEqual(traces, [(100.123, 'whisper_send', 'testacc')])
+
+    def test_rotate(self):
+        self.max_bytes = 100
+        for i in range(10):
+            self.span('whisper_send', f'acc_{i}', ts=100 + i)  # 30 bytes per line
+        self.close()
+        self.assertTrue(os.path.getsize(self.trace_path + '.1') >= 100)
+        self.assertTrue(os.path.getsize(self.trace_path) < 100)
+        self.assertEqual(len(self.load_traces()), 10 - 4)  # oldest rotation dropped
+
+    def test_summarize(self):
+        traces = []
+        for i in range(10):
+            acc_name = f'acc_{i}'
+            traces += [
+                (1000 + i, 'indexed', acc_name),
+                (1010 + i, 'api_request', acc_name),
+                (1011 + i, 'build_cleaned_data', acc_name),
+                (1000 + i, 'indexed', acc_name),  # next cycle, same listing
+                (1012 + i, 'whisper_enqueue', acc_name),
+                (1012 + i * 2, 'whisper_send', acc_name),
+                (1030 + i * 2, 'trade_accepted', acc_name),  # no party_invite - skipped stage
+            ]
+        summary = self.summarize(traces=sorted(traces))
+        self.assertEqual(summary['api_request'], {'count': 10, 'p50': 10, 'p95': 10})
+        self.assertEqual(summary['whisper_send']['p50'], 4)
+        self.assertEqual(summary['whisper_send']['p95'], 9)
+        self.assertEqual(summary['party_invite']['count'], 0)
+        self.assertEqual(summary['trade_accepted']['count'], 0)
+        self.assertEqual(summary['total']['count'], 10)
+        self.assertEqual(summary['total']['p50'], 34)
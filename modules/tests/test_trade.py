@@ -1,10 +1,15 @@
+import random
 import re
 import os
+import sqlite3
 import time
 import pytest
 
 from unittest import TestCase
 
+from ..ledger import TradeLedger
+from ..live import LiveSearch
+from ..search import TradeApiError
 from ..trade import Prices, ClientLog, TradeBot
 
 
@@ -32,18 +37,30 @@ class TestPrices(TestCase, Prices):
 
     @pytest.mark.slow
     def test_get_ninja_exalt_ratio(self):
+        self.ninja_prices.refresh()
         exalt_price = self.get_ninja_exalt_price()
         self.assertTrue(isinstance(exalt_price, int))
         self.assertTrue(exalt_price >= 50)
 
     @pytest.mark.slow
     def test_get_ninja_scarab_price(self):
+        self.ninja_prices.refresh()
         resp = self.get_ninja_scarab_price(self.scarab_id)
         self.assertTrue(isinstance(resp, dict))
         self.assertTrue(len(resp) == 4)
         self.assertTrue(resp['item_id'] == self.scarab_id)
         self.assertTrue(resp['chaos_value'] >= 1)
 
+    def test_build_ninja_prices(self):
+        resp = {'lines': [
+            {'detailsId': 'exalted-orb', 'chaosEquivalent': 120.5, 'receive': {'listing_count': 300}},
+            {'detailsId': 'rusted-expedition-scarab', 'chaosValue': 2, 'listingCount': 50},
+            {'detailsId': 'no-price'},
+        ]}
+        self.assertEqual(self.build_ninja_prices(resp), [
+            ('exalted-orb', 120.5, 300), ('rusted-expedition-scarab', 2, 50)])
+        self.assertEqual(self.build_ninja_prices(None), [])
+
 
 class TestClientLog(TestCase, ClientLog):
     def setUp(self):
@@ -156,6 +173,15 @@ class TestTradeBot(TestCase, TradeBot):
     def setUp(self):
         TradeBot.__init__(self)
         self.trade_summary_path = 'temp/test_trade_summary.json'
+        self.trade_ledger_db = 'temp/test_trade_ledger.sqlite3'
+        self.trade_ledger = TradeLedger(export_path=self.trade_summary_path)
+
+    def tearDown(self):
+        self.db_get_connection_manager(self.trade_ledger_db).close()
+        for path in (self.trade_summary_path, self.trade_ledger_db,
+                     self.trade_ledger_db + '-wal', self.trade_ledger_db + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
 
     @pytest.mark.slow
     def test_stash_activate_tab(self):
@@ -196,36 +222,245 @@ class TestTradeBot(TestCase, TradeBot):
     def test_unstuck_currency(self):
         self.unstuck_currency((1297, 615), 5)
 
+    def build_exchange_listing(self, acc_name, item_id, price, stock, amount=1):
+        return {'listing': {
+            'account': {'name': acc_name, 'lastCharacterName': acc_name + '_char', 'online': {}},
+            'indexed': '2022-06-04T11:12:18Z',
+            'whisper': '@{} Hi, WTB {{0}} for {{1}}',
+            'offers': [{
+                'exchange': {'currency': 'chaos', 'amount': price, 'whisper': '{0} Chaos Orb'},
+                'item': {'currency': item_id, 'amount': amount, 'stock': stock, 'whisper': '{0} Scarab'},
+            }],
+        }}
+
+    def test_build_cleaned_batch_data(self):
+        trade_items = [
+            {'item_id': 'rusted-bestiary-scarab', 'max_stock_price': 2},
+            {'item_id': 'gilded-bestiary-scarab', 'max_stock_price': 10},
+        ]
+        data = {'result': {
+            '1': self.build_exchange_listing('acc_1', 'rusted-bestiary-scarab', 1, 10),
+            '2': self.build_exchange_listing('acc_2', 'rusted-bestiary-scarab', 3, 10),  # > max_stock_price
+            '3': self.build_exchange_listing('acc_3', 'gilded-bestiary-scarab', 9, 5),
+            '4': self.build_exchange_listing('acc_4', 'gilded-bestiary-scarab', 10, 5, amount=2),
+            '5': self.build_exchange_listing('acc_5', 'winged-bestiary-scarab', 1, 5),  # not requested
+        }}
+        cleaned_data = self.build_cleaned_batch_data(data, trade_items)
+        self.assertEqual(set(cleaned_data), {'rusted-bestiary-scarab', 'gilded-bestiary-scarab'})
+        self.assertEqual([i['account_name'] for i in cleaned_data['rusted-bestiary-scarab']], ['acc_1'])
+        gilded = cleaned_data['gilded-bestiary-scarab']
+        self.assertEqual([i['account_name'] for i in gilded], ['acc_3', 'acc_4'])
+        self.assertEqual(gilded[1]['item_buy_price'], 5)
+        """Single item response gives the same listings"""
+        single_data = {'result': {k: v for k, v in data['result'].items() if k in ('3', '4')}}
+        self.assertEqual(self.build_cleaned_data(single_data, trade_items[1]), gilded)
+
+    def build_recorded_response(self, amount):
+        random.seed(amount)
+        item_ids = ['rusted-bestiary-scarab', 'gilded-bestiary-scarab', 'dense-fossil']
+        return {'result': {
+            str(i): self.build_exchange_listing(
+                f'acc_{i}', random.choice(item_ids), random.choice([1, 2, 3, 5, 7, 12]),
+                random.randint(1, 200), amount=random.choice([1, 1, 1, 2, 3]))
+            for i in range(amount)}}
+
+    def build_cleaned_data_rows(self, data, trade_item):
+        cleaned_data = []
+        for obj in data['result'].values():
+            listing = self.build_cleaned_listing(obj['listing'], trade_item)
+            if listing:
+                cleaned_data.append(listing)
+        return cleaned_data
+
+    def test_build_cleaned_data_columnar(self):
+        self.ignore_list.accounts = {'acc_3', 'acc_10'}
+        trade_item = {'item_id': 'rusted-bestiary-scarab', 'max_stock_price': 5}
+        data = self.build_recorded_response(500)
+        self.assertEqual(
+            self.build_cleaned_data(data, trade_item), self.build_cleaned_data_rows(data, trade_item))
+
+    @pytest.mark.slow
+    def test_build_cleaned_data_benchmark(self):
+        self.ignore_list.accounts = {f'acc_{i * 7}' for i in range(500)}
+        trade_item = {'item_id': 'rusted-bestiary-scarab', 'max_stock_price': 5}
+        data = self.build_recorded_response(20000)
+        started = time.perf_counter()
+        rows = self.build_cleaned_data_rows(data, trade_item)
+        rows_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        columnar = self.build_cleaned_data(data, trade_item)
+        columnar_ms = (time.perf_counter() - started) * 1000
+        print(f'\n- 20000 listings: row loop {rows_ms:.1f}ms, columnar {columnar_ms:.1f}ms')
+        self.assertEqual(columnar, rows)  # timings printed only - wall clock order not stable
+
+    def build_fetch_listing(self, listing_id, acc_name, price, stack_size=1, currency='chaos'):
+        return {'id': listing_id, 'listing': {
+            'account': {'name': acc_name, 'lastCharacterName': acc_name + '_char', 'online': {}},
+            'indexed': '2022-06-04T11:12:18Z',
+            'whisper': f'@{acc_name}_char Hi, I would like to buy your The Doctor listed for {price} {currency}',
+            'price': {'type': '~price', 'amount': price, 'currency': currency},
+        }, 'item': {'name': '', 'typeLine': 'The Doctor', 'stackSize': stack_size}}
+
+    def test_api_fetch_pages(self):
+        self.trader_switch = 1
+        self.search_max_inflight = 2
+        trade_item = {
+            'item_id': 'the-doctor', 'buyout_currency': 'chaos', 'max_price': 5, 'min_stock_amount': 1}
+        listings = [
+            self.build_fetch_listing('1', 'acc_1', 3),
+            self.build_fetch_listing('2', 'acc_2', 4, stack_size=2),
+            self.build_fetch_listing('3', 'acc_1', 4),
+            self.build_fetch_listing('4', 'acc_3', 2, currency='divine'),  # other currency
+            self.build_fetch_listing('5', 'acc_4', 5),
+            self.build_fetch_listing('6', 'acc_5', 6),  # > max_price
+        ] + [self.build_fetch_listing(str(i), f'acc_{i}', 7) for i in range(7, 60)]
+        listings_by_id = {obj['id']: obj for obj in listings}
+        fetched = []
+
+        def api_fetch_listings(query_id, listing_ids, bulk=False, proxy=None):
+            fetched.append(listing_ids)
+            return {'id': query_id, 'result': {i: listings_by_id[i] for i in listing_ids}}
+
+        self.api_fetch_listings = api_fetch_listings
+        response = {'id': 'query_1', 'result': [obj['id'] for obj in listings]}
+        cleaned_data = self.api_fetch_pages(response, trade_item)
+        self.assertTrue(len(fetched) <= 1 + self.search_max_inflight)  # stopped after first page
+        self.assertEqual(
+            [(i['account_name'], i['item_sell_stock'], i['item_buy_price']) for i in cleaned_data],
+            [('acc_2', 2, 4), ('acc_1', 1, 3), ('acc_4', 1, 5)])
+        self.assertTrue(cleaned_data[1]['whisper'].endswith('for 3 chaos'))  # cheapest listing
+
+    def test_api_load_response(self):
+        class Response:
+            def __init__(self, status_code, content):
+                self.status_code = status_code
+                self.content = content
+
+        self.assertEqual(self.api_load_response(Response(200, b'{"result": []}'), 'proxy_1'), {'result': []})
+        with self.assertRaises(TradeApiError) as context:
+            self.api_load_response(
+                Response(429, b'{"error": {"code": 3, "message": "Rate limit exceeded"}}'), 'proxy_1')
+        self.assertTrue(context.exception.overuse)
+        self.handle_api_error(context.exception)
+        self.assertGreater(self.rate_governor.blocked_until['proxy_1'], time.monotonic())
+        with self.assertRaises(TradeApiError) as context:
+            self.api_load_response(Response(400, b'{"error": {"code": 2, "message": "Invalid query"}}'), 'proxy_2')
+        self.assertFalse(context.exception.overuse)
+        self.handle_api_error(context.exception)
+        self.assertNotIn('proxy_2', self.rate_governor.blocked_until)
+
+    def test_sync_live_subscriptions(self):
+        live_search = LiveSearch('ws://127.0.0.1:1', lambda *args: None, max_subscriptions=2)
+        live_search.run_subscription = lambda search_id, subscription: None  # no connections
+        trade_items = [
+            {'item_id': 'watchers-eye', 'type': 'jewel', 'disabled': False,
+             'live_search_id': 'search_1', 'max_price': 2, 'buy_limit': 100},
+            {'item_id': 'thread-of-hope', 'type': 'jewel', 'disabled': True,
+             'live_search_id': 'search_2', 'max_price': 2, 'buy_limit': 100},
+            {'item_id': 'split-personality', 'type': 'jewel', 'disabled': False,
+             'max_price': 2, 'buy_limit': 100},
+            {'item_id': 'rusted-bestiary-scarab', 'type': 'scarab', 'disabled': False,  # bulk - polled only
+             'live_search_id': 'search_3', 'max_stock_price': 2, 'min_stock_amount': 2, 'buy_limit': 100},
+        ]
+        self.sync_live_subscriptions(live_search, trade_items)
+        self.assertEqual(set(live_search.subscriptions), {'search_1'})
+        trade_items[0]['disabled'] = True
+        trade_items[1]['disabled'] = False
+        self.sync_live_subscriptions(live_search, trade_items)
+        self.assertEqual(set(live_search.subscriptions), {'search_2'})
+
+    def load_exported_summary(self) -> list:
+        self.trade_ledger.export_changed_json()
+        return self.load_json_file(self.trade_summary_path)
+
     def test_update_trade_summary(self):
         self.update_trade_summary('test', 2)  # 0 += 2
-        data = self.load_json_file(self.trade_summary_path)
+        self.assertFalse(os.path.exists(self.trade_summary_path))  # exported off the trade path
+        data = self.load_exported_summary()
         self.assertTrue(os.path.exists(self.trade_summary_path))
         self.assertTrue(len(data) == 1)
         self.assertTrue(data[0]['item_id'] == 'test')
         self.assertTrue(data[0]['item_amount'] == 2)
 
         self.update_trade_summary('test', 5)  # 2 += 5
-        data = self.load_json_file(self.trade_summary_path)
+        data = self.load_exported_summary()
         self.assertTrue(data[0]['item_amount'] == 7)
 
         self.update_trade_summary('test1', 5)  # 0 += 5
-        data = self.load_json_file(self.trade_summary_path)
+        data = self.load_exported_summary()
         self.assertTrue(len(data) == 2)
         self.update_trade_summary('test1', 5)  # 5 += 5
         self.update_trade_summary('test1', 3)  # 10 += 3
-        data = self.load_json_file(self.trade_summary_path)
+        data = self.load_exported_summary()
         self.assertTrue(data[1]['item_amount'] == 13)
 
         self.update_trade_summary('test2', 2)  # 0 += 2
-        data = self.load_json_file(self.trade_summary_path)
+        data = self.load_exported_summary()
         self.assertTrue(len(data) == 3)
         self.update_trade_summary('test2', 10)
         self.update_trade_summary('test2', 1)
         self.update_trade_summary('test2', 111)
 
-        data = self.load_json_file(self.trade_summary_path)
+        data = self.load_exported_summary()
         self.assertTrue(data[0]['item_amount'] == 7)
         self.assertTrue(data[1]['item_amount'] == 13)
         self.assertTrue(data[2]['item_amount'] == 124)
 
-        os.remove(self.trade_summary_path)
+        self.update_trade_summary('test2', 24, decr=True)
+        self.assertEqual(self.trade_ledger.get('test2')['item_amount'], 100)
+        self.assertEqual(self.load_exported_summary()[2]['item_amount'], 100)
+
+    def test_check_trade_item_buy_limit(self):
+        trade_item = {
+            'item_id': 'test', 'type': 'scarab', 'buyout_currency': 'chaos', 'disabled': False,
+            'max_stock_price': 5, 'min_stock_amount': 5, 'buy_limit': 10}
+        self.assertEqual(self.check_trade_item_buy_limit(trade_item), (trade_item, 0))
+        self.update_trade_summary('test', 12)
+        adjusted, bought = self.check_trade_item_buy_limit(trade_item)
+        self.assertEqual(bought, 12)
+        self.assertEqual((adjusted['max_stock_price'], adjusted['min_stock_amount']), (4, 2))
+        self.assertEqual(trade_item['max_stock_price'], 5)  # snapshot item unchanged
+        self.assertEqual(self.load_trade_summary()[0]['item_buy_price'], 5)
+
+    def test_smart_whispers_batch(self):
+        db_conn = sqlite3.connect(':memory:')
+        self.db_create_tables(db_conn)
+        recent_trade = int(time.time()) - 5
+        old_trade = int(time.time()) - self.no_spam_delay - 10
+        db_conn.executemany(self.sql_insert_trade_user, [
+            ('acc_1', 'char', 'scarab', 'x', 'x', 1, 1, 'chaos', recent_trade),
+            ('acc_2', 'char', 'scarab', 'x', 'x', 1, 1, 'chaos', old_trade),
+        ])
+        db_conn.execute("UPDATE trade_users SET priority = 7 WHERE acc_name = 'acc_2'")
+        db_conn.commit()
+        trade_item = {'item_id': 'test', 'type': 'scarab', 'max_stock_price': 10}
+        data = [
+            {
+                'account_name': acc_name,
+                'account_last_char_name': acc_name + '_char',
+                'account_online': {'league': 'Standard'},
+                'item_sell_id': 'test',
+                'item_sell_name': 'Test',
+                'item_sell_stock': stock,
+                'item_buy_price': price,
+                'item_buy_currency': 'chaos',
+                'item_indexed': '2024-01-01T00:00:00Z',
+                'whisper': '@' + acc_name,
+            }
+            for acc_name, price, stock in (
+                ('acc_1', 1, 10), ('acc_2', 2, 10), ('acc_3', 3, 10), ('acc_3', 4, 20))
+        ]
+        self.trader_switch = 1
+        self.whisper_scheduler.send_interval = 0
+        self.smart_whispers(db_conn, data, trade_item)
+        """acc_1 spam protected, acc_2 updated, acc_3 inserted once (first listing)"""
+        sent = [self.whisper_scheduler.get(timeout=0) for _ in range(3)]
+        self.assertEqual([whisper for trade_user, whisper in sent[:2]], ['@acc_3', '@acc_2'])
+        self.assertIsNone(sent[2])
+        rows = {row[1]: row for row in self.db_get_all(db_conn, 'trade_users')}
+        self.assertEqual(rows['acc_2'][6:], (2, 10, 'chaos', old_trade, 7, 3))
+        self.assertEqual(rows['acc_3'][6:8], (3, 10))
+        self.assertEqual(rows['acc_1'][6], 1)
+        """Spam protected listing not marked seen"""
+        self.assertEqual(set(self.seen_listings.listings), {('acc_2', 'test'), ('acc_3', 'test')})
+        db_conn.close()
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from ..users import TradeUserCache
+
+
+class TestTradeUserCache(TestCase, TradeUserCache):
+    def setUp(self):
+        TradeUserCache.__init__(self, max_size=3)
+
+    def build_row(self, i: int, last_trade: int) -> tuple:
+        return (i, f'Acc_{i}', f'Char_{i}', 'scarab', 'x', 'x', 1, 1, 'chaos', last_trade, 10, 3)
+
+    def test_get_many(self):
+        self.put_many([self.build_row(1, 100)], missing=['acc_none'])
+        found, uncached = self.get_many(['Acc_1', 'acc_none', 'Acc_2'])
+        self.assertEqual(list(found), ['Acc_1'])
+        self.assertEqual(uncached, ['Acc_2'])
+        self.assertEqual((self.counters['hits'], self.counters['misses']), (2, 1))
+
+    def test_put_many_keeps_cached(self):
+        """Rows cached by other thread not replaced by missing marker or older db rows"""
+        self.put(self.build_row(1, 200))
+        self.put_many([], missing=['Acc_1'])
+        self.put_many([self.build_row(1, 100)], replace=False)
+        self.assertEqual(self.get_many(['Acc_1'])[0]['Acc_1'][-3], 200)
+        self.put_many([self.build_row(2, 100)], missing=['Acc_3'], replace=False)
+        self.assertEqual(self.get_many(['Acc_2', 'Acc_3']), ({'Acc_2': self.build_row(2, 100)}, []))
+
+    def test_lru_eviction(self):
+        for i in range(3):
+            self.put(self.build_row(i, 100 + i))
+        self.get_many(['Acc_0'])  # Acc_1 becomes least recently used
+        self.put(self.build_row(3, 103))
+        self.assertEqual(list(self.rows), ['Acc_2', 'Acc_0', 'Acc_3'])
+        self.assertIsNone(self.get_by_name('char_1'))
+        self.assertEqual(self.counters['evicted'], 1)
+
+    def test_get_by_name(self):
+        self.put(self.build_row(1, 100))
+        self.assertEqual(self.get_by_name('acc_1')[0], 1)
+        self.assertEqual(self.get_by_name('CHAR_1')[0], 1)
+        self.put(self.build_row(1, 100)[:2] + ('New_Char',) + self.build_row(1, 100)[3:])
+        self.assertIsNone(self.get_by_name('char_1'))
+        self.assertEqual(self.get_by_name('new_char')[0], 1)
+
+    def test_load_latest(self):
+        self.put(self.build_row(9, 50))  # cached entry kept over loaded rows
+        self.load([self.build_row(i, 100 + i) for i in range(5)])
+        self.assertEqual(list(self.rows), ['Acc_3', 'Acc_4', 'Acc_9'])
+        self.assertEqual([row[0] for row in self.latest(2)], [4, 3])
+        self.load([self.build_row(7, 500)])  # loaded once
+        self.assertNotIn('Acc_7', self.rows)
@@ -0,0 +1,61 @@
+import json
+import os
+
+from types import MappingProxyType
+from unittest import TestCase
+
+from ..watch import JsonFileWatcher, freeze, thaw
+
+
+class TestJsonFileWatcher(TestCase, JsonFileWatcher):
+    def setUp(self):
+        JsonFileWatcher.__init__(
+            self, 'temp/test_watch.json', validate=self.validate_items, check_interval=60)
+        self.write([{'item_id': 'a', 'disabled': False}])
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def validate_items(self, data):
+        if not isinstance(data, list):
+            raise ValueError('list expected')
+        return data
+
+    def write(self, data):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+
+    def test_snapshot(self):
+        snapshot = self.get()
+        self.assertIsInstance(snapshot, tuple)
+        self.assertIsInstance(snapshot[0], MappingProxyType)
+        with self.assertRaises(TypeError):
+            snapshot[0]['disabled'] = True
+        self.assertEqual(thaw(snapshot), [{'item_id': 'a', 'disabled': False}])
+        self.assertEqual(freeze(thaw(snapshot)), snapshot)
+
+    def test_reload_on_change(self):
+        snapshot = self.get()
+        self.assertIs(self.get(), snapshot)  # within check_interval - no stat
+        self.assertFalse(self.reload())  # unchanged file
+        self.assertIs(self.get(), snapshot)
+
+        self.write([{'item_id': 'a', 'disabled': False}, {'item_id': 'b', 'disabled': True}])
+        self.assertTrue(self.reload())
+        self.assertEqual(len(self.get()), 2)
+        self.assertEqual(self.version, 2)
+
+        """Invalid file keeps previous snapshot"""
+        snapshot = self.get()
+        self.write({'item_id': 'c'})
+        self.assertFalse(self.reload())
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('{broken')
+        self.assertFalse(self.reload())
+        self.assertIs(self.get(), snapshot)
+
+    def test_invalidate(self):
+        snapshot = self.get()
+        self.invalidate()
+        self.assertIsNot(self.get(), snapshot)
+        self.assertEqual(self.get(), snapshot)
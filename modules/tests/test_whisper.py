@@ -0,0 +1,73 @@
+import threading
+import time
+
+from unittest import TestCase
+
+from ..whisper import WhisperScheduler
+
+
+class TestWhisperScheduler(TestCase, WhisperScheduler):
+    def setUp(self):
+        WhisperScheduler.__init__(self, send_interval=0, ttl=60)
+
+    def test_order(self):
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(1, 0.9, 100))
+        self.put('acc_2', 'user_2', 'w2', self.calc_rank(5, 0.9, 100))  # higher priority
+        self.put('acc_3', 'user_3', 'w3', self.calc_rank(1, 0.5, 100))  # cheaper
+        self.put('acc_4', 'user_4', 'w4', self.calc_rank(1, 0.9, 200))  # fresher
+        sent = [self.get(timeout=0)[1] for _ in range(4)]
+        self.assertEqual(sent, ['w2', 'w3', 'w4', 'w1'])
+        self.assertIsNone(self.get(timeout=0))
+
+    def test_replace_account(self):
+        self.put('acc_1', 'user_1', 'old', self.calc_rank(5, 0.5, 100))
+        self.put('acc_1', 'user_1', 'new', self.calc_rank(1, 0.5, 100))
+        self.assertEqual(self.get(timeout=0), ('user_1', 'new'))
+        self.assertIsNone(self.get(timeout=0))
+        self.assertEqual(self.stats()['replaced'], 1)
+
+    def test_expired(self):
+        now = time.monotonic()
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(5, 0.5, 100), now=now - 61)
+        self.put('acc_2', 'user_2', 'w2', self.calc_rank(1, 0.5, 100), now=now)
+        self.assertEqual(self.get(timeout=0), ('user_2', 'w2'))
+        self.assertEqual(self.stats()['expired'], 1)
+
+    def test_send_interval(self):
+        self.send_interval = 0.2
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(1, 0.5, 100))
+        self.put('acc_2', 'user_2', 'w2', self.calc_rank(1, 0.5, 100))
+        self.assertEqual(self.get(timeout=0)[1], 'w1')
+        self.assertIsNone(self.get(timeout=0.05))  # next send not due
+        started = time.monotonic()
+        self.assertEqual(self.get(timeout=1)[1], 'w2')
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_wait_for_put(self):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(self.get(timeout=2)))
+        thread.start()
+        time.sleep(0.05)
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(1, 0.5, 100))
+        thread.join()
+        self.assertEqual(result, [('user_1', 'w1')])
+
+    def test_not_running(self):
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(1, 0.5, 100))
+        self.assertIsNone(self.get(is_running=lambda: False, timeout=0.05))
+        self.assertEqual(self.stats()['pending'], 1)
+        self.clear()
+        self.assertIsNone(self.get(timeout=0))
+
+    def test_on_drop(self):
+        dropped = []
+        self.on_drop = dropped.append
+        now = time.monotonic()
+        self.put('acc_1', 'user_1', 'w1', self.calc_rank(1, 0.5, 100), now=now - 61, listing_key=('acc_1', 'a'))
+        self.put('acc_2', 'user_2', 'w2', self.calc_rank(1, 0.5, 100), listing_key=('acc_2', 'a'))
+        self.put('acc_2', 'user_2', 'w3', self.calc_rank(1, 0.5, 100), listing_key=('acc_2', 'b'))
+        self.put('acc_3', 'user_3', 'w4', self.calc_rank(1, 0.5, 100), listing_key=('acc_3', 'a'))
+        self.put('acc_3', 'user_3', 'w5', self.calc_rank(1, 0.5, 100), listing_key=('acc_3', 'a'))
+        self.assertEqual(self.get(timeout=0)[1], 'w3')  # sent - not dropped
+        self.clear()
+        self.assertEqual(dropped, [('acc_2', 'a'), ('acc_1', 'a'), ('acc_3', 'a')])
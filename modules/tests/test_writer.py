@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import time
+
+from unittest import TestCase
+
+from ..db import ConnectionManager
+from ..writer import DBWriter
+
+
+class TestDBWriter(TestCase):
+    def setUp(self):
+        self.db_file = 'temp/test_writer.sqlite3'
+        self.manager = ConnectionManager(self.db_file)
+        self.writer = DBWriter(self.manager.connect, batch_size=3, flush_interval=0.2)
+        self.conn = self.manager.get()
+        with self.conn:
+            self.conn.execute('CREATE TABLE users (name text PRIMARY KEY, priority integer)')
+
+    def tearDown(self):
+        self.writer.stop()
+        self.manager.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_file + suffix):
+                os.remove(self.db_file + suffix)
+
+    def set_priority(self, conn, name: str, priority: int) -> None:
+        conn.execute('INSERT OR REPLACE INTO users VALUES(?,?)', (name, priority))
+
+    def get_users(self) -> dict:
+        return dict(self.conn.execute('SELECT name, priority FROM users').fetchall())
+
+    def test_coalesce(self):
+        for priority in (10, 9, 8):
+            self.writer.submit(self.set_priority, 'acc_1', priority, key=('priority', 'acc_1'))
+        self.writer.submit(self.set_priority, 'acc_2', 5, key=('priority', 'acc_2'))
+        self.assertTrue(self.writer.flush(timeout=2))
+        self.assertEqual(self.get_users(), {'acc_1': 8, 'acc_2': 5})
+        stats = self.writer.stats()
+        self.assertEqual((stats['coalesced'], stats['written'], stats['batches']), (2, 2, 1))
+
+    def test_batch_triggers(self):
+        """Size trigger commits at once, single mutation waits for flush_interval"""
+        for i in range(3):
+            self.writer.submit(self.set_priority, f'acc_{i}', i)
+        time.sleep(0.1)
+        self.assertEqual(len(self.get_users()), 3)
+        self.writer.submit(self.set_priority, 'acc_3', 3)
+        time.sleep(0.05)
+        self.assertNotIn('acc_3', self.get_users())
+        time.sleep(0.3)
+        self.assertIn('acc_3', self.get_users())
+
+    def test_error(self):
+        self.writer.submit(self.set_priority, 'acc_1', 1)
+        self.writer.submit(lambda conn: conn.execute('INSERT INTO missing VALUES(1)'))
+        self.writer.submit(self.set_priority, 'acc_2', 2)
+        self.assertTrue(self.writer.flush(timeout=2))
+        self.assertEqual(self.get_users(), {'acc_1': 1, 'acc_2': 2})
+        self.assertEqual(self.writer.stats()['errors'], 1)
+
+    def test_error_rolled_back(self):
+        """Partial writes of failed mutation not committed"""
+        def set_and_fail(conn):
+            self.set_priority(conn, 'acc_3', 3)
+            raise ValueError('failed')
+
+        self.writer.submit(self.set_priority, 'acc_1', 1)
+        self.writer.submit(set_and_fail)
+        self.assertTrue(self.writer.flush(timeout=2))
+        self.assertEqual(self.get_users(), {'acc_1': 1})
+
+    def read_committed(self, name: str) -> tuple:
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute('SELECT name, priority FROM users WHERE name=?', (name,)).fetchone()
+        finally:
+            conn.close()
+
+    def test_on_commit(self):
+        """on_commit runs after commit, not for failed or superseded mutation"""
+        committed = []
+        self.writer.submit(self.set_priority, 'acc_1', 1, key=('priority', 'acc_1'),
+                           on_commit=lambda: committed.append(('acc_1', 1)))
+        self.writer.submit(self.set_priority, 'acc_1', 2, key=('priority', 'acc_1'),
+                           on_commit=lambda: committed.append(self.read_committed('acc_1')))
+        self.writer.submit(lambda conn: conn.execute('INSERT INTO missing VALUES(1)'),
+                           on_commit=lambda: committed.append('missing'))
+        self.assertTrue(self.writer.flush(timeout=2))
+        self.assertEqual(committed, [('acc_1', 2)])
+
+    def test_commit_failure(self):
+        """Failed commit reported by flush and retried"""
+        self.writer.connect = ConnectionManager(self.db_file, busy_timeout=0.1).connect
+        other_conn = sqlite3.connect(self.db_file, isolation_level=None)
+        other_conn.execute('BEGIN IMMEDIATE')
+        self.writer.submit(self.set_priority, 'acc_1', 1, key=('priority', 'acc_1'))
+        self.assertFalse(self.writer.flush(timeout=2))
+        self.writer.submit(self.set_priority, 'acc_2', 2)
+        other_conn.execute('ROLLBACK')
+        other_conn.close()
+        self.assertTrue(self.writer.flush(timeout=2))
+        self.assertEqual(self.get_users(), {'acc_1': 1, 'acc_2': 2})
+        self.assertTrue(self.writer.stop())
+
+    def test_stop(self):
+        self.writer.flush_interval = 60
+        self.writer.submit(self.set_priority, 'acc_1', 1)
+        self.writer.stop()
+        self.assertFalse(self.writer.thread.is_alive())
+        self.assertEqual(self.get_users(), {'acc_1': 1})
@@ -0,0 +1,143 @@
+import json
+import math
+import os
+import threading
+import time
+
+from modules.clock import parse_iso_epoch
+
+
+class TradeTracer:
+    """Stamp buyer pipeline stages per account and summarize stage latencies;
+       trace file rotated to trace_path.1 once max_bytes reached - at most 2 files kept
+    """
+    stages = (
+        'indexed',
+        'api_request',
+        'build_cleaned_data',
+        'whisper_enqueue',
+        'whisper_send',
+        'party_invite',
+        'trade_user_deduct',
+        'prepare_currency',
+        'trade_opened',
+        'trade_accepted',
+    )
+
+    def __init__(self, trace_path='temp/trade_trace.jsonl', enabled=True, max_bytes=10_000_000):
+        self.trace_path = trace_path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.trace_lock = threading.Lock()
+        self.trace_file = None
+        self.trace_size = 0
+
+    def span(self, stage: str, acc_name: str, ts=None) -> None:
+        """Append compact trace line: [timestamp, stage, acc_name]"""
+        if not self.enabled or not acc_name:
+            return
+        ts = ts if ts else time.time()
+        line = json.dumps(
+            [round(ts, 3), stage, acc_name.lower()],
+            ensure_ascii=False, separators=(',', ':'))
+        with self.trace_lock:
+            if self.trace_file and self.trace_size >= self.max_bytes:
+                self.rotate()
+            if not self.trace_file:
+                self.trace_file = open(self.trace_path, 'a', encoding='utf-8', buffering=1)
+                self.trace_size = self.trace_file.tell()
+            self.trace_file.write(line + '\n')
+            self.trace_size += len(line.encode('utf-8')) + 1
+
+    def rotate(self) -> None:
+        """Move full trace file to trace_path.1 - lock must be held"""
+        self.trace_file.close()
+        self.trace_file = None
+        os.replace(self.trace_path, self.trace_path + '.1')
+
+    def span_listing(self, obj: dict, response_ts=None, cleaned_ts=None) -> None:
+        """Stamp listing stages known before whisper enqueue"""
+        acc_name = obj['account_name']
+        indexed_ts = self.parse_indexed(obj.get('item_indexed'))
+        if indexed_ts:
+            self.span('indexed', acc_name, indexed_ts)
+        if response_ts:
+            self.span('api_request', acc_name, response_ts)
+        if cleaned_ts:
+            self.span('build_cleaned_data', acc_name, cleaned_ts)
+
+    def parse_indexed(self, indexed: str) -> float:
+        """Return epoch of trade API `indexed` value: 2022-06-04T11:12:18Z"""
+        return parse_iso_epoch(indexed)
+
+    def close(self) -> None:
+        with self.trace_lock:
+            if self.trace_file:
+                self.trace_file.close()
+                self.trace_file = None
+
+    def load_traces(self) -> list:
+        """Traces of rotated and current trace file"""
+        traces = []
+        for path in (self.trace_path + '.1', self.trace_path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            ts, stage, acc_name = json.loads(line)
+                        except ValueError:
+                            continue
+                        traces.append((ts, stage, acc_name))
+            except FileNotFoundError:
+                if path == self.trace_path:
+                    print('- File not found:', self.trace_path)
+        return sorted(traces)
+
+    def calc_percentile(self, values: list, pc: int) -> float:
+        """Nearest-rank percentile of sorted values"""
+        if not values:
+            return 0
+        rank = max(math.ceil(pc / 100 * len(values)), 1)
+        return values[rank - 1]
+
+    def summarize(self, traces=None) -> dict:
+        """Return {stage: {count, p50, p95}} - seconds passed since previous stage of same account;
+           `indexed` starts new account flow, `total` is indexed -> trade_accepted"""
+        traces = traces if traces is not None else self.load_traces()
+        flows = {}
+        latencies = {stage: [] for stage in self.stages[1:] + ('total',)}
+        for ts, stage, acc_name in traces:
+            if stage not in self.stages:
+                continue
+            if stage == 'indexed':
+                """Same listing is stamped every cycle - keep flow if already started"""
+                flow = flows.get(acc_name)
+                if not flow or flow.get('indexed') != ts:
+                    flows[acc_name] = {'indexed': ts}
+                continue
+            flow = flows.setdefault(acc_name, {})
+            if stage in flow:
+                continue  # keep first stamp of stage per flow
+            prev_stage = self.stages[self.stages.index(stage) - 1]
+            prev_ts = flow.get(prev_stage)
+            if prev_ts is not None and ts >= prev_ts:
+                latencies[stage].append(ts - prev_ts)
+            flow[stage] = ts
+            if stage == 'trade_accepted' and 'indexed' in flow:
+                latencies['total'].append(ts - flow['indexed'])
+        summary = {}
+        for stage, values in latencies.items():
+            values.sort()
+            summary[stage] = {
+                'count': len(values),
+                'p50': round(self.calc_percentile(values, 50), 3),
+                'p95': round(self.calc_percentile(values, 95), 3),
+            }
+        return summary
+
+    def print_summary(self) -> None:
+        summary = self.summarize()
+        print('- Trade trace:', self.trace_path)
+        print('  {:<20}{:>8}{:>10}{:>10}'.format('stage', 'count', 'p50', 'p95'))
+        for stage, stats in summary.items():
+            print('  {:<20}{:>8}{:>10}{:>10}'.format(stage, stats['count'], stats['p50'], stats['p95']))
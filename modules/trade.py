@@ -1,23 +1,42 @@
-import os
 import re
 import time
 import pyautogui
 import collections
 import json
 import requests
-import random
 import math
+import asyncio
+import threading
 import cloudscraper
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from jinja2 import Environment, PackageLoader, select_autoescape
 from operator import itemgetter
 from file_read_backwards import FileReadBackwards
-from queue import Queue
+from queue import Empty, Queue
 
 from modules.base import Base, OCRChecker
 from modules.db import TradeDB
+from modules.cache import SearchCache
+from modules.clock import ExpiringNames, elapsed, epoch_age, epoch_now, parse_iso_epoch
+from modules.ignore import IgnoreList
 from modules.keys import KeyActions
+from modules.ledger import TradeLedger
+from modules.listings import ListingFilter
+from modules.live import LiveSearch
+from modules.ninja import NinjaPriceService
+from modules.proxy import ProxyManager
+from modules.query import TradeQueryBuilder
+from modules.ratelimit import RateLimitGovernor
+from modules.schedule import TradeItemScheduler
+from modules.search import AsyncTradeSearch, TradeApiError
+from modules.seen import SeenListings
+from modules.session import SessionPool
+from modules.trace import TradeTracer
+from modules.users import TradeUserCache
+from modules.watch import JsonFileWatcher
+from modules.whisper import WhisperScheduler
+from modules.writer import DBWriter
 
 
 class Prices(Base):
@@ -27,6 +46,15 @@ class Prices(Base):
         self.ninja_overviews = ['currencyoverview', 'itemoverview']
         self.ninja_currency_types = ['Currency', 'Fragment']
         self.ninja_item_types = ['Scarab', 'DivinationCard', 'Fragment', 'Fossil']
+        self.ninja_sessions = SessionPool(factory=requests.Session)
+        self.prices_config = self.app_config['PRICES']
+        self.ninja_prices = NinjaPriceService(
+            lambda url, **kwargs: self.ninja_sessions.get('ninja', url, **kwargs),
+            self.build_ninja_url,
+            [(self.ninja_overviews[0], item_type) for item_type in self.ninja_currency_types]
+            + [(self.ninja_overviews[1], item_type) for item_type in self.ninja_item_types],
+            ttl=int(self.prices_config.get('ninja_prices_ttl', 300)))
+        self.ninja_prices.load_snapshot()
 
     def build_ninja_url(self, overview: str, item_type: str) -> str:
         query = '?league=%s&type=%s' % (self.trade_league, item_type)
@@ -37,7 +65,7 @@ class Prices(Base):
         url = self.build_ninja_url(overview, item_type)
         api_err_msg = f'- Can\'t access poe.ninja API'
         try:
-            resp = requests.get(url)
+            resp = self.ninja_sessions.get('ninja', url, timeout=15)
             if resp.status_code == 200:
                 return json.loads(resp.content)
             else:
@@ -47,25 +75,31 @@ class Prices(Base):
 
     def get_ninja_exalt_price(self) -> int:
         """Return poe ninja exalt price"""
-        resp = self.get_ninja_api(self.ninja_overviews[0], self.ninja_currency_types[0])
-        for obj in resp['lines']:
-            if obj['currencyTypeName'] == 'Exalted Orb':
-                return int(obj['chaosEquivalent'])
+        obj = self.ninja_prices.get_price('Exalted Orb')
+        if obj:
+            return int(obj['chaosEquivalent'])
+
+    def build_ninja_prices(self, resp: dict) -> list:
+        """Return (item_id, chaos price, listing_count) of currency/item overview lines"""
+        prices = []
+        for obj in resp['lines'] if resp else []:
+            price = obj.get('chaosValue', obj.get('chaosEquivalent'))
+            listing_count = obj.get('listingCount') or (obj.get('receive') or {}).get('listing_count', 0)
+            if obj.get('detailsId') and price is not None:
+                prices.append((obj['detailsId'], price, listing_count))
+        return prices
 
     def get_ninja_scarab_price(self, scarab_id: str) -> dict:
         """Return poe ninja singular scarab data"""
-        resp = self.get_ninja_api(self.ninja_overviews[1], self.ninja_item_types[0])
-        scarab = {}
-        for obj in resp['lines']:
-            if obj['detailsId'] == scarab_id:
-                scarab.update({
-                    'item_id': obj['detailsId'],
-                    'item_listing_count': obj['listingCount'],
-                    'chaos_value': obj['chaosValue'],
-                    'price_change': obj['lowConfidenceSparkline'].get('totalChange', 0),
-                })
-                break
-        return scarab
+        obj = self.ninja_prices.get_price(scarab_id)
+        if not obj:
+            return {}
+        return {
+            'item_id': obj['detailsId'],
+            'item_listing_count': obj['listingCount'],
+            'chaos_value': obj['chaosValue'],
+            'price_change': obj['lowConfidenceSparkline'].get('totalChange', 0),
+        }
 
 
 class ClientLog(Base):
@@ -196,39 +230,63 @@ class Trader(TradeDB, Base):
         self.trade_items_file = self.trader_config['trade_items_file']
         self.trade_single_template = self.trader_config['trade_single_tmplt']
         self.trade_bulk_template = self.trader_config['trade_bulk_tmplt']
+        self.query_builder = TradeQueryBuilder(
+            bulk_template=self.trade_bulk_template,
+            single_template=self.trade_single_template)
         self.trade_bulk_types = json.loads(self.trader_config['trade_bulk_types'])
         self.max_bulk_price = int(self.trader_config['max_bulk_price'])
         self.max_stack_size = int(self.trader_config['max_stack_size'])
         self.fill_currency_stack = int(
             self.trader_config['fill_currency_stack'])
-        self.priority_sleep = float(self.trader_config['priority_sleep'][1:-1])
+        self.whisper_scheduler = WhisperScheduler(
+            send_interval=float(self.trader_config.get('whisper_interval', '3')),
+            ttl=float(self.trader_config.get('whisper_ttl', '60')),
+            on_drop=lambda listing_key: self.seen_listings.forget([listing_key]))
+        self.db_writer = DBWriter(
+            self.db_create_connection,
+            batch_size=int(self.trader_config.get('db_writer_batch_size', '100')),
+            flush_interval=float(self.trader_config.get('db_writer_interval', '1')))
+        self.trade_ledger_db = 'db.sqlite3'
+        self.trade_ledger = TradeLedger(export_path=self.trade_summary_path)
+        self.trade_user_cache = TradeUserCache(
+            max_size=int(self.trader_config.get('trade_user_cache_size', '2000')))
         self.no_spam_delay = int(self.trader_config['no_spam_delay'])
         self.deduct_user_delay = int(self.trader_config['deduct_user_delay'])
-        self.trade_ignored_users = []
+        self.ignore_list = IgnoreList(
+            prefix_matching=self.trader_config.get('ignore_prefix_matching', 'false') == 'true')
+        self.listing_filter = ListingFilter(self.max_bulk_price)
         self.proxies = self.load_proxies()
         self.proxy = {}
+        self.proxy_dicts = {
+            self.proxy_key(self.format_proxy(proxy)): self.format_proxy(proxy)
+            for proxy in self.proxies} if self.proxies else {'direct': {}}
+        self.proxy_manager = ProxyManager(
+            self.proxy_dicts.keys(),
+            stats_path=self.trader_config.get('proxy_stats_path', 'temp/proxy_stats.json'))
+        self.tracer = TradeTracer(
+            trace_path=self.trader_config.get('trace_path', 'temp/trade_trace.jsonl'),
+            max_bytes=int(self.trader_config.get('trace_max_bytes', '10000000')))
+        self.search_max_inflight = int(self.trader_config.get('search_max_inflight', '4'))
+        self.fetch_pool = ThreadPoolExecutor(max_workers=self.search_max_inflight, thread_name_prefix='fetch')
+        self.search_batch_size = int(self.trader_config.get('search_batch_size', '1'))
+        self.rate_governor = RateLimitGovernor(
+            default_rules=self.trader_config.get('trade_api_default_rules', '5:15:60'))
+        self.session_pool = SessionPool(factory=cloudscraper.create_scraper)
+        self.search_local = threading.local()
+        self.search_cache = SearchCache(
+            ttl=float(self.trader_config.get('search_cache_ttl', '5')),
+            cacheable=lambda response: 'result' in response)
+        self.live_search_url = self.trader_config.get(
+            'trade_live_url', self.trade_api_url.replace('https://', 'wss://') + '/live')
+        self.live_search_max = int(self.trader_config.get('live_search_max', '20'))
+        self.live_queue = Queue()
+        self.json_watchers = {}
+        self.json_watchers_lock = threading.Lock()
+        self.seen_listings = SeenListings(
+            ttl=int(self.trader_config.get('seen_listings_ttl', self.no_spam_delay)))
 
     def load_trade_template(self, trade_item, bulk=False):
-        trade_template = self.trade_bulk_template if bulk \
-            else self.trade_single_template
-        env = Environment(
-            loader=PackageLoader('templates', 'trader'),
-            autoescape=select_autoescape())
-        template = env.get_template(trade_template)
-        if bulk:
-            template_rendered = template.render(
-                have_item=[trade_item['buyout_currency']],
-                want_item=[trade_item['item_id']],
-                min_stock_amount=trade_item['min_stock_amount']
-            ).replace("'", '"')
-        else:
-            template_rendered = template.render(
-                item_name=trade_item['item_id'],
-                item_name_type=trade_item['type'],
-                price_min=trade_item['min_price'],
-                price_max=trade_item['max_price']
-            )
-        return json.loads(template_rendered)
+        return self.query_builder.render_query(trade_item, bulk=bulk)
 
     def load_proxies(self, filename='proxies.txt'):
         try:
@@ -236,14 +294,21 @@ class Trader(TradeDB, Base):
             with open(filename, 'r') as file:
                 proxies_raw = file.readlines()
                 for line in proxies_raw:
-                    proxies.append(line.strip().split(':'))
+                    if line.strip():
+                        proxies.append(line.strip().split(':'))
             return proxies
         except FileNotFoundError:
             with open(filename, 'w+') as file:
                 file.write('')
 
     def proxy_rotate(self, protocol='http') -> dict:
-        proxy = random.choice(self.proxies)
+        """Pick proxy weighted by health score"""
+        proxy = self.proxy_dicts[self.proxy_manager.select()]
+        print('- Proxy: ', self.proxy_key(proxy))
+        return proxy
+
+    def format_proxy(self, proxy: list, protocol='http') -> dict:
+        """Build requests proxies dict from proxies.txt line: host:port[:user:password]"""
         if len(proxy) == 2:
             proxy = {
                 protocol: '{0}://{1}:{2}'.format(
@@ -258,111 +323,167 @@ class Trader(TradeDB, Base):
                 'https': '{0}://{1}:{2}@{3}:{4}'.format(
                     protocol, proxy[2], proxy[3], proxy[0], proxy[1])
             }
-        print('- Proxy: ', proxy[protocol])
         return proxy
 
-    def api_request(self, trade_item: dict, bulk=False) -> dict:
+    def proxy_key(self, proxy: dict) -> str:
+        """Rate limit/stats key of proxy dict - host:port without credentials"""
+        if not proxy:
+            return 'direct'
+        return proxy['https'].split('://')[-1].split('@')[-1]
+
+    def proxy_schedule(self, endpoint='exchange') -> dict:
+        """Pick healthy proxy with earliest rate limit safe instant and wait for it"""
+        keys = self.proxy_manager.ranked_keys()
+        key, delay = self.rate_governor.reserve_any(keys, endpoint)
+        if delay > 0:
+            print(f'- Rate limit wait {delay:.1f}s')
+            time.sleep(delay)
+        return self.proxy_dicts[key]
+
+    def api_request(self, trade_item, bulk=False, proxy=None) -> dict:
+        """trade_item - trade_item dict or list of batched bulk trade_items"""
         print('- Requesting Trade API')
-        template = self.load_trade_template(trade_item, bulk=bulk)
+        if isinstance(trade_item, list):
+            query = self.query_builder.get_batch_query(trade_item)
+        else:
+            query = self.query_builder.get_query(trade_item, bulk=bulk)
         bulk_url = f'{self.trade_api_url}/exchange/{self.trade_league}'
         nobulk_url = f'{self.trade_api_url}/search/{self.trade_league}'
         url = bulk_url if bulk else nobulk_url
-        self.proxy = self.proxy_rotate()
-        scraper = cloudscraper.create_scraper()
-        resp = scraper.post(url, json=template, proxies=self.proxy, timeout=15)
-        return json.loads(resp.content)
-
-    def api_response_old(self, resp, trade_item, bulk=False):
-        """Paginate initial POST response"""
-        resp = json.loads(resp.content)
-        resp_id = resp['id']
-        resp_result = resp['result']
-        resp_pagin_step = int(
-            self.trader_config['trade_api_pagin_step_bulk'] if bulk
-            else self.trader_config['trade_api_pagin_step'])
-        resp_pagin = [  # list comprehension
-            resp_result[i:i + resp_pagin_step]
-            for i in range(0, len(resp_result), resp_pagin_step)]
-        return (resp_id, resp_pagin)
-
-    def api_fetch_page_old(self, resp_id, page_ids, bulk=False, cf=True):
-        """Fetch page items with resp_id and page_ids"""
-        page = ','.join(page_ids)
-        fetch_url = f"{self.trade_api_url}/fetch/{page}"
-        param_key = 'exchange' if bulk else 'query'
-        self.proxy_rotate()
-        if cf:
-            scraper = cloudscraper.create_scraper()
-            resp = scraper.get(
-                fetch_url, params={param_key: resp_id},
-                proxies=self.proxy, timeout=5)
+        endpoint = 'exchange' if bulk else 'search'
+        return self.search_cache.get_or_fetch(
+            self.search_cache.query_key(url, query), self.api_search, url, query, endpoint, proxy)
+
+    def api_search(self, url: str, query: bytes, endpoint: str, proxy=None) -> dict:
+        """Upstream search request - called once per search_cache miss;
+           proxy - dict, acquire(endpoint) -> dict or None for proxy_schedule
+        """
+        if callable(proxy):
+            proxy = proxy(endpoint)
+        elif proxy is None:
+            proxy = self.proxy_schedule(endpoint)
+        self.proxy = proxy
+        resp = self.api_send(
+            proxy, endpoint, 'POST', url, data=query,
+            headers={'Content-Type': 'application/json'}, timeout=15)
+        return self.api_load_response(resp, self.proxy_key(proxy))
+
+    def api_load_response(self, resp, proxy_key: str) -> dict:
+        """Trade API json - error answers raised as TradeApiError with status and proxy_key"""
+        try:
+            data = json.loads(resp.content)
+        except ValueError:
+            data = {}
+        error = data.get('error') if isinstance(data, dict) else None
+        if resp.status_code >= 400 or error or 'result' not in data:
+            error = error or {}
+            raise TradeApiError(
+                f'Trade API error {resp.status_code}: {error.get("message", "")}',
+                code=error.get('code'), status=resp.status_code, proxy_key=proxy_key)
+        return data
+
+    def api_send(self, proxy: dict, endpoint: str, method: str, url: str, **kwargs):
+        """Send trade API request - feed rate limit headers and proxy health"""
+        proxy_key = self.proxy_key(proxy)
+        started = time.monotonic()
+        try:
+            resp = self.session_pool.request(proxy_key, method, url, proxies=proxy, **kwargs)
+        except Exception as e:
+            self.proxy_manager.record_failure(proxy_key, repr(e))
+            raise
+        self.rate_governor.update(proxy_key, resp.headers, resp.status_code, endpoint=endpoint)
+        if resp.status_code == 429:
+            self.proxy_manager.record_rate_limited(proxy_key)
+        elif resp.status_code >= 400:
+            self.proxy_manager.record_failure(proxy_key, resp.status_code)
         else:
-            resp = requests.get(
-                fetch_url,
-                params={param_key: resp_id}
-            )
+            self.proxy_manager.record_success(proxy_key, time.monotonic() - started)
         return resp
 
-    def api_fetch_pages_old(self, resp, trade_item, bulk=False, delay=0.15):
-        """
-        Fetch pages item data and build/filter it
-        resp_pagin = self.api_response(
-            resp,
-            trade_item,
-            bulk=is_bulk)
-        cleaned_data = self.api_fetch_pages(
-            resp_pagin,
-            trade_item,
-            bulk=is_bulk)
-        """
-        resp_id, resp_pagin = resp
+    def api_fetch_listings(self, query_id: str, listing_ids: list, bulk=False, proxy=None) -> dict:
+        """Fetch up to 10 listings by id - result keyed by id as in exchange response"""
+        fetch_url = f"{self.trade_api_url}/fetch/{','.join(listing_ids)}"
+        param_key = 'exchange' if bulk else 'query'
+        proxy = proxy if proxy is not None else self.proxy_schedule('fetch')
+        self.proxy = proxy
+        resp = self.api_send(proxy, 'fetch', 'GET', fetch_url, params={param_key: query_id}, timeout=5)
+        data = self.api_load_response(resp, self.proxy_key(proxy))
+        return {'id': query_id, 'result': {obj['id']: obj for obj in data['result'] if obj}}
+
+    def api_fetch_pages(self, response: dict, trade_item: dict) -> list:
+        """Fetch /search result pages concurrently in price order - stop once max_price passed;
+           return cleaned listings aggregated per account"""
+        result_ids = response['result']
+        page_size = int(self.trader_config['trade_api_pagin_step'])
+        pages = [result_ids[i:i + page_size] for i in range(0, len(result_ids), page_size)]
         cleaned_data = []
-
-        for page_ids in resp_pagin:
-            if not self.trader_switch:  # return cut of cleaned_data
-                break
-            try:
-                page_resp = self.api_fetch_page(resp_id, page_ids, bulk=bulk)
-            except Exception as e:
-                print('- Error: ', repr(e))
+        futures = collections.deque()
+        next_page = 0
+        max_price_reached = False
+        try:
+            while (futures or next_page < len(pages)) and not max_price_reached:
+                if not self.trader_switch:  # return cut of cleaned_data
+                    break
+                while next_page < len(pages) and len(futures) < self.search_max_inflight:
+                    futures.append(self.fetch_pool.submit(
+                        self.api_fetch_listings, response['id'], pages[next_page]))
+                    next_page += 1
+                page = futures.popleft().result()  # keep price order
+                page_data, max_price_reached = self.build_cleaned_nobulk_data(page, trade_item)
+                cleaned_data += page_data
+        finally:
+            for future in futures:  # pages past max_price not needed
+                future.cancel()
+        return self.update_nobulk_data_stack_size(cleaned_data, trade_item)
+
+    def build_cleaned_nobulk_data(self, data: dict, trade_item: dict, price_sorted=True) -> tuple:
+        """Clean/filter fetched page - return (cleaned_data, max_price_reached)"""
+        cleaned_data = []
+        for obj in data['result'].values():
+            price = obj['listing']['price']
+            if price['currency'] == trade_item['buyout_currency'] and price['amount'] > trade_item['max_price']:
+                if price_sorted:
+                    return (cleaned_data, True)
                 continue
-            new_data, max_price_limit = self.build_cleaned_data(
-                json.loads(page_resp.content),
-                trade_item['buyout_currency'],
-                bulk_data=bulk,
-                max_price=trade_item['max_price'],
-                max_stock_price=trade_item['max_stock_price'],
-                min_stock_amount=trade_item['min_stock_amount'],
-            )
-            cleaned_data += new_data
-            if delay:
-                time.sleep(delay)
-            if max_price_limit:  # break if max_price reached
-                break
-
-        if not bulk:
-            self.update_nobulk_data_stack_size(cleaned_data)
-        cleaned_data = self.sort_data_by_key(
-            cleaned_data, 'item_stack_size')
-
-        return cleaned_data
-
-    def update_nobulk_data_stack_size(self, data):
-        """
-        TODO: Testing
-        """
-        acc_names = [obj['account_name'] for obj in data]
-        acc_names_count = collections.Counter(acc_names)
-        data = list({obj['account_name']: obj for obj in data}.values())
+            listing = self.build_cleaned_nobulk_listing(obj, trade_item)
+            if listing:
+                cleaned_data.append(listing)
+        return (cleaned_data, False)
+
+    def build_cleaned_nobulk_listing(self, obj: dict, trade_item: dict) -> dict:
+        """Clean/filter single /fetch listing - same fields as build_cleaned_listing"""
+        listing = obj['listing']
+        item = obj['item']
+        account_name = listing['account']['name']
+        if self.check_account_ignored(account_name):
+            return None
+        if listing['price']['currency'] != trade_item['buyout_currency']:
+            return None
+        return {
+            'account_name': account_name,
+            'account_last_char_name': listing['account']['lastCharacterName'],
+            'account_online': listing['account']['online'],
+            'item_buy_price': listing['price']['amount'],
+            'item_buy_currency': listing['price']['currency'],
+            'item_sell_id': trade_item['item_id'],
+            'item_sell_name': item.get('name') or item['typeLine'],
+            'item_sell_amount': 1,
+            'item_sell_stock': item.get('stackSize', 1),
+            'item_indexed': listing['indexed'],
+            'whisper': listing['whisper'],
+        }
 
+    def update_nobulk_data_stack_size(self, data: list, trade_item: dict) -> list:
+        """One listing per account in one pass - cheapest listing kept whole,
+           stock and price match what its whisper buys"""
+        accounts = {}
         for obj in data:
-            acc_name_count = acc_names_count[data['account_name']]
-            if data['item_stack_size'] and data['item_stack_size'] >= 2:
-                data['item_stack_size'] += acc_name_count - 1
-            else:
-                data['item_stack_size'] = acc_name_count
-        print(data)
-        return data
+            account = accounts.get(obj['account_name'])
+            if not account or obj['item_buy_price'] < account['item_buy_price']:
+                accounts[obj['account_name']] = obj
+        min_stock_amount = trade_item.get('min_stock_amount', 1)
+        data = [obj for obj in accounts.values() if obj['item_sell_stock'] >= min_stock_amount]
+        return self.sort_data_by_key(data, 'item_sell_stock')
 
     def build_cleaned_data_old(
             self, data, currency,
@@ -377,10 +498,7 @@ class Trader(TradeDB, Base):
             listing = obj['listing']
             item = obj['item']
             account_name = listing['account']['name']
-            account_ignored = [
-                user for user in self.trade_ignored_users
-                if account_name.lower() in user]
-            if account_ignored:
+            if self.check_account_ignored(account_name):
                 # print(f'- Ignored {account_name}')
                 continue
             account_last_char_name = listing['account']['lastCharacterName']
@@ -472,10 +590,7 @@ class Trader(TradeDB, Base):
             self.keyboard_enter()
 
     def check_account_ignored(self, account_name):
-        for user in self.trade_ignored_users:
-            if account_name.lower() == user[1]:
-                # print(f'- Ignored {account_name}')
-                return True
+        return account_name in self.ignore_list
 
     def calc_bulk_price(self, item_price: int, item_stock: int) -> tuple:
         """Calculate max_bulk_price and item_stock amount"""
@@ -489,227 +604,473 @@ class Trader(TradeDB, Base):
 
     def build_cleaned_data(self, data: dict, trade_item: dict) -> list:
         """Clean/filter response for bulk data"""
-        cleaned_data = []
-        for key in data['result'].keys():  # result has list of trade_id objects
-            obj = data['result'][key]['listing']
-            account_name = obj['account']['name']
-            account_last_char_name = obj['account']['lastCharacterName']
-            account_online = obj['account']['online']
-            item_buy_price = obj['offers'][0]['exchange']['amount']
-            item_buy_currency = obj['offers'][0]['exchange']['currency']
-            item_sell_id = obj['offers'][0]['item']['currency']
-            item_sell_name = ' '.join([i.capitalize() for i in item_sell_id.split('-')])
-            item_sell_amount = obj['offers'][0]['item']['amount']
-            item_sell_stock = obj['offers'][0]['item']['stock']
-            item_indexed = obj['indexed']
-            whisper = obj['whisper'].format(
-                obj['offers'][0]['item']['whisper'],
-                obj['offers'][0]['exchange']['whisper'].replace('{0}', '{1}'))
-
-            """data logic/manipulations here"""
-            if self.check_account_ignored(account_name):
-                continue
-            if 'fossil' in item_sell_id and item_sell_stock > 20:  # test/remove this logic
-                """limit fossils to 20 per trade"""
-                item_sell_stock = 20
-            if item_sell_amount > 1:
-                """If item price listed in proportions"""
-                item_buy_price = item_buy_price / item_sell_amount
-            if item_buy_price > trade_item['max_stock_price']:
-                """If max_price reached - skip"""
-                continue
+        listings = [obj['listing'] for obj in data['result'].values()]  # result has trade_id objects
+        return self.listing_filter.filter(listings, trade_item, self.ignore_list)
+
+    def build_cleaned_batch_data(self, data: dict, trade_items: list) -> dict:
+        """Split batch exchange response by offered item - filter with its trade_item;
+           return {item_id: cleaned_data}"""
+        listings = {trade_item['item_id']: [] for trade_item in trade_items}
+        for obj in data['result'].values():
+            item_id = obj['listing']['offers'][0]['item']['currency']
+            if item_id in listings:
+                listings[item_id].append(obj['listing'])
+        return {
+            trade_item['item_id']: self.listing_filter.filter(
+                listings[trade_item['item_id']], trade_item, self.ignore_list)
+            for trade_item in trade_items}
+
+    def build_cleaned_listing(self, obj: dict, trade_item: dict) -> dict:
+        """Clean/filter single exchange listing - None if filtered; row by row ListingFilter"""
+        account_name = obj['account']['name']
+        account_last_char_name = obj['account']['lastCharacterName']
+        account_online = obj['account']['online']
+        item_buy_price = obj['offers'][0]['exchange']['amount']
+        item_buy_currency = obj['offers'][0]['exchange']['currency']
+        item_sell_id = obj['offers'][0]['item']['currency']
+        item_sell_name = ' '.join([i.capitalize() for i in item_sell_id.split('-')])
+        item_sell_amount = obj['offers'][0]['item']['amount']
+        item_sell_stock = obj['offers'][0]['item']['stock']
+        item_indexed = obj['indexed']
+        whisper = obj['whisper'].format(
+            obj['offers'][0]['item']['whisper'],
+            obj['offers'][0]['exchange']['whisper'].replace('{0}', '{1}'))
+
+        """data logic/manipulations here"""
+        if self.check_account_ignored(account_name):
+            return None
+        if 'fossil' in item_sell_id and item_sell_stock > 20:  # test/remove this logic
+            """limit fossils to 20 per trade"""
+            item_sell_stock = 20
+        if item_sell_amount > 1:
+            """If item price listed in proportions"""
+            item_buy_price = item_buy_price / item_sell_amount
+        if item_buy_price > trade_item['max_stock_price']:
+            """If max_price reached - skip"""
+            return None
+
+        bulk_price, item_sell_stock = self.calc_bulk_price(item_buy_price, item_sell_stock)
+        whisper = whisper.format(item_sell_stock, bulk_price)
+
+        return {
+            'account_name': account_name,
+            'account_last_char_name': account_last_char_name,
+            'account_online': account_online,
+            'item_buy_price': item_buy_price,
+            'item_buy_currency': item_buy_currency,
+            'item_sell_id': item_sell_id,
+            'item_sell_name': item_sell_name,
+            'item_sell_amount': item_sell_amount,
+            'item_sell_stock': item_sell_stock,
+            'item_indexed': item_indexed,
+            'whisper': whisper,
+        }
 
-            bulk_price, item_sell_stock = self.calc_bulk_price(item_buy_price, item_sell_stock)
-            whisper = whisper.format(item_sell_stock, bulk_price)
-
-            cleaned_data.append({
-                'account_name': account_name,
-                'account_last_char_name': account_last_char_name,
-                'account_online': account_online,
-                'item_buy_price': item_buy_price,
-                'item_buy_currency': item_buy_currency,
-                'item_sell_id': item_sell_id,
-                'item_sell_name': item_sell_name,
-                'item_sell_amount': item_sell_amount,
-                'item_sell_stock': item_sell_stock,
-                'item_indexed': item_indexed,
-                'whisper': whisper,
-            })
-        return cleaned_data
-
-    def smart_whispers(self, db_conn, data: list, trade_item: dict) -> None:
+    def check_account_online(self, obj: dict) -> bool:
+        """Skip afk and unknown users"""
+        return bool(obj['account_online']) and not obj['account_online'].get('status', None)
+
+    def filter_seen_listings(self, data: list) -> tuple:
+        """Keep new or changed listings of online users - return (listings, counts)"""
+        data, counts = self.seen_listings.filter([obj for obj in data if self.check_account_online(obj)])
+        print('- Listings new: {new}, changed: {changed}, skipped: {skipped}'.format(**counts))
+        return data, counts
+
+    def smart_whispers(self, db_conn, data: list, trade_item: dict, trace_ts=()) -> int:
+        """Queue whispers of new/changed listings - return churn (new + changed listings)"""
+        data, counts = self.filter_seen_listings(data)
+        queued = set()
+        try:
+            self.queue_whispers(db_conn, data, trade_item, queued, trace_ts)
+        finally:
+            """Listings not queued are processed again on next search"""
+            self.seen_listings.forget(
+                key for key in map(self.seen_listings.listing_key, data) if key not in queued)
+        return counts['new'] + counts['changed']
+
+    def queue_whispers(self, db_conn, data: list, trade_item: dict, queued: set, trace_ts=()) -> None:
+        """Put whispers of listings passing spam filter - listing keys added to queued"""
+        data = self.filter_trade_users_spam(db_conn, data)
+        trade_users = self.db_upsert_trade_users(db_conn, [
+            self.build_trade_user_row(obj, trade_item) for obj in data])
+        self.trade_user_cache.put_many(trade_users.values())
         for obj in data:
             if not self.trader_switch:
                 """If trader_switch was set False during operation, save/update queue result"""
                 print(f'- Trader stopped in smart_whispers')
-                now = datetime.now()
+                stopped_at = time.monotonic()
                 while True:
                     if self.trader_switch:
                         print('- Trader Continue in smart_whispers')
                         break
                     time.sleep(0.2)
-                passed = self.get_datetime_passed_seconds(
-                    datetime.now(), time_now=now, reverse=True)
-                if passed >= 60:
-                    with self.whisper_queue.mutex:  # thread safe operation
-                        self.whisper_queue.queue.clear()
+                if elapsed(stopped_at) >= 60:
+                    self.whisper_scheduler.clear()
                     break
 
-            if not obj['account_online'] or obj['account_online'].get('status', None):
-                """Skip afk and unknown users"""
+            current_trade_user = trade_users.get(obj['account_name'])
+            if not current_trade_user:
                 continue
-
-            current_trade_user = self.db_get_object(
-                db_conn, 'trade_users', 'acc_name', obj['account_name'])
-
+            self.tracer.span_listing(obj, *trace_ts)
+            listing_key = self.seen_listings.listing_key(obj)
+            queued.add(listing_key)
+            self.whisper_scheduler.put(
+                obj['account_name'], current_trade_user, obj['whisper'],
+                self.calc_whisper_rank(current_trade_user, obj, trade_item), listing_key=listing_key)
+            self.tracer.span('whisper_enqueue', obj['account_name'])
+
+    def filter_trade_users_spam(self, db_conn, data: list) -> list:
+        """Drop accounts whispered within no_spam_delay - one listing per account, first kept"""
+        current_trade_users = self.get_trade_users(db_conn, {obj['account_name'] for obj in data})
+        accounts = set()
+        filtered_data = []
+        for obj in data:
+            if obj['account_name'] in accounts:
+                continue
+            accounts.add(obj['account_name'])
+            current_trade_user = current_trade_users.get(obj['account_name'])
             if current_trade_user:
                 """Check last_trade_request - prevent spam"""
-                last_trade_sec = self.get_datetime_passed_seconds(current_trade_user[-3])
+                last_trade_sec = epoch_age(current_trade_user[-3])
                 if last_trade_sec > 0 and last_trade_sec < self.no_spam_delay:
-                    # print('- Skipped %s : %s' % (
-                    #     obj['account_name'], obj['account_last_char_name']))
-                    continue
-                """Update current_trade_user data"""
-                trade_user = (
-                    obj['account_last_char_name'],
-                    trade_item['type'],
-                    obj['item_sell_id'],
-                    obj['item_sell_name'],
-                    obj['item_buy_price'],
-                    obj['item_sell_stock'],
-                    obj['item_buy_currency'],
-                    obj['account_name'],
-                )
-                self.db_update_object(db_conn, self.sql_update_trade_user, trade_user)
-            else:
-                trade_user = (
-                    obj['account_name'],
-                    obj['account_last_char_name'],
-                    trade_item['type'],
-                    obj['item_sell_id'],
-                    obj['item_sell_name'],
-                    obj['item_buy_price'],
-                    obj['item_sell_stock'],
-                    obj['item_buy_currency'],
-                    str(datetime.now()),
-                )
-                self.db_create_object(db_conn, self.sql_insert_trade_user, trade_user)
-                current_trade_user = self.db_get_object(
-                    db_conn, 'trade_users', 'acc_name', obj['account_name'])
-                if not current_trade_user:
                     continue
-            self.whisper_queue.put((current_trade_user, obj['whisper']))
-            time.sleep(current_trade_user[-2] / self.priority_sleep)  # 10 / 1.n
+            filtered_data.append(obj)
+        return filtered_data
+
+    def get_trade_users(self, db_conn, acc_names) -> dict:
+        """Return {acc_name: row} of existing users - only uncached accounts read from db"""
+        trade_users, uncached = self.trade_user_cache.get_many(acc_names)
+        if uncached:
+            rows = self.db_get_objects_in(db_conn, 'trade_users', 'acc_name', uncached)
+            found = {row[1] for row in rows}
+            self.trade_user_cache.put_many(
+                rows, missing=[name for name in uncached if name not in found], replace=False)
+            trade_users.update((row[1], row) for row in rows)
+        return trade_users
+
+    def load_trade_user_cache(self, db_conn) -> None:
+        """Warm trade_user_cache with newest trade_users rows"""
+        if not self.trade_user_cache.loaded:
+            self.trade_user_cache.load(self.db_get_latest_objects(
+                db_conn, 'trade_users', 'last_trade', amount=self.trade_user_cache.max_size))
+
+    def save_trade_user_priority(self, trade_user: tuple) -> None:
+        """Write through trade_user_cache - db updated by db_writer, ignore list once committed"""
+        self.trade_user_cache.put(trade_user)
+        self.db_writer.submit(
+            self.db_update_trade_user_priority, trade_user,
+            key=('trade_user_priority', trade_user[1]),
+            on_commit=None if trade_user[-2] else lambda: self.ignore_list.append_local(trade_user[1]))
+
+    def build_trade_user_row(self, obj: dict, trade_item: dict) -> tuple:
+        """sql_upsert_trade_user values - last_trade only set for new users"""
+        return (
+            obj['account_name'],
+            obj['account_last_char_name'],
+            trade_item['type'],
+            obj['item_sell_id'],
+            obj['item_sell_name'],
+            obj['item_buy_price'],
+            obj['item_sell_stock'],
+            obj['item_buy_currency'],
+            epoch_now(),
+        )
+
+    def calc_whisper_rank(self, trade_user: tuple, obj: dict, trade_item: dict) -> tuple:
+        """Whisper order - user priority, price relative to max price, listing freshness"""
+        max_price = trade_item.get('max_stock_price') or trade_item.get('max_price') or 1
+        indexed_ts = parse_iso_epoch(obj['item_indexed']) or 0
+        return self.whisper_scheduler.calc_rank(
+            trade_user[-2], obj['item_buy_price'] / max_price, indexed_ts)
 
     def manage_trade_whisper_queue(self):
-        db_conn = self.db_create_connection()
         while True:
-            if self.whisper_queue.empty() or not self.trader_switch:
-                time.sleep(0.2)
-                continue
-            current_trade_user, whisper = self.whisper_queue.get()
+            current_trade_user, whisper = self.whisper_scheduler.get(
+                is_running=lambda: self.trader_switch)
             print("- Sent whisper to %s : %s" % (current_trade_user[1], current_trade_user[2]))
             self.send_whisper(whisper)
-            self.db_update_trade_user_priority(db_conn, current_trade_user, str(datetime.now()))
-            time.sleep(3)
-            self.whisper_queue.task_done()
+            self.tracer.span('whisper_send', current_trade_user[1])
+            self.save_trade_user_priority(
+                self.calc_trade_user_priority(current_trade_user, epoch_now()))
+
+    def get_json_watcher(self, path: str, validate=None) -> JsonFileWatcher:
+        """Shared watcher per file - trader threads read same snapshot"""
+        with self.json_watchers_lock:
+            if path not in self.json_watchers:
+                self.json_watchers[path] = JsonFileWatcher(path, validate=validate)
+            return self.json_watchers[path]
+
+    def validate_trade_items(self, trade_items) -> list:
+        if not isinstance(trade_items, list):
+            raise ValueError('trade items must be a list')
+        for trade_item in trade_items:
+            missing = {'item_id', 'type', 'buyout_currency', 'disabled'} - set(trade_item)
+            if missing:
+                raise ValueError(f'{trade_item.get("item_id")} missing {sorted(missing)}')
+        return trade_items
+
+    def load_trade_items(self, trade_items_file: str) -> tuple:
+        """Read only trade_items snapshot - reloaded on file change only"""
+        return self.get_json_watcher(trade_items_file, self.validate_trade_items).get()
+
+    def get_trade_ledger_conn(self):
+        """Thread bound trade_ledger_db connection - ledger loaded on first use"""
+        db_conn = self.db_get_connection_manager(self.trade_ledger_db).get()
+        if not self.trade_ledger.loaded:
+            self.db_create_tables(db_conn)
+            self.trade_ledger.load(db_conn)
+        return db_conn
+
+    def manage_trade_summary_export(self, interval=60):
+        """Export changed trade_summary.json every interval seconds - off the trade path"""
+        while True:
+            time.sleep(interval)
+            try:
+                self.trade_ledger.export_changed_json()
+            except Exception as e:
+                print('- Error trade summary export:', repr(e))
+
+    def load_trade_summary(self) -> tuple:
+        """Read only trade_summary snapshot - same object until next trade/price change"""
+        if not self.trade_ledger.loaded:
+            self.get_trade_ledger_conn()
+        return self.trade_ledger.snapshot()
+
+    def check_trade_item_buy_limit(self, trade_item: dict) -> tuple:
+        """Check if trade_item buy_limit reached;
+           return (trade_item or adjusted copy, bought amount)"""
+        self.load_trade_summary()
+        summary = self.trade_ledger.get(trade_item['item_id'])
+        bought = 0
+        buy_limit = False
+        if summary:
+            """check if trade_summary amount == buy_limit"""
+            bought = summary['item_amount']
+            """update trade_summary item_buy_price"""
+            if not summary['item_buy_price']:
+                self.trade_ledger.set_price(
+                    self.get_trade_ledger_conn(), trade_item['item_id'],
+                    buy_price=trade_item['max_stock_price'])
+                print('- Trade summary updated')
+            """Set trade_item buy_limit"""
+            if trade_item.get('buy_limit') and bought >= trade_item['buy_limit']:
+                buy_limit = True
+        if buy_limit:
+            print('- Buy limit reached:', trade_item['item_id'], trade_item['buy_limit'])
+            trade_item = dict(trade_item)
+            trade_item['max_stock_price'] -= 1
+            trade_item['min_stock_amount'] = 2
+            trade_item['buy_limit'] += 100
+        return (trade_item, bought)
 
     def run_trader(self, trade_items_file):
         db_conn = self.db_create_connection()
         # create project db tables
         self.db_create_tables(db_conn)
-        # add default ignored_users
-        self.trade_ignored_users = self.db_insert_default_ignored_users(db_conn)
-        # check for new ignored_users in file
-        self.db_insert_new_ignored_users(db_conn)
+        # load ignored_users, add new ones from file
+        self.ignore_list.load(db_conn)
+        self.load_trade_user_cache(db_conn)
         trade_items_file = 'temp/' + trade_items_file
-        trade_items = self.load_json_file(trade_items_file)
-        trade_items_len = len(trade_items)
-        trade_item_counter = 0
+        trade_items = self.load_trade_items(trade_items_file)
+        scheduler = TradeItemScheduler(
+            base_interval=float(self.trader_config.get('schedule_base_interval', '10')),
+            min_interval=float(self.trader_config.get('schedule_min_interval', '2')))
+        scheduler.update_items(trade_items)
 
         while True:
             if self.trader_switch:
-                new_trade_items = self.load_json_file(trade_items_file)
-                if trade_items != new_trade_items:  # update trade_items
+                new_trade_items = self.load_trade_items(trade_items_file)
+                if new_trade_items is not trade_items:  # file changed - new snapshot
                     trade_items = new_trade_items
+                    scheduler.update_items(trade_items)
+                self.ignore_list.maybe_sync_file(db_conn)
 
-                trade_item = trade_items[trade_item_counter]
+                trade_item, delay = scheduler.next_item()
+                if not trade_item or delay > 0:
+                    time.sleep(min(delay, 1))  # recheck trader_switch/trade_items
+                    continue
                 print(f'\n- Switched to {trade_item["item_id"]}')
 
-                """Check if trade_item buy_limit reached"""
-                try:
-                    trade_summary = self.load_json_file(self.trade_summary_path)
-                except Exception as e:
-                    print('- Error:', e)
-                    trade_summary = []
-
-                if trade_summary:
-                    buy_limit = False
-                    for summary in trade_summary:
-                        """check if trade_summary amount == buy_limit"""
-                        if trade_item['item_id'] == summary['item_id']:
-                            """update trade_summary item_buy_price"""
-                            if not summary.get('item_buy_price'):
-                                summary.update({'item_buy_price': trade_item['max_stock_price']})
-                                self.update_json_file(trade_summary, self.trade_summary_path)
-                                print('- Trade summary updated')
-                            """Set trade_item buy_limit"""
-                            if summary['item_amount'] >= trade_item['buy_limit']:
-                                buy_limit = True
-                                break
-                    if buy_limit:
-                        print('- Buy limit reached:', trade_item['item_id'], trade_item['buy_limit'])
-                        trade_item['max_stock_price'] -= 1
-                        trade_item['min_stock_amount'] = 2
-                        trade_item['buy_limit'] += 100
-                        buy_limit = False
-
-                """Check if trade_item disabled"""
-                if trade_item['disabled']:
-                    if trade_item_counter >= trade_items_len - 1:
-                        trade_item_counter = 0
-                    else:
-                        trade_item_counter += 1
-                    print('  Disabled')
-                    continue
+                trade_item, bought = self.check_trade_item_buy_limit(trade_item)
 
                 try:
                     is_bulk = bool(trade_item['type'] in self.trade_bulk_types)
                     response = self.api_request(trade_item, bulk=is_bulk)
-                    response = self.build_cleaned_data(response, trade_item)
-                    with db_conn:
-                        self.smart_whispers(db_conn, response, trade_item)
-                    time.sleep(4)
-                except Exception as e:
-                    sleep_duration = 30
-                    api_err_msg = "Can't access Trade API\n"
-                    api_overuse_msg = api_err_msg + f'API overuse - Sleep {sleep_duration}s'
-                    if 'result' in repr(e) or 'id' in repr(e) or '429' in repr(e):
-                        # self.log_error(e)
-                        print(repr(e))
-                        print(api_overuse_msg)
-                        # self.show_toast(api_overuse_msg, msg_type='INFO')
-                        time.sleep(sleep_duration)
+                    response_ts = time.time()
+                    if is_bulk:
+                        response = self.build_cleaned_data(response, trade_item)
                     else:
-                        # self.log_error(e)
-                        print(e)
-                        print(f'- {repr(e)}', f'\n  PROXY: {self.proxy}',)
-                        # self.show_toast(api_err_msg + str(e))
+                        response = self.api_fetch_pages(response, trade_item)
+                    trace_ts = (response_ts, time.time())
+                    churn = self.smart_whispers(db_conn, response, trade_item, trace_ts=trace_ts)
+                    interval = scheduler.record_poll(trade_item['item_id'], response, churn, bought)
+                    print(f'- Next poll in {interval:.1f}s')
+                except (TradeApiError, requests.RequestException) as e:
+                    scheduler.record_error(trade_item['item_id'])
+                    self.handle_api_error(e)
                     print('\n- Trader Restart')
                     continue
 
-                if trade_item_counter >= trade_items_len - 1:
-                    trade_item_counter = 0
-                else:
-                    trade_item_counter += 1
-                time.sleep(1)
+                if scheduler.states and not scheduler.polls % len(scheduler.states):
+                    print('- Search cache:', self.search_cache.stats())
             time.sleep(self.main_loop_delay)
         return 0
 
+    def handle_api_error(self, e: Exception, sleep_duration=30) -> None:
+        """Block proxy of failed request on rate limit overuse - Retry-After already applied"""
+        if isinstance(e, TradeApiError) and e.overuse:
+            print(repr(e))
+            print(f"Can't access Trade API\nAPI overuse - Proxy sleep {sleep_duration}s")
+            self.rate_governor.block(e.proxy_key, sleep_duration)
+        else:
+            print(f'- {repr(e)}', f'\n  PROXY: {getattr(e, "proxy_key", None)}')
+
+    def search_db_connect(self) -> None:
+        """Executor initializer - db_conn bound to search processing thread"""
+        self.search_local.db_conn = self.db_create_connection()
+
+    def clean_search_response(self, trade_item, response: dict) -> dict:
+        """Return {item_id: cleaned listings} - fetches nobulk pages, no db access;
+           trade_item - trade_item dict or list of batched trade_items
+        """
+        if isinstance(trade_item, list):
+            return self.build_cleaned_batch_data(response, trade_item)
+        elif trade_item['type'] in self.trade_bulk_types:
+            return {trade_item['item_id']: self.build_cleaned_data(response, trade_item)}
+        return {trade_item['item_id']: self.api_fetch_pages(response, trade_item)}
+
+    def process_search_response(self, trade_item, cleaned_batch: dict, response_ts: float) -> None:
+        """Whisper cleaned listings of clean_search_response - runs in db bound search thread"""
+        trace_ts = (response_ts, time.time())
+        db_conn = self.search_local.db_conn
+        self.ignore_list.maybe_sync_file(db_conn)
+        for item in trade_item if isinstance(trade_item, list) else [trade_item]:
+            self.smart_whispers(db_conn, cleaned_batch[item['item_id']], item, trace_ts=trace_ts)
+
+    def group_search_trade_items(self, search_items: list) -> list:
+        """Batch bulk trade_items with same buyout_currency and type into one exchange query"""
+        if self.search_batch_size <= 1:
+            return search_items
+        groups = {}
+        grouped_items = []
+        for trade_item, is_bulk in search_items:
+            if not is_bulk:
+                grouped_items.append((trade_item, is_bulk))
+                continue
+            group_key = (trade_item['buyout_currency'], trade_item['type'])
+            groups.setdefault(group_key, []).append(trade_item)
+        for group in groups.values():
+            for i in range(0, len(group), self.search_batch_size):
+                batch = group[i:i + self.search_batch_size]
+                grouped_items.append((batch if len(batch) > 1 else batch[0], True))
+        return grouped_items
+
+    def load_search_trade_items(self, trade_items_file: str) -> list:
+        """Return enabled [(trade_item or batch, bulk), ...] for next search cycle"""
+        search_items = []
+        for trade_item in self.load_trade_items(trade_items_file):
+            if trade_item['disabled']:
+                continue
+            trade_item, bought = self.check_trade_item_buy_limit(trade_item)
+            is_bulk = bool(trade_item['type'] in self.trade_bulk_types)
+            search_items.append((trade_item, is_bulk))
+        return self.group_search_trade_items(search_items)
+
+    def run_trader_async(self, trade_items_file):
+        """Concurrent run_trader - several trade API queries in flight across proxies"""
+        db_conn = self.db_create_connection()
+        self.db_create_tables(db_conn)
+        self.ignore_list.load(db_conn)
+        self.load_trade_user_cache(db_conn)
+        trade_items_file = 'temp/' + trade_items_file
+        search = AsyncTradeSearch(
+            self,
+            list(self.proxy_dicts.values()),
+            self.rate_governor,
+            proxy_manager=self.proxy_manager,
+            search_cache=self.search_cache,
+            max_inflight=self.search_max_inflight)
+        asyncio.run(search.run(
+            lambda: self.load_search_trade_items(trade_items_file),
+            is_running=lambda: self.trader_switch,
+            process_initializer=self.search_db_connect))
+        return 0
+
+    def live_search_enqueue(self, search_id: str, trade_item: dict, listing_ids: list) -> None:
+        """LiveSearch callback - runs in websocket thread"""
+        self.live_queue.put((search_id, trade_item, listing_ids))
+
+    def sync_live_subscriptions(self, live_search: LiveSearch, trade_items: list) -> None:
+        """Subscribe enabled trade_items with live_search_id, drop removed/disabled ones;
+           live searches are /search queries - bulk trade_items stay with polled exchange search
+        """
+        wanted = {}
+        for trade_item in trade_items:
+            if trade_item['disabled'] or not trade_item.get('live_search_id'):
+                continue
+            if trade_item['type'] in self.trade_bulk_types:
+                print(f'- Live search skipped for bulk item {trade_item["item_id"]}')
+                continue
+            trade_item, bought = self.check_trade_item_buy_limit(trade_item)
+            wanted[trade_item['live_search_id']] = trade_item
+        for search_id in set(live_search.subscriptions) - set(wanted):
+            live_search.unsubscribe(search_id)
+        for search_id, trade_item in wanted.items():
+            live_search.subscribe(search_id, trade_item)
+
+    def process_live_listings(
+            self, db_conn, search_id: str, trade_item: dict, listing_ids: list) -> None:
+        """Fetch pushed listings by 10 and whisper - same filters as polled nobulk search"""
+        for i in range(0, len(listing_ids), 10):
+            response = self.api_fetch_listings(search_id, listing_ids[i:i + 10])
+            response_ts = time.time()
+            response, max_price_reached = self.build_cleaned_nobulk_data(
+                response, trade_item, price_sorted=False)
+            response = self.update_nobulk_data_stack_size(response, trade_item)
+            trace_ts = (response_ts, time.time())
+            self.smart_whispers(db_conn, response, trade_item, trace_ts=trace_ts)
+
+    def run_trader_live(self, trade_items_file):
+        """Push based run_trader - new listings of saved searches come over websocket"""
+        db_conn = self.db_create_connection()
+        self.db_create_tables(db_conn)
+        self.ignore_list.load(db_conn)
+        self.load_trade_user_cache(db_conn)
+        trade_items_file = 'temp/' + trade_items_file
+        headers = [
+            'Origin: https://www.pathofexile.com',
+            'User-Agent: Mozilla/5.0',
+        ]
+        if self.trader_config.get('poesessid'):
+            headers.append('Cookie: POESESSID=' + self.trader_config['poesessid'])
+        live_search = LiveSearch(
+            f'{self.live_search_url}/{self.trade_league}',
+            self.live_search_enqueue,
+            headers=headers,
+            max_subscriptions=self.live_search_max)
+        snapshots = None
+        while True:
+            new_snapshots = (self.load_trade_items(trade_items_file), self.load_trade_summary())
+            if snapshots is None or any(new is not old for new, old in zip(new_snapshots, snapshots)):
+                snapshots = new_snapshots  # trade_items or buy limits changed
+                self.sync_live_subscriptions(live_search, snapshots[0])
+            try:
+                search_id, trade_item, listing_ids = self.live_queue.get(timeout=1)
+            except Empty:
+                continue
+            if not self.trader_switch:
+                continue  # drop listings pushed while stopped
+            self.ignore_list.maybe_sync_file(db_conn)
+            try:
+                self.process_live_listings(db_conn, search_id, trade_item, listing_ids)
+            except (TradeApiError, requests.RequestException) as e:
+                print(f'- Live search {search_id} fetch error')
+                self.handle_api_error(e)
+        return 0
+
 
 class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
     def __init__(self):
-        self.whisper_queue = Queue()
         Prices.__init__(self)
         ClientLog.__init__(self)
         Trader.__init__(self)
@@ -749,34 +1110,12 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
         self.STATE = status
         print(f'\n- State changed: {status}')
 
-    def update_trade_summary(self, trade_item_id: str, amount: int, decr=False) -> None:
-        """Create trade_summary if not exist; create summary template/update item_amount"""
-        if not os.path.exists(self.trade_summary_path):
-            with open(self.trade_summary_path, 'w', encoding='utf-8') as f:
-                f.write('{}')
-        summary_template = {
-            'item_id': trade_item_id,
-            'item_amount': 0,
-            'item_buy_price': 0,
-            'item_sell_price': 0
-        }
-        data = self.load_json_file(self.trade_summary_path)
-        if not data:
-            data = []
-        """Update trade_item_amount"""
-        for trade_item in data:
-            if trade_item['item_id'] == trade_item_id:
-                if decr:
-                    trade_item['item_amount'] -= int(amount)
-                else:
-                    trade_item['item_amount'] += int(amount)
-                self.update_json_file(data, self.trade_summary_path)
-                print('- Trade summary updated')
-                return
-        """Add new summary_template"""
-        summary_template['item_amount'] += int(amount)
-        data.append(summary_template)
-        self.update_json_file(data, self.trade_summary_path)
+    def update_trade_summary(self, trade_item_id: str, amount: int, decr=False, price=0) -> None:
+        """Record trade in trade_ledger - summary item_amount increased (decreased if decr)"""
+        self.trade_ledger.record(
+            self.get_trade_ledger_conn(), trade_item_id, amount,
+            price=price, side='sell' if decr else 'buy')
+        print('- Trade summary updated')
 
     def stash_activate_tab(self, tab: str, subtab='') -> None:
         """Activate one of the stash tabs if stash is opened"""
@@ -1210,12 +1549,11 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
 
     def ocr_user_deduct(self, db_conn, ocr_text):
         user_amount = 15
-        latest_trade_users = self.db_get_latest_objects(
-            db_conn,
-            'trade_users',
-            'last_trade',
-            amount=user_amount)
-        deducted_user = None
+        deducted_user = self.trade_user_cache.get_by_name(ocr_text) if ocr_text else None
+        if deducted_user:
+            return deducted_user
+        self.load_trade_user_cache(db_conn)
+        latest_trade_users = self.trade_user_cache.latest(user_amount)
         for trade_user in latest_trade_users:
             user_similarity = self.check_string_similarity(
                 ocr_text, trade_user[1])
@@ -1227,11 +1565,8 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
 
     def trade_user_deduct(self, db_conn, ocr_user=None):
         user_amount = 9
-        latest_trade_users = self.db_get_latest_objects(
-            db_conn,
-            'trade_users',
-            'last_trade',
-            amount=user_amount)
+        self.load_trade_user_cache(db_conn)
+        latest_trade_users = self.trade_user_cache.latest(user_amount)
         deducted_user = None
         for i, trade_user in enumerate(latest_trade_users):
             if ocr_user and i >= 2:
@@ -1301,13 +1636,6 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
             else:
                 return [detected_objects[-1]]
 
-    def filter_trade_users_done(self, user_done: str, time_limit=60) -> str:
-        """Filter user_done by time_limit;"""
-        user_done_passed = datetime.now() - datetime.fromisoformat(user_done.split('%')[1])
-        if user_done_passed.seconds >= time_limit:
-            return None
-        return user_done
-
     def manage_invites(self, trade=False, party=False):
         invites = self.check_invite(check_type=True)
         for invite in invites:
@@ -1450,21 +1778,28 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
             time.sleep(0.5)
 
     def manage_prices(self):
+        """Record changed poe.ninja overviews in price_history - exalt price read from prices table"""
+        db_conn = self.db_create_connection()
+        self.db_create_tables(db_conn)
         while True:
             try:
-                exalt_price = self.get_ninja_exalt_price()
+                for overview, item_type in self.ninja_prices.refresh():
+                    lines = self.ninja_prices.get_lines(overview, item_type)
+                    self.db_record_prices(db_conn, self.build_ninja_prices({'lines': lines}))
+                self.db_downsample_price_history(db_conn)
+                exalt_price = self.db_get_object(db_conn, 'prices', 'item_id', 'exalted-orb')
                 if exalt_price:
                     self.prices.clear()
-                    self.prices.append({'item_id': 'exalted-orb', 'chaos_value': exalt_price})
+                    self.prices.append({'item_id': 'exalted-orb', 'chaos_value': int(exalt_price[5])})
                 print('- Prices:', self.prices)
             except Exception as e:
                 print('- Error manage_prices:', repr(e))
-            time.sleep(300)
+            time.sleep(self.ninja_prices.ttl)
 
     def run_seller(self):
         trade_users = []
-        trade_users_done = []
-        trade_summary = self.load_json_file(self.trade_summary_path)
+        trade_users_done = ExpiringNames(ttl=60)
+        trade_summary = self.load_trade_summary()
 
         while True:
             if not self.STATE:
@@ -1499,9 +1834,9 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                         item_price = str(
                             round((summary['item_buy_price'] + item_price_incr) * 10)) + '/10'
                         self.stash_set_item_price(summary['item_id'], item_price)
-                        summary['item_sell_price'] = item_price
-                        self.update_json_file(trade_summary, self.trade_summary_path)
-                trade_summary = self.load_json_file(self.trade_summary_path)
+                        self.trade_ledger.set_price(
+                            self.get_trade_ledger_conn(), summary['item_id'], sell_price=item_price)
+                trade_summary = self.load_trade_summary()
                 self.set_state('HIDEOUT')
                 continue
             elif self.STATE == 'HIDEOUT':
@@ -1512,8 +1847,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                     self.set_state('PRETRADE')
                     continue
                 # filter trade_users_done by time and remove old ones
-                trade_users_done[:] = [
-                    i for i in trade_users_done if self.filter_trade_users_done(i, time_limit=60)]
+                trade_users_done.prune()
                 # filter log buy messages and send party invite/sold
                 log_result = self.log_manage(time_limit=50)
                 for log in log_result:
@@ -1528,18 +1862,17 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                             if char_name in trade_users_done:
                                 continue
                             print('- User {} changed sell price'.format(char_name))
-                            trade_users_done.append(char_name + '%' + str(datetime.now()))
+                            trade_users_done.add(char_name)
                             continue
 
-                        check_user_in_done = [i for i in trade_users_done if char_name in i]
-                        if check_user_in_done:
+                        if char_name in trade_users_done:
                             continue
 
                         # Sold / Invite logic
                         if summary['item_amount'] < buy_item[2]:  # item sold
                             time.sleep(0.3)
                             self.action_command_chat(f'@{char_name} sold')
-                            trade_users_done.append(char_name + '%' + str(datetime.now()))
+                            trade_users_done.add(char_name)
                         elif summary['item_amount'] >= buy_item[2]:  # item available
                             # send party invite, save trade_user
                             check_user_in = [i for i in trade_users if i[0] == char_name]
@@ -1608,7 +1941,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                             print('\n- Trade success')
                             trade_timer = 0
                             trade_opened = False
-                            trade_users_done.append(trade_user_name + '%' + str(datetime.now()))
+                            trade_users_done.add(trade_user_name)
                             trade_users.remove(current_trade_user)
                             self.update_trade_summary(
                                 current_trade_user[1][1],  # item_id
@@ -1637,6 +1970,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
         trade_attempt = 0
         trade_started_at = None
         trade_passed = 0
+        invite_seen_at = None
         loading = False
         timer = 0
 
@@ -1648,6 +1982,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                 trade_attempt = 0
                 trade_started_at = None
                 trade_passed = 0
+                invite_seen_at = None
                 self.set_state(self.STATES['START'])
                 continue
             elif self.STATE == 'START':
@@ -1722,6 +2057,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                             ocr_text = self.check_invite_account_name(invite)
                             current_trade_user = self.ocr_user_deduct(db_conn, ocr_text)
                             self.game_invite(invite, accept=True)
+                            invite_seen_at = time.time()
                             time.sleep(0.3)  # fix double click on different invite
                             if self.check_stash_opened():
                                 pyautogui.press('esc')
@@ -1743,6 +2079,8 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                 current_trade_user = self.trade_user_deduct(db_conn, ocr_user=current_trade_user)
                 print('- Current user:', current_trade_user)
                 if current_trade_user:
+                    self.tracer.span('party_invite', current_trade_user[1], invite_seen_at)
+                    self.tracer.span('trade_user_deduct', current_trade_user[1])
                     loading = True
                     while True:
                         print('- Loading...')
@@ -1759,7 +2097,7 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                     self.set_state('START')
             elif self.STATE == 'TRADE':
                 if not trade_started_at:
-                    trade_started_at = datetime.now()
+                    trade_started_at = time.monotonic()
                 if not timer % 10:
                     print('- Timer:', timer)
                     if current_currency:
@@ -1779,6 +2117,8 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                 if not current_currency:
                     current_currency = self.prepare_currency(
                         current_trade_user)
+                    if current_currency:
+                        self.tracer.span('prepare_currency', current_trade_user[1])
                     continue
 
                 log_result = self.log_manage(time_limit=5)
@@ -1795,6 +2135,8 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                         print('- Trade attempt limit reached')
                         timer = self.trade_timer_limit
                         break
+                    if not trade_opened:
+                        self.tracer.span('trade_opened', current_trade_user[1])
                     trade_opened = True
                     self.manage_trade(current_currency, current_trade_user)
                     trade_attempt += 1
@@ -1805,23 +2147,19 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                     for res in log_result:
                         if 'accepted' in res:
                             print('- Trade success')
+                            self.tracer.span('trade_accepted', current_trade_user[1])
                             trade_opened = False
                             in_party = False
                             timer = 0
                             if current_trade_user[-2] < 15:
                                 print('- User priority updated')
-                                user_data = (
+                                self.save_trade_user_priority(current_trade_user[:-3] + (
                                     current_trade_user[-3],
                                     current_trade_user[-2] + 2,
                                     current_trade_user[-1] + 1,
-                                    current_trade_user[1]
-                                )
-                                self.db_update_object(
-                                    db_conn,
-                                    self.sql_update_trade_user_priority,
-                                    user_data
-                                )
-                            self.update_trade_summary(current_trade_user[4], current_trade_user[7])
+                                ))
+                            self.update_trade_summary(
+                                current_trade_user[4], current_trade_user[7], price=current_trade_user[6])
                             # self.action_send_ty(char_name=current_trade_user[2])
                             time.sleep(0.3)
                             self.action_command_chat(self.cmd_kick)
@@ -1834,8 +2172,8 @@ class TradeBot(Prices, ClientLog, Trader, KeyActions, OCRChecker):
                             break
                         elif 'cancelled' in res:
                             trade_opened = False
-                            trade_passed = self.get_datetime_passed_seconds(trade_started_at)
-                            print(trade_started_at, ' - ', trade_passed)
+                            trade_passed = int(elapsed(trade_started_at))
+                            print(f'- Trade cancelled after {trade_passed}s')
                             log_cancelled = [
                                 x for x in self.log_manage(time_limit=trade_passed) if x[0] == 'cancelled']
                             if len(log_cancelled) >= 2:
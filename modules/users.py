@@ -0,0 +1,102 @@
+import heapq
+import threading
+
+from collections import OrderedDict
+
+
+class TradeUserCache:
+    """LRU cache of trade_users rows keyed by acc_name with char_name index;
+       None marks account known to be missing in db; mutations must go through put
+       after db write so reads never need disk once warmed
+    """
+    def __init__(self, max_size=2000):
+        self.max_size = max_size
+        self.rows = OrderedDict()  # acc_name -> row or None, least recently used first
+        self.names = {}  # acc_name/char_name lowercase -> acc_name
+        self.loaded = False
+        self.counters = {'hits': 0, 'misses': 0, 'evicted': 0}
+        self.lock = threading.Lock()
+
+    def index(self, acc_name: str, row, add=True) -> None:
+        """Add/remove lowercase name lookups of row - lock must be held"""
+        if not row:
+            return
+        for name in (row[1].lower(), row[2].lower()):
+            if add:
+                self.names[name] = acc_name
+            elif self.names.get(name) == acc_name:
+                del self.names[name]
+
+    def store(self, acc_name: str, row, newest=True) -> None:
+        """Insert/refresh entry - lock must be held"""
+        self.index(acc_name, self.rows.pop(acc_name, None), add=False)
+        self.rows[acc_name] = row
+        self.index(acc_name, row)
+        if not newest:
+            self.rows.move_to_end(acc_name, last=False)
+        while len(self.rows) > self.max_size:
+            self.index(*self.rows.popitem(last=False), add=False)
+            self.counters['evicted'] += 1
+
+    def put(self, row: tuple) -> None:
+        with self.lock:
+            self.store(row[1], row)
+
+    def put_many(self, rows, missing=(), replace=True) -> None:
+        """Cache db rows and accounts not found in db - missing marker never replaces cached row;
+           replace=False for rows read from db, which may be older than row cached meanwhile
+        """
+        with self.lock:
+            for acc_name in missing:
+                if acc_name not in self.rows:
+                    self.store(acc_name, None)
+            for row in rows:
+                if replace or not self.rows.get(row[1]):
+                    self.store(row[1], row)
+
+    def load(self, rows: list) -> None:
+        """Warm cache once with db rows - never replaces cached entries, newest rows kept"""
+        with self.lock:
+            if self.loaded:
+                return
+            for row in sorted(rows, key=lambda row: row[-3], reverse=True):
+                if len(self.rows) >= self.max_size:
+                    break
+                if row[1] not in self.rows:
+                    self.store(row[1], row, newest=False)
+            self.loaded = True
+
+    def get_many(self, acc_names) -> tuple:
+        """Return ({acc_name: row}, [uncached acc_names]) - known missing accounts left out of both"""
+        found = {}
+        uncached = []
+        with self.lock:
+            for acc_name in acc_names:
+                if acc_name in self.rows:
+                    self.rows.move_to_end(acc_name)
+                    if self.rows[acc_name]:
+                        found[acc_name] = self.rows[acc_name]
+                    self.counters['hits'] += 1
+                else:
+                    uncached.append(acc_name)
+                    self.counters['misses'] += 1
+        return found, uncached
+
+    def get_by_name(self, name: str):
+        """Row by acc_name or char_name (case insensitive)"""
+        with self.lock:
+            acc_name = self.names.get(name.lower())
+            row = self.rows.get(acc_name) if acc_name else None
+            if row:
+                self.rows.move_to_end(acc_name)
+            return row
+
+    def latest(self, amount=10) -> list:
+        """Newest cached rows by last_trade - does not change LRU order"""
+        with self.lock:
+            return heapq.nlargest(
+                amount, (row for row in self.rows.values() if row), key=lambda row: (row[-3], row[0]))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, size=len(self.rows))
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+
+from types import MappingProxyType
+
+
+def freeze(data):
+    """Read only copy of decoded JSON - dicts as mappingproxy, lists as tuples"""
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+def thaw(data):
+    """Mutable copy of frozen snapshot"""
+    if isinstance(data, MappingProxyType):
+        return {key: thaw(value) for key, value in data.items()}
+    if isinstance(data, tuple):
+        return [thaw(value) for value in data]
+    return data
+
+
+class JsonFileWatcher:
+    """Reload JSON file only when its mtime/size changes and publish validated read only snapshot;
+       unreadable/invalid file keeps previous snapshot, stat at most once per check_interval
+    """
+    def __init__(self, path: str, validate=None, default=(), check_interval=1):
+        self.path = path
+        self.validate = validate if validate else (lambda data: data)
+        self.check_interval = check_interval
+        self.snapshot = freeze(default)
+        self.version = 0
+        self.stamp = None  # (mtime_ns, size) of loaded file
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def get_stamp(self) -> tuple:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload(self) -> bool:
+        """Load file if changed - return True if new snapshot published"""
+        with self.lock:
+            self.checked_at = time.monotonic()
+            stamp = self.get_stamp()
+            if stamp is None or stamp == self.stamp:
+                return False
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    data = self.validate(json.load(file))
+            except (OSError, ValueError) as e:
+                print(f'- Invalid {self.path}:', repr(e))
+                self.stamp = stamp  # wait for next change
+                return False
+            self.snapshot = freeze(data)
+            self.stamp = stamp
+            self.version += 1
+            return True
+
+    def get(self):
+        """Current snapshot - no file I/O between checks"""
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval:
+            self.reload()
+        return self.snapshot
+
+    def invalidate(self) -> None:
+        """File written by this process - reload on next get"""
+        with self.lock:
+            self.checked_at = None
+            self.stamp = None
@@ -0,0 +1,111 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class WhisperScheduler:
+    """Pending whispers ordered by trade user priority, listing price and freshness;
+       one pending whisper per account, entries dropped past deadline,
+       sends released no faster than send_interval;
+       on_drop(listing_key) called for entries replaced, expired or cleared without send
+    """
+    def __init__(self, send_interval=3, ttl=60, on_drop=None):
+        self.send_interval = send_interval
+        self.ttl = ttl
+        self.on_drop = on_drop
+        self.heap = []  # (rank, seq)
+        self.entries = {}  # seq -> {acc_name, trade_user, whisper, deadline}
+        self.accounts = {}  # acc_name -> seq of pending entry
+        self.counter = itertools.count()
+        self.next_send_at = 0
+        self.counters = {'queued': 0, 'replaced': 0, 'expired': 0, 'sent': 0}
+        self.condition = threading.Condition()
+
+    def calc_rank(self, priority: int, price_ratio: float, indexed_ts: float) -> tuple:
+        """Higher priority users first, then cheaper listings (price / max price), then fresher"""
+        return (-priority, round(price_ratio, 3), -indexed_ts)
+
+    def drop(self, entry: dict) -> None:
+        """Entry removed without send - lock must be held"""
+        if self.on_drop and entry['listing_key'] is not None:
+            self.on_drop(entry['listing_key'])
+
+    def put(self, acc_name: str, trade_user, whisper: str, rank: tuple, now=None, listing_key=None) -> None:
+        """Queue whisper - replaces pending whisper of same account"""
+        now = now if now is not None else time.monotonic()
+        with self.condition:
+            old_seq = self.accounts.pop(acc_name, None)
+            if old_seq is not None:
+                old_entry = self.entries.pop(old_seq)  # heap entry becomes stale
+                if old_entry['listing_key'] != listing_key:
+                    self.drop(old_entry)
+                self.counters['replaced'] += 1
+            seq = next(self.counter)
+            self.entries[seq] = {
+                'acc_name': acc_name,
+                'trade_user': trade_user,
+                'whisper': whisper,
+                'deadline': now + self.ttl,
+                'listing_key': listing_key,
+            }
+            self.accounts[acc_name] = seq
+            heapq.heappush(self.heap, (rank, seq))
+            self.counters['queued'] += 1
+            self.condition.notify()
+
+    def pop_ready(self, now: float):
+        """Pop best live entry - lock must be held; stale/expired entries dropped"""
+        while self.heap:
+            rank, seq = heapq.heappop(self.heap)
+            entry = self.entries.pop(seq, None)
+            if not entry:
+                continue
+            del self.accounts[entry['acc_name']]
+            if entry['deadline'] < now:
+                self.counters['expired'] += 1
+                self.drop(entry)
+                continue
+            return entry
+        return None
+
+    def get(self, is_running=lambda: True, timeout=None):
+        """Block until whisper may be sent - return (trade_user, whisper) or None on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self.entries and is_running():
+                    wait = self.next_send_at - now
+                    if wait <= 0:
+                        entry = self.pop_ready(now)
+                        if entry:
+                            self.next_send_at = now + self.send_interval
+                            self.counters['sent'] += 1
+                            return (entry['trade_user'], entry['whisper'])
+                        continue
+                elif self.entries:
+                    wait = 1  # stopped - wake() or recheck is_running
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self.condition.wait(wait)
+
+    def wake(self) -> None:
+        """Recheck is_running - trader switched on/off"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def clear(self) -> None:
+        with self.condition:
+            for entry in self.entries.values():
+                self.drop(entry)
+            self.heap.clear()
+            self.entries.clear()
+            self.accounts.clear()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return dict(self.counters, pending=len(self.entries))
@@ -0,0 +1,181 @@
+import itertools
+import threading
+import time
+
+
+class DBWriter:
+    """Write-behind queue of DB mutations - func(conn, *args) run by one writer thread,
+       committed in batches of batch_size or after flush_interval;
+       pending mutations with same key coalesce - only the latest is written;
+       failed mutation rolled back to its savepoint, failed commit requeued while running;
+       on_commit() side effects run only after the mutation is committed
+    """
+    def __init__(self, connect, batch_size=100, flush_interval=1):
+        self.connect = connect  # called in writer thread
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = {}  # key -> (seq, func, args, on_commit)
+        self.keys = itertools.count()  # keys of mutations without coalescing
+        self.seq = 0  # last submitted mutation
+        self.written = 0  # last mutation committed
+        self.first_pending_at = None
+        self.flush_requested = False
+        self.commit_failures = 0
+        self.running = False
+        self.thread = None
+        self.counters = {'submitted': 0, 'coalesced': 0, 'batches': 0, 'written': 0, 'errors': 0}
+        self.condition = threading.Condition()
+
+    def start(self) -> None:
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def submit(self, func, *args, key=None, on_commit=None) -> None:
+        """Queue func(conn, *args) - replaces pending mutation with same key (and its on_commit)"""
+        if not self.running:
+            self.start()
+        with self.condition:
+            if key is None:
+                key = ('_', next(self.keys))
+            elif self.pending.pop(key, None):
+                self.counters['coalesced'] += 1
+            self.seq += 1
+            self.pending[key] = (self.seq, func, args, on_commit)
+            self.counters['submitted'] += 1
+            if self.first_pending_at is None:
+                self.first_pending_at = time.monotonic()
+                self.condition.notify_all()  # start flush_interval timer
+            elif len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+
+    def check_batch_due(self) -> bool:
+        """Lock must be held"""
+        return bool(self.pending) and (
+            len(self.pending) >= self.batch_size
+            or self.flush_requested
+            or not self.running
+            or time.monotonic() - self.first_pending_at >= self.flush_interval)
+
+    def take_batch(self):
+        """Wait for due batch - None when stopped and drained"""
+        with self.condition:
+            while not self.check_batch_due():
+                if not self.pending:
+                    if not self.running:
+                        return None
+                    self.condition.wait()
+                else:
+                    self.condition.wait(self.flush_interval - (time.monotonic() - self.first_pending_at))
+            batch = [(key,) + mutation for key, mutation in self.pending.items()]
+            self.pending.clear()
+            self.first_pending_at = None
+            self.flush_requested = False
+            return batch
+
+    def write_mutation(self, conn, func, args: tuple) -> bool:
+        """Run mutation under savepoint - partial writes of failed mutation rolled back"""
+        conn.execute('SAVEPOINT mutation')
+        try:
+            func(conn, *args)
+        except Exception as e:
+            conn.execute('ROLLBACK TO mutation')
+            print(f'- DB writer error: {getattr(func, "__name__", func)}', repr(e))
+            return False
+        finally:
+            conn.execute('RELEASE mutation')
+        return True
+
+    def write_batch(self, conn, batch: list) -> bool:
+        """Run batch in one transaction - failed mutation is logged, rest still committed;
+           return False if commit failed
+        """
+        errors = 0
+        committed = []
+        try:
+            with conn:
+                for key, seq, func, args, on_commit in batch:
+                    if not self.write_mutation(conn, func, args):
+                        errors += 1
+                    elif on_commit:
+                        committed.append(on_commit)
+        except Exception as e:
+            print('- DB writer commit error:', repr(e))
+            if conn.in_transaction:
+                conn.rollback()
+            self.requeue(batch)
+            return False
+        for on_commit in committed:
+            try:
+                on_commit()
+            except Exception as e:
+                print(f'- DB writer on_commit error: {getattr(on_commit, "__name__", on_commit)}', repr(e))
+        with self.condition:
+            self.written = max(self.written, max(mutation[1] for mutation in batch))
+            self.counters['batches'] += 1
+            self.counters['written'] += len(batch) - errors
+            self.counters['errors'] += errors
+            self.condition.notify_all()
+        return True
+
+    def requeue(self, batch: list) -> None:
+        """Put back mutations of failed commit - newer pending mutation with same key wins;
+           dropped when stopped
+        """
+        with self.condition:
+            self.commit_failures += 1
+            if not self.running:
+                self.counters['errors'] += len(batch)
+                self.condition.notify_all()
+                return
+            for key, *mutation in batch:
+                self.pending.setdefault(key, tuple(mutation))
+            if self.first_pending_at is None:
+                self.first_pending_at = time.monotonic()  # retry after flush_interval
+            self.condition.notify_all()
+
+    def run(self) -> None:
+        conn = self.connect()
+        try:
+            while True:
+                batch = self.take_batch()
+                if batch is None:
+                    break
+                if not self.write_batch(conn, batch):
+                    with self.condition:  # back off before retry
+                        self.condition.wait(self.flush_interval)
+        finally:
+            conn.close()
+
+    def flush(self, timeout=None) -> bool:
+        """Commit everything submitted so far - return False on timeout or failed commit"""
+        with self.condition:
+            target = self.seq
+            if self.written >= target:
+                return True
+            failures = self.commit_failures
+            self.flush_requested = True
+            self.condition.notify_all()
+            self.condition.wait_for(
+                lambda: self.written >= target or self.commit_failures > failures, timeout)
+            return self.written >= target
+
+    def stop(self, timeout=10) -> bool:
+        """Flush pending mutations and stop writer thread - call on shutdown;
+           return False if anything submitted was not committed
+        """
+        with self.condition:
+            if not self.running:
+                return self.written >= self.seq
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        with self.condition:
+            return self.written >= self.seq
+
+    def stats(self) -> dict:
+        with self.condition:
+            return dict(self.counters, pending=len(self.pending))